@@ -0,0 +1,59 @@
+import time
+
+# rapidocr 的识别器可以直接接收多张图片，内部按 rec_batch_num 分批推理
+try:
+    from rapidocr.ch_ppocr_rec import TextRecInput
+except ImportError:
+    TextRecInput = None
+
+FIELDS = ('song', 'artist', 'rating')
+
+
+def collect_crops(ctx):
+    """收集一张截图的三个区域，键为 (文件名, 字段)"""
+    return [((ctx.filename, field), ctx.rois[field]) for field in FIELDS]
+
+
+def recognize_one_by_one(engine, imgs):
+    """逐张调用完整的OCR流程（当前默认路径）"""
+    txts, scores = [], []
+    for img in imgs:
+        res = engine(img, use_cls=False, use_det=False, use_rec=True)
+        txts.append(res.txts[0] if res.txts else '')
+        scores.append(res.scores[0] if res.scores else 0.0)
+    return txts, scores
+
+
+def recognize_images(engine, imgs, batch_size):
+    """一次把多张区域图送入识别模型"""
+    if TextRecInput is None:
+        return recognize_one_by_one(engine, imgs)
+
+    # RapidOCR 在第一次识别时才加载识别模型，创建后 text_rec 为None
+    text_rec = engine._load_rec_model()
+    text_rec.rec_batch_num = batch_size
+    output = text_rec(TextRecInput(img=imgs))
+    return list(output.txts), list(output.scores)
+
+
+def recognize_batch(engine, crops, batch_size=16):
+    """跨截图批量识别，返回 {(文件名, 字段): (文本, 置信度)}"""
+    results = {}
+    for start in range(0, len(crops), batch_size):
+        chunk = crops[start:start + batch_size]
+        txts, scores = recognize_images(engine, [img for _, img in chunk], batch_size)
+        for (key, _), txt, score in zip(chunk, txts, scores):
+            results[key] = (txt, score)
+    return results
+
+
+def throughput(engine, crops, batch_size=None):
+    """测量识别吞吐量（区域/秒），batch_size为None时逐张识别"""
+    imgs = [img for _, img in crops]
+    start_time = time.perf_counter()
+    if batch_size is None:
+        recognize_one_by_one(engine, imgs)
+    else:
+        recognize_batch(engine, crops, batch_size)
+    total_time = time.perf_counter() - start_time
+    return len(crops) / total_time
@@ -0,0 +1,376 @@
+import os
+import sys
+import json
+import argparse
+import platform
+import tempfile
+import time
+import contextlib
+import cv2
+import numpy as np
+
+from Decode import jpeg_size, probe_pixels, read_bytes
+from Engine import add_session_arguments, config_from_args, describe_config
+from Layout import REFERENCE_LAYOUT, layout_for_size
+from Screenshot import load_screenshot
+from Synth import SIZES, render_screenshot
+
+# 分阶段测试使用的固定数据：仓库内的歌曲目录，以及按目录内容生成的截图
+FIXTURE_CATALOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'songs_catalog.json')
+FIXTURE_CASES = [
+    # (截图类型, 难度, 歌名, 曲师, 分数, 模拟OCR误差后的 (歌名, 曲师))
+    ('type1', 'Massive', 'Aurora Drive', 'Kaede Lights', '1003456', ('Aurora Drlve', 'Kaede Lght')),
+    ('type2', 'Invaded', 'Glass Horizon', 'ORBITAL', '987654', ('Glass Horlzon', 'ORBlTAL')),
+    ('type2', 'Detected', 'Echo Chamber', 'Lumen Drift', '1008000', ('Echo Chamher', 'Lumen Drit')),
+]
+STAGE_REPORT_FILE = 'benchmark_stages.json'
+# 中位数耗时超过基线该比例时判定为性能回退
+REGRESSION_TOLERANCE = 0.25
+
+# 旧流程使用的写死坐标（参考分辨率下的布局）
+TYPE_PROBE = REFERENCE_LAYOUT.type_probe
+LEVEL_PROBES = REFERENCE_LAYOUT.level_probes
+REGIONS = REFERENCE_LAYOUT.regions
+
+
+def is_type2(b, g, r):
+    return 60 <= r <= 66 and 136 <= g <= 142 and 170 <= b <= 176
+
+
+def legacy_flow(img_path):
+    """旧流程：类型判断、难度识别和三个区域各自调用一次cv2.imread"""
+    img = cv2.imread(img_path)
+    x, y = TYPE_PROBE
+    result_type = "type2" if is_type2(*img[y, x]) else "type1"
+
+    rois = []
+    for region in REGIONS[result_type]:
+        img = cv2.imread(img_path)
+        x1, y1, x2, y2 = region
+        rois.append(img[y1:y2, x1:x2])
+
+    img = cv2.imread(img_path)
+    x, y = LEVEL_PROBES[result_type]
+    level_pixel = img[y, x]
+    return result_type, rois, level_pixel
+
+
+def context_flow(img_path):
+    """新流程：每张截图只解码一次，所有步骤共用同一个上下文"""
+    ctx = load_screenshot(img_path)
+    ctx.result_type = "type2" if is_type2(*ctx.pixel(*ctx.layout.type_probe)) else "type1"
+    rois = ctx.set_regions(*ctx.regions())
+    level_pixel = ctx.pixel(*ctx.layout.level_probes[ctx.result_type])
+    return ctx.result_type, rois, level_pixel
+
+
+def fast_flow(img_path):
+    """快速流程：探针读缩小图，只解码三个区域"""
+    ctx = load_screenshot(img_path, fast=True)
+    ctx.result_type = "type2" if is_type2(*ctx.pixel(*ctx.layout.type_probe)) else "type1"
+    rois = ctx.set_regions(*ctx.regions())
+    level_pixel = ctx.pixel(*ctx.layout.level_probes[ctx.result_type])
+    return ctx.result_type, rois, level_pixel
+
+
+def probe_only_flow(img_path):
+    """只做类型判断（对应 RGB.py 的 classify_screenshot_fast）"""
+    data = read_bytes(img_path)
+    layout = layout_for_size(*jpeg_size(data))
+    b, g, r = probe_pixels(data, [layout.type_probe])[0]
+    return "type2" if is_type2(b, g, r) else "type1"
+
+
+def list_screenshots(src_folder):
+    return [os.path.join(src_folder, f) for f in sorted(os.listdir(src_folder))
+            if f.upper().endswith('.JPG')]
+
+
+def time_flow(flow, paths, rounds=3):
+    """返回每张图片的平均耗时（毫秒）"""
+    # 预热（避免冷启动影响）
+    flow(paths[0])
+
+    start_time = time.perf_counter()
+    for _ in range(rounds):
+        for path in paths:
+            flow(path)
+    total_time = time.perf_counter() - start_time
+    return total_time / (rounds * len(paths)) * 1000
+
+
+def decode_benchmark(src_folder="SCR", rounds=3):
+    """比较旧流程和单次解码流程的单张耗时（不含OCR，两者OCR耗时相同）"""
+    paths = list_screenshots(src_folder)
+    if not paths:
+        print(f"{src_folder} 中没有截图")
+        return None
+
+    legacy_ms = time_flow(legacy_flow, paths, rounds)
+    context_ms = time_flow(context_flow, paths, rounds)
+    fast_ms = time_flow(fast_flow, paths, rounds)
+    probe_ms = time_flow(probe_only_flow, paths, rounds)
+
+    print("=" * 70)
+    print(f"解码测试: {len(paths)} 张截图 x {rounds} 轮")
+    print("=" * 70)
+    print(f"旧流程 (每张解码5次): {legacy_ms:.2f} 毫秒/张")
+    print(f"上下文 (每张解码1次): {context_ms:.2f} 毫秒/张")
+    print(f"快速模式 (缩小解码+区域解码): {fast_ms:.2f} 毫秒/张")
+    print(f"仅类型判断 (缩小解码探针): {probe_ms:.2f} 毫秒/张")
+    print(f"加速比: 上下文 {legacy_ms / context_ms:.1f} 倍, 快速模式 {legacy_ms / fast_ms:.1f} 倍")
+
+    return {'images': len(paths), 'legacy_ms': legacy_ms, 'context_ms': context_ms,
+            'fast_ms': fast_ms, 'probe_ms': probe_ms}
+
+
+def rec_benchmark(src_folder="SCR", batch_sizes=(8, 16, 32)):
+    """比较逐个区域识别和跨截图批量识别的吞吐量（区域/秒）"""
+    import test3
+    from Batch import collect_crops, throughput
+
+    crops = []
+    for path in list_screenshots(src_folder):
+        ctx = load_screenshot(path)
+        if ctx is None:
+            continue
+        ctx.result_type = test3.distinguish(ctx)
+        test3.select_regions(ctx)
+        ctx.release()
+        crops.extend(collect_crops(ctx))
+    if not crops:
+        print(f"{src_folder} 中没有截图")
+        return None
+
+    # 预热
+    engine = test3.get_engine()
+    throughput(engine, crops[:3])
+
+    report = {'crops': len(crops), 'one_by_one': throughput(engine, crops)}
+    for batch_size in batch_sizes:
+        report[f'batch_{batch_size}'] = throughput(engine, crops, batch_size)
+    # 记录本次测试的ORT会话配置，不同配置的结果才能对比
+    report['session'] = describe_config(test3.ENGINE_CONFIG, engine)
+
+    print("=" * 70)
+    print(f"识别吞吐量测试: {len(crops)} 个区域")
+    print(f"会话配置: {report['session']}")
+    print("=" * 70)
+    baseline = report['one_by_one']
+    print(f"逐个识别: {baseline:.1f} 区域/秒")
+    for batch_size in batch_sizes:
+        crops_per_second = report[f'batch_{batch_size}']
+        print(f"批量识别 (batch_size={batch_size}): {crops_per_second:.1f} 区域/秒, "
+              f"{crops_per_second / baseline:.1f} 倍")
+    return report
+
+
+def summarize(samples):
+    """耗时样本（秒）的统计，单位毫秒"""
+    samples_ms = np.array(samples) * 1000
+    return {
+        'runs': len(samples),
+        'mean_ms': float(samples_ms.mean()),
+        'p50_ms': float(np.percentile(samples_ms, 50)),
+        'p95_ms': float(np.percentile(samples_ms, 95)),
+    }
+
+
+def time_calls(func, inputs, rounds, quiet=False):
+    """对每个输入各调用 rounds 次并逐次计时，quiet 时丢弃函数的打印输出"""
+    # 预热
+    func(inputs[0])
+
+    samples = []
+    output = open(os.devnull, 'w') if quiet else None
+    with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+        for _ in range(rounds):
+            for item in inputs:
+                start_time = time.perf_counter()
+                func(item)
+                samples.append(time.perf_counter() - start_time)
+    if output is not None:
+        output.close()
+    return summarize(samples)
+
+
+def save_report(report, report_file):
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+def compare_with_baseline(stages, baseline_file, tolerance=REGRESSION_TOLERANCE):
+    """和基线逐阶段比较中位数耗时，返回回退的阶段列表"""
+    try:
+        with open(baseline_file, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['stages']
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        print(f"未找到基线 {baseline_file}，跳过对比（可用 --save-baseline 生成）")
+        return []
+
+    regressions = []
+    print(f"\n与基线对比 (允许增幅 {tolerance:.0%}):")
+    for name, stats in stages.items():
+        if name not in baseline:
+            continue
+        ratio = stats['p50_ms'] / baseline[name]['p50_ms'] if baseline[name]['p50_ms'] else 1.0
+        regressed = ratio > 1 + tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"  {'❌' if regressed else '✅'} {name:<24} {baseline[name]['p50_ms']:9.3f} → "
+              f"{stats['p50_ms']:9.3f} 毫秒 ({ratio:.2f} 倍)")
+    return regressions
+
+
+def check_fixtures(tmp_dir):
+    """按每个合成分辨率生成固定截图，检查类型和难度识别，返回识别错误的说明列表
+
+    计时只用原始分辨率的截图，换算到其他分辨率的坐标出错时由这里发现。
+    """
+    import test3
+
+    errors = []
+    for width, height in SIZES:
+        for i, (result_type, level, title, artist, rating, _) in enumerate(FIXTURE_CASES):
+            path = os.path.join(tmp_dir, f'check_{width}x{height}_{i}.jpg')
+            cv2.imwrite(path, render_screenshot(result_type, level, title, artist, rating, (width, height)),
+                        [cv2.IMWRITE_JPEG_QUALITY, 90])
+            ctx = load_screenshot(path)
+            if not ctx.ok:
+                errors.append(f"{width}x{height} 第 {i + 1} 张: 无法读取")
+                continue
+            found_type = test3.distinguish(ctx)
+            found_level = test3.get_level(ctx, found_type)
+            if (found_type, found_level) != (result_type, level):
+                errors.append(f"{width}x{height} 第 {i + 1} 张: 应为 {result_type}/{level}, "
+                              f"识别为 {found_type}/{found_level}")
+    return errors
+
+
+def time_stages(songs_data, tmp_dir, rounds, with_ocr):
+    """在 tmp_dir 中生成固定截图并逐阶段计时，返回 {阶段: 统计}"""
+    import test3
+    from Matcher import match_joint
+
+    paths = []
+    for i, (result_type, level, title, artist, rating, _) in enumerate(FIXTURE_CASES):
+        path = os.path.join(tmp_dir, f'fixture_{i}.jpg')
+        cv2.imwrite(path, render_screenshot(result_type, level, title, artist, rating),
+                    [cv2.IMWRITE_JPEG_QUALITY, 90])
+        paths.append(path)
+
+    contexts = [load_screenshot(path) for path in paths]
+    for ctx in contexts:
+        ctx.result_type = test3.distinguish(ctx)
+        test3.prepare_screenshot(ctx)
+
+    def distinguish(ctx):
+        ctx.probe_samples = None
+        return test3.distinguish(ctx)
+
+    def get_level(ctx):
+        ctx.probe_samples = None
+        return test3.get_level(ctx, ctx.result_type)
+
+    stages = {
+        'decode_full': time_calls(load_screenshot, paths, rounds),
+        'decode_fast': time_calls(lambda path: load_screenshot(path, fast=True), paths, rounds),
+        'distinguish': time_calls(distinguish, contexts, rounds),
+        'get_level': time_calls(get_level, contexts, rounds),
+    }
+    if with_ocr:
+        for field in ('song', 'artist', 'rating'):
+            stages[f'ocr_{field}'] = time_calls(lambda ctx: test3.ocr_region(ctx.rois[field]), contexts, rounds)
+
+    queries = [(level, artist, title) for _, level, _, _, _, (title, artist) in FIXTURE_CASES]
+    all_songs = songs_data.all_songs
+    stages['match_partial_ratio'] = time_calls(
+        lambda query: test3.method_partial_ratio(query[2], all_songs.items, keys=all_songs.keys), queries, rounds)
+    stages['match_cascade'] = time_calls(
+        lambda query: test3.match_difficulty_artist_song(*query, songs_data), queries, rounds, quiet=True)
+    stages['match_joint'] = time_calls(lambda query: match_joint(*query, songs_data), queries, rounds)
+
+    results = [{'matched_song': dict(song, score=str(1000000 - i))} for i, song in enumerate(songs_data.songs)]
+    output_file = os.path.join(tmp_dir, 'songs_results.json')
+    stages['save_results_to_json'] = time_calls(
+        lambda items: test3.save_results_to_json(items, output_file), [results], rounds, quiet=True)
+    return stages
+
+
+def stage_benchmark(rounds=20, report_file=STAGE_REPORT_FILE, baseline_file=None,
+                    tolerance=REGRESSION_TOLERANCE, with_ocr=True):
+    """不依赖网络和玩家截图的分阶段性能测试
+
+    使用 fixtures 中的歌曲目录和按其内容生成的截图，分别计时解码、类型判断、难度识别、
+    各字段OCR、各匹配方法和结果写入，输出 mean/p50/p95 并与基线对比。
+    计时前先在各合成分辨率下检查类型和难度识别，错误记录在报告的 accuracy_errors 中。
+    """
+    import test3
+    from Catalog import load_catalog
+
+    songs_data = load_catalog(FIXTURE_CATALOG, use_snapshot=False)
+    with tempfile.TemporaryDirectory(prefix='prr-bench-') as tmp_dir:
+        accuracy_errors = check_fixtures(tmp_dir)
+        stages = time_stages(songs_data, tmp_dir, rounds, with_ocr)
+
+    print("=" * 70)
+    print(f"分阶段性能测试: {len(FIXTURE_CASES)} 张固定截图, {len(songs_data)} 条目录, {rounds} 轮")
+    print("=" * 70)
+    for name, stats in stages.items():
+        print(f"  {name:<24} 平均 {stats['mean_ms']:9.3f}  p50 {stats['p50_ms']:9.3f}  "
+              f"p95 {stats['p95_ms']:9.3f} 毫秒")
+
+    report = {
+        'meta': {
+            'rounds': rounds,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'session': describe_config(test3.ENGINE_CONFIG, test3.get_engine()) if with_ocr else None,
+        },
+        'stages': stages,
+        'accuracy_errors': accuracy_errors,
+    }
+    report['regressions'] = compare_with_baseline(stages, baseline_file, tolerance) if baseline_file else []
+    save_report(report, report_file)
+    print(f"\n报告已保存到 {report_file}")
+    if report['regressions']:
+        print(f"⚠️ 性能回退: {', '.join(report['regressions'])}")
+    for error in accuracy_errors:
+        print(f"❌ 识别错误: {error}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="截图处理性能测试")
+    parser.add_argument('mode', nargs='?', default='decode', choices=['decode', 'rec', 'stages'])
+    parser.add_argument('--src', default="SCR", help="截图文件夹")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[8, 16, 32])
+    parser.add_argument('--rounds', type=int, default=20, help="stages: 每个阶段重复的轮数")
+    parser.add_argument('--report', default=STAGE_REPORT_FILE, help="stages: 报告输出文件")
+    parser.add_argument('--baseline', default='benchmark_baseline.json', help="stages: 基线报告")
+    parser.add_argument('--save-baseline', action='store_true', help="stages: 把本次结果保存为基线")
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE,
+                        help="stages: 允许的中位数耗时增幅，超过则退出码为1")
+    parser.add_argument('--no-ocr', action='store_true', help="stages: 跳过OCR阶段")
+    add_session_arguments(parser)
+    args = parser.parse_args()
+
+    if args.mode == 'decode':
+        decode_benchmark(args.src)
+    elif args.mode == 'stages':
+        import test3
+        test3.set_engine_config(config_from_args(args))
+        report = stage_benchmark(args.rounds, args.report, args.baseline, args.tolerance,
+                                 with_ocr=not args.no_ocr)
+        # 识别结果不对时计时没有意义，既不保存基线也不算通过
+        if report['accuracy_errors']:
+            sys.exit(1)
+        if args.save_baseline:
+            save_report(report, args.baseline)
+            print(f"基线已保存到 {args.baseline}")
+        elif report['regressions']:
+            sys.exit(1)
+    else:
+        import test3
+        test3.set_engine_config(config_from_args(args))
+        rec_benchmark(args.src, args.batch_sizes)
@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+CACHE_FILE = 'ocr_cache.sqlite'
+MATCH_MEMO_FILE = 'match_memo.json'
+
+
+def content_hash(data):
+    """文件内容哈希"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def model_config(params):
+    """把OCR引擎参数转成稳定的字符串，枚举取其值"""
+    return json.dumps({key: str(getattr(value, 'value', value)) for key, value in params.items()},
+                      sort_keys=True)
+
+
+class OCRCache:
+    """按内容寻址的OCR结果缓存
+
+    键由文件内容哈希、截图类型、区域坐标和OCR模型配置共同决定，
+    任意一项变化都会重新识别。超过 max_entries 条时淘汰最久未使用的记录。
+    """
+
+    def __init__(self, db_path=CACHE_FILE, max_entries=20000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # 流水线模式下在主线程创建，解码线程查缓存、OCR线程写缓存，读写都在锁内进行
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS ocr_cache (
+                key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                last_used REAL NOT NULL
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_last_used ON ocr_cache (last_used)')
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(file_hash, result_type, regions, params):
+        """生成缓存键"""
+        raw_key = json.dumps([file_hash, result_type, regions, model_config(params)])
+        return hashlib.sha256(raw_key.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """读取缓存，返回 {字段: {'txts': [...], 'scores': [...]}}，未命中返回None"""
+        with self.lock:
+            row = self.conn.execute('SELECT result FROM ocr_cache WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.conn.execute('UPDATE ocr_cache SET last_used = ? WHERE key = ?', (time.time(), key))
+            self.conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, result):
+        """写入缓存，必要时淘汰旧记录"""
+        with self.lock:
+            self.conn.execute('INSERT OR REPLACE INTO ocr_cache (key, result, last_used) VALUES (?, ?, ?)',
+                              (key, json.dumps(result, ensure_ascii=False), time.time()))
+            self.evict()
+            self.conn.commit()
+
+    def evict(self):
+        """只保留最近使用的 max_entries 条记录"""
+        count = self.conn.execute('SELECT COUNT(*) FROM ocr_cache').fetchone()[0]
+        if count > self.max_entries:
+            self.conn.execute('''
+                DELETE FROM ocr_cache WHERE key IN (
+                    SELECT key FROM ocr_cache ORDER BY last_used ASC LIMIT ?
+                )
+            ''', (count - self.max_entries,))
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"📦 OCR缓存: 命中 {stats['hits']} 次, 未命中 {stats['misses']} 次, "
+              f"命中率 {stats['hit_rate']:.0%}")
+
+    def close(self):
+        self.conn.close()
+
+
+class MatchMemo:
+    """匹配结果的LRU缓存
+
+    键为 (匹配方式, 难度, 规范化曲师, 规范化歌名)，只对同一版本的歌曲目录有效，
+    目录版本变化时整体清空。可选保存到文件供下次运行使用；read_only 时只加载不保存，
+    新的匹配结果另外记录，由 take_learned 取出交给负责保存的进程合并。
+    """
+
+    def __init__(self, catalog_version, max_entries=4096, path=None, read_only=False):
+        self.catalog_version = catalog_version
+        self.max_entries = max_entries
+        self.path = path
+        self.read_only = read_only
+        self.entries = OrderedDict()
+        self.learned = []
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self.load()
+
+    @staticmethod
+    def make_key(mode, difficulty, artist_key, title_key):
+        return f"{mode}|{difficulty.lower()}|{artist_key}|{title_key}"
+
+    def check_catalog(self, catalog_version):
+        """歌曲目录变化时清空缓存"""
+        if catalog_version != self.catalog_version:
+            self.entries.clear()
+            self.learned = []
+            self.catalog_version = catalog_version
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        if self.read_only:
+            self.learned.append((key, value))
+
+    def take_learned(self):
+        """取出上次调用以来新加入的 (键, 匹配结果)，没有时返回None"""
+        learned, self.learned = self.learned, []
+        return learned or None
+
+    def merge_learned(self, entries):
+        """合并其他进程 take_learned 取出的匹配结果"""
+        for key, value in entries:
+            self.put(key, value)
+
+    def load(self):
+        """从文件加载，目录版本不一致时丢弃"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if data.get('catalog_version') != self.catalog_version:
+            print("♻️ 歌曲目录已变化，匹配缓存已失效")
+            return
+        for key, value in data.get('entries', [])[-self.max_entries:]:
+            self.entries[key] = value
+
+    def save(self):
+        if not self.path or self.read_only:
+            return
+        tmp_file = self.path + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'catalog_version': self.catalog_version, 'entries': list(self.entries.items())},
+                      f, ensure_ascii=False)
+        os.replace(tmp_file, self.path)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': len(self.entries),
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"♻️ 匹配缓存: 命中 {stats['hits']} 次, 未命中 {stats['misses']} 次, "
+              f"命中率 {stats['hit_rate']:.0%}, 共 {stats['entries']} 条")
@@ -0,0 +1,202 @@
+import os
+import re
+import json
+import pickle
+import hashlib
+from collections import namedtuple
+
+from NGram import NGramIndex
+
+# 目录快照文件头，SongCatalog 结构变化时需要增加 SNAPSHOT_FORMAT
+SNAPSHOT_MAGIC = 'PRR-CATALOG'
+SNAPSHOT_FORMAT = 1
+
+# 环境变量：目录快照的存放目录，默认为用户缓存目录下的 prr，不在JSON旁边生成文件
+CACHE_DIR_ENV = 'PRR_CACHE_DIR'
+
+# 一组候选项及其预先规范化的匹配键
+Bucket = namedtuple('Bucket', ['items', 'keys'])
+
+EMPTY_BUCKET = Bucket([], [])
+
+
+def normalize_text(text):
+    """匹配前的统一规范化：小写、去首尾空白、去标点"""
+    return re.sub(r'[^\w\s]', '', text.lower().strip())
+
+
+def _unique(values):
+    """去重并保持首次出现的顺序"""
+    return list(dict.fromkeys(values))
+
+
+class SongCatalog:
+    """歌曲目录索引
+
+    加载时对所有歌名、曲师、难度只规范化一次，并预建
+    难度→曲师、(曲师, 难度)→歌曲、曲师→歌曲、难度→歌曲 查找表。
+    可以像原来的歌曲列表一样遍历和取长度。
+    """
+
+    def __init__(self, songs):
+        self.songs = list(songs)
+        # 目录内容的版本号，内容变化时依赖目录的缓存随之失效
+        self.version = hashlib.sha256(
+            json.dumps(self.songs, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+        self.title_keys = [normalize_text(song.get('title', '')) for song in self.songs]
+
+        artists_by_difficulty = {}
+        songs_by_artist = {}
+        songs_by_difficulty = {}
+        songs_by_artist_difficulty = {}
+        for song, title_key in zip(self.songs, self.title_keys):
+            artist = song.get('artist', '')
+            difficulty = song.get('difficulty', '').lower()
+            artists_by_difficulty.setdefault(difficulty, []).append(artist)
+            for index, bucket_key in ((songs_by_artist, artist.lower()),
+                                      (songs_by_difficulty, difficulty),
+                                      (songs_by_artist_difficulty, (artist.lower(), difficulty))):
+                bucket = index.setdefault(bucket_key, ([], []))
+                bucket[0].append(song)
+                bucket[1].append(title_key)
+
+        self.all_songs = Bucket(self.songs, self.title_keys)
+        self.all_artists = self._text_bucket(song.get('artist', '') for song in self.songs)
+        self.all_difficulties = self._text_bucket(song.get('difficulty', '') for song in self.songs)
+        self.artists_by_difficulty = {difficulty: self._text_bucket(artists)
+                                      for difficulty, artists in artists_by_difficulty.items()}
+        self.songs_by_artist = {key: Bucket(*bucket) for key, bucket in songs_by_artist.items()}
+        self.songs_by_difficulty = {key: Bucket(*bucket) for key, bucket in songs_by_difficulty.items()}
+        self.songs_by_artist_difficulty = {key: Bucket(*bucket)
+                                           for key, bucket in songs_by_artist_difficulty.items()}
+        self._title_index = None
+        self._artist_index = None
+
+        # 每一行对应的曲师、难度在 all_artists / all_difficulties 中的下标，供逐行联合打分使用
+        artist_positions = {artist: i for i, artist in enumerate(self.all_artists.items)}
+        difficulty_positions = {difficulty: i for i, difficulty in enumerate(self.all_difficulties.items)}
+        self.artist_ids = [artist_positions[song.get('artist', '')] for song in self.songs]
+        self.difficulty_ids = [difficulty_positions[song.get('difficulty', '')] for song in self.songs]
+
+    @staticmethod
+    def _text_bucket(texts):
+        items = _unique(texts)
+        return Bucket(items, [normalize_text(text) for text in items])
+
+    @property
+    def title_index(self):
+        """歌名n-gram索引，首次使用时建立"""
+        if self._title_index is None:
+            self._title_index = NGramIndex(self.title_keys)
+        return self._title_index
+
+    @property
+    def artist_index(self):
+        """曲师n-gram索引，首次使用时建立"""
+        if self._artist_index is None:
+            self._artist_index = NGramIndex(self.all_artists.keys)
+        return self._artist_index
+
+    def __len__(self):
+        return len(self.songs)
+
+    def __iter__(self):
+        return iter(self.songs)
+
+    def __getitem__(self, index):
+        return self.songs[index]
+
+    def artists_for_difficulty(self, difficulty):
+        """指定难度的所有曲师"""
+        return self.artists_by_difficulty.get(difficulty.lower(), EMPTY_BUCKET)
+
+    def songs_for_artist(self, artist):
+        """指定曲师的所有歌曲"""
+        return self.songs_by_artist.get(artist.lower(), EMPTY_BUCKET)
+
+    def songs_for_difficulty(self, difficulty):
+        """指定难度的所有歌曲"""
+        return self.songs_by_difficulty.get(difficulty.lower(), EMPTY_BUCKET)
+
+    def songs_for(self, artist, difficulty):
+        """指定曲师在指定难度下的所有歌曲"""
+        return self.songs_by_artist_difficulty.get((artist.lower(), difficulty.lower()), EMPTY_BUCKET)
+
+
+def snapshot_dir():
+    """目录快照的存放目录：优先取环境变量，否则为 ~/.cache/prr"""
+    return os.environ.get(CACHE_DIR_ENV) or os.path.join(os.path.expanduser('~'), '.cache', 'prr')
+
+
+def snapshot_path_for(path):
+    """JSON目录对应的快照文件路径，文件名带上JSON绝对路径的哈希，不同位置的同名目录互不覆盖"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    digest = hashlib.sha256(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(snapshot_dir(), f'{name}-{digest}.pkl')
+
+
+def save_snapshot(catalog, snapshot_path, source_hash):
+    """保存目录快照：先写文件头，再写包含规范化键、查找表和n-gram索引的目录对象"""
+    # 提前建好索引，一并写入快照
+    catalog.title_index
+    catalog.artist_index
+
+    header = {'magic': SNAPSHOT_MAGIC, 'format': SNAPSHOT_FORMAT, 'source_hash': source_hash}
+    os.makedirs(os.path.dirname(snapshot_path) or '.', exist_ok=True)
+    tmp_file = snapshot_path + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        pickle.dump(header, f, protocol=5)
+        pickle.dump(catalog, f, protocol=5)
+    os.replace(tmp_file, snapshot_path)
+
+
+def load_snapshot(snapshot_path, source_hash):
+    """读取目录快照，文件头与当前JSON或格式版本不符时返回None"""
+    try:
+        with open(snapshot_path, 'rb') as f:
+            header = pickle.load(f)
+            if (not isinstance(header, dict) or header.get('magic') != SNAPSHOT_MAGIC
+                    or header.get('format') != SNAPSHOT_FORMAT
+                    or header.get('source_hash') != source_hash):
+                return None
+            return pickle.load(f)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+
+
+def build_snapshot(path='songs_data.json'):
+    """根据JSON目录重建快照"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    catalog = SongCatalog(json.loads(raw))
+    save_snapshot(catalog, snapshot_path_for(path), hashlib.sha256(raw).hexdigest())
+    return catalog
+
+
+def load_catalog(path='songs_data.json', use_snapshot=True):
+    """加载歌曲数据并建立索引
+
+    优先读取缓存目录中的快照（见 snapshot_path_for）；快照缺失或与JSON内容不一致时
+    重新建立索引并写入新快照。
+    """
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read()
+    except FileNotFoundError:
+        print(f"{path} 文件未找到，请先运行获取歌曲数据的脚本")
+        return SongCatalog([])
+
+    source_hash = hashlib.sha256(raw).hexdigest()
+    snapshot_path = snapshot_path_for(path)
+    if use_snapshot:
+        catalog = load_snapshot(snapshot_path, source_hash)
+        if catalog is not None:
+            return catalog
+
+    catalog = SongCatalog(json.loads(raw))
+    if use_snapshot:
+        try:
+            save_snapshot(catalog, snapshot_path, source_hash)
+        except OSError as e:
+            print(f"⚠️ 目录快照写入失败: {e}")
+    return catalog
@@ -0,0 +1,96 @@
+import numpy as np
+
+# 探针周围取样的半径（原图像素），取中位数抵消JPEG噪声；边长为奇数，中位数总是实际出现的像素值
+PATCH_RADIUS = 2
+
+RESULT_TYPES = ('type1', 'type2')
+
+# 颜色框表：(标签, (R下限, R上限), (G下限, G上限), (B下限, B上限))，按顺序取第一个命中的，都不命中时取默认值
+TYPE_BOXES = [
+    ('type2', (60, 66), (136, 142), (170, 176)),
+]
+TYPE_DEFAULT = 'type1'
+
+LEVEL_BOXES = {
+    'type1': [
+        ('Massive', (210, 225), (135, 150), (235, 255)),
+        ('Invaded', (225, 238), (108, 120), (105, 120)),
+    ],
+    'type2': [
+        ('Massive', (170, 190), (120, 135), (200, 215)),
+        ('Invaded', (195, 210), (110, 120), (105, 120)),
+    ],
+}
+LEVEL_DEFAULT = 'Detected'
+
+
+def compile_boxes(boxes):
+    """把颜色框表转成 (标签, 下限数组, 上限数组)，数组为BGR顺序，与OpenCV像素一致"""
+    labels = [box[0] for box in boxes]
+    lower = np.array([[b[0], g[0], r[0]] for _, r, g, b in boxes], dtype=np.float32).reshape(-1, 3)
+    upper = np.array([[b[1], g[1], r[1]] for _, r, g, b in boxes], dtype=np.float32).reshape(-1, 3)
+    return labels, lower, upper
+
+
+_TYPE_TABLE = compile_boxes(TYPE_BOXES)
+_LEVEL_TABLES = {result_type: compile_boxes(boxes) for result_type, boxes in LEVEL_BOXES.items()}
+
+
+def match_boxes(samples, table, default):
+    """一次判断一组BGR样本 (N, 3) 落在哪个颜色框中，返回标签列表"""
+    labels, lower, upper = table
+    samples = np.asarray(samples, dtype=np.float32).reshape(-1, 3)
+    if not labels:
+        return [default] * len(samples)
+    inside = np.all((samples[:, None, :] >= lower) & (samples[:, None, :] <= upper), axis=2)
+    first = inside.argmax(axis=1)
+    hit = inside.any(axis=1)
+    return [labels[index] if ok else default for index, ok in zip(first.tolist(), hit.tolist())]
+
+
+def probe_points(layout):
+    """一张截图需要取样的全部探针：类型探针，以及各类型的难度探针"""
+    return [layout.type_probe] + [layout.level_probes[result_type] for result_type in RESULT_TYPES]
+
+
+def gather_samples(ctx, radius=PATCH_RADIUS):
+    """对截图的全部探针各取一块像素求中位数，返回 (探针数, 3) 数组；每张截图只取样一次"""
+    if ctx.probe_samples is None:
+        ctx.probe_samples = np.array([np.median(ctx.patch(x, y, radius).reshape(-1, 3), axis=0)
+                                      for x, y in probe_points(ctx.layout)], dtype=np.float32)
+    return ctx.probe_samples
+
+
+def classify_samples(samples):
+    """对一批截图的探针样本 (N, 探针数, 3) 一次算出 [(截图类型, 难度)]"""
+    samples = np.asarray(samples, dtype=np.float32)
+    if len(samples) == 0:
+        return []
+    types = match_boxes(samples[:, 0], _TYPE_TABLE, TYPE_DEFAULT)
+    levels = {result_type: match_boxes(samples[:, 1 + i], _LEVEL_TABLES[result_type], LEVEL_DEFAULT)
+              for i, result_type in enumerate(RESULT_TYPES)}
+    return [(result_type, levels[result_type][n]) for n, result_type in enumerate(types)]
+
+
+def classify_batch(contexts):
+    """批量判断截图类型和难度，结果同时写入各上下文"""
+    if not contexts:
+        return []
+    results = classify_samples(np.stack([gather_samples(ctx) for ctx in contexts]))
+    for ctx, (result_type, level) in zip(contexts, results):
+        ctx.result_type = result_type
+        ctx.level = level
+    return results
+
+
+def classify(ctx):
+    """判断单张截图的 (类型, 难度)"""
+    return classify_batch([ctx])[0]
+
+
+def level_for(ctx, result_type):
+    """按指定截图类型读取难度，复用已取的探针样本"""
+    if result_type not in RESULT_TYPES:
+        return "Unknown"
+    sample = gather_samples(ctx)[1 + RESULT_TYPES.index(result_type)]
+    return match_boxes(sample, _LEVEL_TABLES[result_type], LEVEL_DEFAULT)[0]
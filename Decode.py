@@ -0,0 +1,132 @@
+import struct
+import cv2
+import numpy as np
+
+# 可选：PyTurboJPEG 支持无损裁剪，只对区域做反DCT
+try:
+    from turbojpeg import TurboJPEG
+    _turbo = TurboJPEG()
+except (ImportError, RuntimeError, OSError):
+    _turbo = None
+
+# 能否只解码指定区域：没有PyTurboJPEG时区域只能从全图中切出，快速模式反而多一次缩小解码
+REGION_DECODE = _turbo is not None
+
+# libjpeg DCT缩放对应的读取标志
+REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# 探针缩放倍数：1/4 分辨率下探针点所在的纯色区域仍然足够大
+PROBE_SCALE = 4
+
+# 带尺寸信息的SOF标记（不含DHT/JPG/DAC）
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+               0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def read_bytes(image_path):
+    """读取文件原始字节"""
+    with open(image_path, 'rb') as f:
+        return f.read()
+
+
+def jpeg_header(data):
+    """从JPEG头中读取 (宽, 高, MCU宽, MCU高)，不解码像素，非JPEG返回None"""
+    if data[:2] != b'\xff\xd8':
+        return None
+
+    pos = 2
+    length = len(data)
+    while pos + 4 <= length:
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        # 跳过填充字节
+        if marker == 0xFF:
+            pos += 1
+            continue
+        # 无长度字段的独立标记
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            pos += 2
+            continue
+        if marker == 0xD9 or marker == 0xDA:
+            return None
+
+        seg_len = struct.unpack('>H', data[pos + 2:pos + 4])[0]
+        if marker in SOF_MARKERS:
+            height, width = struct.unpack('>HH', data[pos + 5:pos + 9])
+            components = data[pos + 9]
+            h_max, v_max = 1, 1
+            for i in range(components):
+                sampling = data[pos + 11 + i * 3]
+                h_max = max(h_max, sampling >> 4)
+                v_max = max(v_max, sampling & 0x0F)
+            return width, height, 8 * h_max, 8 * v_max
+        pos += 2 + seg_len
+
+    return None
+
+
+def jpeg_size(data):
+    """从JPEG头中读取 (宽, 高)"""
+    header = jpeg_header(data)
+    return header[:2] if header else None
+
+
+def decode_full(data):
+    """全分辨率解码"""
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+def decode_reduced(data, scale=PROBE_SCALE):
+    """利用libjpeg的DCT缩放直接解码出 1/scale 分辨率的图像"""
+    if _turbo is not None and scale > 1:
+        return _turbo.decode(data, scaling_factor=(1, scale))
+    return cv2.imdecode(np.frombuffer(data, np.uint8), REDUCED_FLAGS[scale])
+
+
+def probe_pixels(data, points, scale=PROBE_SCALE):
+    """在缩小解码的图像上读取一组探针像素，坐标使用原图坐标"""
+    img = decode_reduced(data, scale)
+    if img is None:
+        return None
+    return [img[y // scale, x // scale] for x, y in points]
+
+
+def decode_regions(data, regions, header=None):
+    """只解码指定区域，文件损坏或被截断而无法解码时返回None
+
+    有PyTurboJPEG时通过无损裁剪一次性取出所有区域，只对区域做反DCT；
+    否则退回全图解码后切片。
+    """
+    if _turbo is None:
+        img = decode_full(data)
+        if img is None:
+            return None
+        return [img[y1:y2, x1:x2] for x1, y1, x2, y2 in regions]
+
+    header = header or jpeg_header(data)
+    if header is None:
+        return None
+    width, height, mcu_w, mcu_h = header
+
+    # 无损裁剪要求左上角对齐到MCU边界，多出的部分解码后再切掉
+    crops = []
+    offsets = []
+    for x1, y1, x2, y2 in regions:
+        ax, ay = x1 - x1 % mcu_w, y1 - y1 % mcu_h
+        crops.append((ax, ay, min(x2, width) - ax, min(y2, height) - ay))
+        offsets.append((x1 - ax, y1 - ay, x2 - x1, y2 - y1))
+
+    rois = []
+    try:
+        for jpeg_buf, (dx, dy, w, h) in zip(_turbo.crop_multiple(data, crops), offsets):
+            roi = _turbo.decode(jpeg_buf)
+            rois.append(roi[dy:dy + h, dx:dx + w])
+    except OSError:
+        return None
+    return rois
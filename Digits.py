@@ -0,0 +1,184 @@
+import os
+import cv2
+import numpy as np
+
+DIGITS_FILE = 'digit_templates.npz'
+
+# 单个字形缩放到的尺寸 (宽, 高)
+GLYPH_SIZE = (16, 24)
+
+# 每个字形与最像的模板的相关系数都不低于该值时才采用模板识别结果
+MIN_CONFIDENCE = 0.85
+
+# 只用置信度不低于该值的OCR结果学习模板
+LEARN_SCORE = 0.95
+
+# 高度不到最高字形该比例的连通列（逗号、小数点等）不算数字
+MIN_GLYPH_HEIGHT = 0.5
+
+
+def binarize(roi):
+    """灰度化后用Otsu阈值二值化，前景（数字）取占比较少的一侧"""
+    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if roi.ndim == 3 else roi
+    _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    mask = mask > 0
+    if mask.mean() > 0.5:
+        mask = ~mask
+    return mask
+
+
+def segment_glyphs(mask):
+    """按列投影切分字形，返回裁到上下边界的字形掩码列表（从左到右）"""
+    columns = mask.any(axis=0)
+    glyphs = []
+    start = None
+    for x, filled in enumerate(np.append(columns, False)):
+        if filled and start is None:
+            start = x
+        elif not filled and start is not None:
+            glyph = mask[:, start:x]
+            rows = np.flatnonzero(glyph.any(axis=1))
+            glyphs.append(glyph[rows[0]:rows[-1] + 1])
+            start = None
+
+    if not glyphs:
+        return []
+    max_height = max(glyph.shape[0] for glyph in glyphs)
+    return [glyph for glyph in glyphs if glyph.shape[0] >= max_height * MIN_GLYPH_HEIGHT]
+
+
+def glyph_vectors(glyphs):
+    """把字形缩放到统一尺寸并去均值、归一化，点积即为相关系数"""
+    vectors = np.stack([cv2.resize(glyph.astype(np.float32), GLYPH_SIZE, interpolation=cv2.INTER_AREA).ravel()
+                        for glyph in glyphs])
+    vectors -= vectors.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-6)
+
+
+class DigitReader:
+    """分数区域专用的数字识别器
+
+    分数使用固定字体，按列切出每个字形后与0-9的模板做相关匹配。
+    模板由高置信度的OCR结果自动学习（按数字累加字形后取平均），可保存到文件。
+    任一字形置信度不足或缺少模板时返回None，由调用方退回OCR。
+    read_only 时不写文件，新学到的样本另外累计，由 take_learned 取出交给负责保存的进程合并。
+    """
+
+    def __init__(self, path=None, min_confidence=MIN_CONFIDENCE, read_only=False):
+        self.path = path
+        self.min_confidence = min_confidence
+        self.read_only = read_only
+        size = GLYPH_SIZE[0] * GLYPH_SIZE[1]
+        self.sums = np.zeros((10, size), dtype=np.float64)
+        self.counts = np.zeros(10, dtype=np.int64)
+        self.learned_sums = np.zeros_like(self.sums)
+        self.learned_counts = np.zeros_like(self.counts)
+        self._templates = None
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self.load()
+
+    @property
+    def templates(self):
+        """平均后的模板向量 (10, 像素数)，没有样本的数字为全零"""
+        if self._templates is None:
+            means = self.sums / np.maximum(self.counts, 1)[:, None]
+            means -= means.mean(axis=1, keepdims=True)
+            norms = np.linalg.norm(means, axis=1, keepdims=True)
+            self._templates = (means / np.maximum(norms, 1e-6)).astype(np.float32)
+        return self._templates
+
+    def read(self, roi):
+        """返回 (数字文本, 置信度)；无法可靠识别时返回 (None, 置信度)"""
+        glyphs = segment_glyphs(binarize(roi))
+        if not glyphs or not self.counts.any():
+            self.misses += 1
+            return None, 0.0
+
+        scores = glyph_vectors(glyphs) @ self.templates.T
+        # 没有学到的数字不参与比较
+        scores[:, self.counts == 0] = -1.0
+        digits = scores.argmax(axis=1)
+        confidence = float(scores.max(axis=1).min())
+        if confidence < self.min_confidence:
+            self.misses += 1
+            return None, confidence
+
+        self.hits += 1
+        return ''.join(str(digit) for digit in digits), confidence
+
+    def learn(self, roi, text):
+        """用已知文本学习模板，字形数与数字位数不一致时跳过"""
+        digits = [int(c) for c in text if c.isdigit()]
+        glyphs = segment_glyphs(binarize(roi))
+        if not digits or len(digits) != len(glyphs):
+            return False
+        for digit, vector in zip(digits, glyph_vectors(glyphs)):
+            self.sums[digit] += vector
+            self.counts[digit] += 1
+            if self.read_only:
+                self.learned_sums[digit] += vector
+                self.learned_counts[digit] += 1
+        self._templates = None
+        return True
+
+    def take_learned(self):
+        """取出上次调用以来新学到的样本 (sums, counts)，没有时返回None"""
+        if not self.learned_counts.any():
+            return None
+        learned = (self.learned_sums, self.learned_counts)
+        self.learned_sums = np.zeros_like(self.sums)
+        self.learned_counts = np.zeros_like(self.counts)
+        return learned
+
+    def merge_learned(self, learned):
+        """合并其他进程 take_learned 取出的样本"""
+        sums, counts = learned
+        self.sums += sums
+        self.counts += counts
+        self._templates = None
+
+    def learn_from_ocr(self, roi, txts, scores):
+        """OCR结果为纯数字且置信度足够高时用来学习模板"""
+        if not txts or not scores or scores[0] < LEARN_SCORE:
+            return False
+        text = txts[0].replace(',', '').strip()
+        if not text.isdigit():
+            return False
+        return self.learn(roi, text)
+
+    def load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                data = np.load(f)
+                sums, counts = data['sums'], data['counts']
+        except (FileNotFoundError, KeyError, ValueError, OSError):
+            return
+        # 字形尺寸变化后旧模板不可用
+        if sums.shape == self.sums.shape:
+            self.sums, self.counts = sums, counts
+            self._templates = None
+
+    def save(self):
+        if not self.path or self.read_only:
+            return
+        tmp_file = self.path + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            np.savez(f, sums=self.sums, counts=self.counts)
+        os.replace(tmp_file, self.path)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'learned_digits': int((self.counts > 0).sum()),
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"🔢 数字识别: 模板识别 {stats['hits']} 次, 退回OCR {stats['misses']} 次, "
+              f"命中率 {stats['hit_rate']:.0%}, 已学习 {stats['learned_digits']}/10 个数字")
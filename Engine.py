@@ -0,0 +1,184 @@
+import os
+
+# 可选：直接使用 onnxruntime 重建识别会话，以设置 RapidOCR 参数中没有开放的图优化级别和执行模式
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+# 环境变量：本机分给识别的CPU核数，多个识别任务共用一台机器时按需调小
+CPU_BUDGET_ENV = 'PRR_CPU_BUDGET'
+
+GRAPH_OPT_LEVELS = {
+    'disable': 'ORT_DISABLE_ALL',
+    'basic': 'ORT_ENABLE_BASIC',
+    'extended': 'ORT_ENABLE_EXTENDED',
+    'all': 'ORT_ENABLE_ALL',
+}
+
+EXECUTION_MODES = {
+    'sequential': 'ORT_SEQUENTIAL',
+    'parallel': 'ORT_PARALLEL',
+}
+
+# RapidOCR 创建识别会话时使用的图优化级别和执行模式
+RAPIDOCR_SESSION_DEFAULTS = {
+    'graph_optimization_level': 'all',
+    'execution_mode': 'sequential',
+}
+
+
+def cpu_budget():
+    """可用于识别的CPU核数：优先取环境变量，其次取本进程可用的核数"""
+    budget = os.environ.get(CPU_BUDGET_ENV)
+    if budget:
+        return max(1, int(budget))
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def session_config(workers=1, budget=None, intra_threads=None, inter_threads=None,
+                   graph_opt='all', execution_mode='sequential', mem_arena=True):
+    """生成ORT会话配置
+
+    未指定线程数时把CPU预算平分给 workers 个引擎，每个引擎的算子内线程数为
+    budget // workers（至少1），算子间线程固定为1（顺序执行模式下不会使用）。
+    """
+    budget = budget or cpu_budget()
+    workers = max(1, workers)
+    return {
+        'cpu_budget': budget,
+        'workers': workers,
+        'intra_op_num_threads': intra_threads or max(1, budget // workers),
+        'inter_op_num_threads': inter_threads or 1,
+        'graph_optimization_level': graph_opt,
+        'execution_mode': execution_mode,
+        'enable_cpu_mem_arena': mem_arena,
+    }
+
+
+def engine_params(base_params, config):
+    """把会话配置中 RapidOCR 支持的部分合并进引擎参数"""
+    params = dict(base_params)
+    params['EngineConfig.onnxruntime.intra_op_num_threads'] = config['intra_op_num_threads']
+    params['EngineConfig.onnxruntime.inter_op_num_threads'] = config['inter_op_num_threads']
+    params['EngineConfig.onnxruntime.enable_cpu_mem_arena'] = config['enable_cpu_mem_arena']
+    return params
+
+
+def session_options(config):
+    """按配置生成 onnxruntime.SessionOptions"""
+    options = ort.SessionOptions()
+    options.log_severity_level = 4
+    options.intra_op_num_threads = config['intra_op_num_threads']
+    options.inter_op_num_threads = config['inter_op_num_threads']
+    options.graph_optimization_level = getattr(ort.GraphOptimizationLevel,
+                                               GRAPH_OPT_LEVELS[config['graph_optimization_level']])
+    options.execution_mode = getattr(ort.ExecutionMode, EXECUTION_MODES[config['execution_mode']])
+    options.enable_cpu_mem_arena = config['enable_cpu_mem_arena']
+    return options
+
+
+def needs_session_rebuild(config):
+    """线程数和内存池通过 RapidOCR 参数设置，只有图优化级别或执行模式与其默认值不同时才需要重建会话"""
+    return any(config[key] != value for key, value in RAPIDOCR_SESSION_DEFAULTS.items())
+
+
+def apply_session_config(engine, config):
+    """让识别模型的ORT会话使用完整的会话配置，返回是否生效
+
+    配置与 RapidOCR 的默认会话一致时不做任何事，识别模型仍在第一次识别时只加载一次；
+    否则先加载识别模型再按配置重建会话（模型会再加载一次）。
+    未生效时给出提示并保留 RapidOCR 创建的会话（只有线程数和内存池设置）。
+    """
+    if not needs_session_rebuild(config):
+        return True
+    if ort is None:
+        print("⚠️ 未安装onnxruntime，图优化级别和执行模式未生效")
+        return False
+    load_rec_model = getattr(engine, '_load_rec_model', None)
+    try:
+        text_rec = load_rec_model() if load_rec_model else getattr(engine, 'text_rec', None)
+        infer_session = getattr(text_rec, 'session', None)
+        session = getattr(infer_session, 'session', None)
+        if session is None or not hasattr(session, 'get_providers'):
+            print("⚠️ 识别模型不是ONNX Runtime会话，图优化级别和执行模式未生效")
+            return False
+        # 模型路径只能从会话的内部属性取得，onnxruntime 版本不同时可能没有
+        model_path = getattr(session, '_model_path', None)
+        if model_path is None:
+            print("⚠️ 无法从识别会话取得模型路径，图优化级别和执行模式未生效")
+            return False
+        infer_session.session = ort.InferenceSession(model_path, sess_options=session_options(config),
+                                                     providers=session.get_providers())
+    except Exception as e:
+        print(f"⚠️ ORT会话配置未生效，使用默认设置: {e}")
+        return False
+    if config['execution_mode'] == 'parallel' and config['inter_op_num_threads'] <= 1:
+        # 算子间线程只有1个时 onnxruntime 会改回顺序执行
+        print("⚠️ 并行执行模式需要 --inter-threads 大于1，实际按顺序执行")
+    return True
+
+
+def _option_name(value, names):
+    name = str(value).split('.')[-1]
+    return next((key for key, ort_name in names.items() if ort_name == name), name)
+
+
+def effective_options(engine):
+    """从识别模型的ORT会话读回实际生效的设置，取不到时返回None"""
+    session = getattr(getattr(getattr(engine, 'text_rec', None), 'session', None), 'session', None)
+    if session is None or not hasattr(session, 'get_session_options'):
+        return None
+    options = session.get_session_options()
+    return {
+        'intra_op_num_threads': options.intra_op_num_threads,
+        'inter_op_num_threads': options.inter_op_num_threads,
+        'graph_optimization_level': _option_name(options.graph_optimization_level, GRAPH_OPT_LEVELS),
+        'execution_mode': _option_name(options.execution_mode, EXECUTION_MODES),
+        'enable_cpu_mem_arena': options.enable_cpu_mem_arena,
+    }
+
+
+def create_engine(base_params, config):
+    """按会话配置创建OCR引擎，engine.session_applied 记录完整的会话配置是否生效"""
+    # 只在真正创建引擎时导入，只用到命令行参数的脚本不必加载 rapidocr
+    from rapidocr import RapidOCR
+    engine = RapidOCR(params=engine_params(base_params, config))
+    engine.session_applied = apply_session_config(engine, config)
+    return engine
+
+
+def describe_config(config, engine=None):
+    """会话配置的可读描述，随性能测试结果一起保存
+
+    传入引擎时 applied 记录图优化级别、执行模式等是否真正生效（未生效时只有线程数和内存池设置有效），
+    effective 为从会话读回的实际设置。
+    """
+    description = {key: config[key] for key in ('cpu_budget', 'workers', 'intra_op_num_threads',
+                                                'inter_op_num_threads', 'graph_optimization_level',
+                                                'execution_mode', 'enable_cpu_mem_arena')}
+    if engine is not None:
+        description['applied'] = getattr(engine, 'session_applied', False)
+        description['effective'] = effective_options(engine)
+    return description
+
+
+def add_session_arguments(parser):
+    """在命令行解析器中加入ORT会话相关参数"""
+    parser.add_argument('--cpu-budget', type=int, default=None,
+                        help=f"分给识别的CPU核数，默认取环境变量 {CPU_BUDGET_ENV} 或全部可用核")
+    parser.add_argument('--intra-threads', type=int, default=None,
+                        help="每个引擎的算子内线程数，默认按CPU预算平分")
+    parser.add_argument('--inter-threads', type=int, default=None, help="每个引擎的算子间线程数")
+    parser.add_argument('--graph-opt', choices=list(GRAPH_OPT_LEVELS), default='all', help="图优化级别")
+    parser.add_argument('--execution-mode', choices=list(EXECUTION_MODES), default='sequential',
+                        help="算子执行模式")
+    parser.add_argument('--no-mem-arena', action='store_true', help="关闭CPU内存池")
+
+
+def config_from_args(args, workers=1):
+    """由命令行参数生成会话配置"""
+    return session_config(workers, args.cpu_budget, args.intra_threads, args.inter_threads,
+                          args.graph_opt, args.execution_mode, not args.no_mem_arena)
@@ -0,0 +1,139 @@
+from collections import namedtuple
+from functools import lru_cache
+
+# 宽高比相差超过该比例时认为不是同一种布局
+ASPECT_TOLERANCE = 0.02
+
+FIELDS = ('song', 'artist', 'rating')
+
+# 某一分辨率下换算好的像素坐标：类型探针、各类型的难度探针和 (歌名, 曲师, 分数) 区域
+PixelLayout = namedtuple('PixelLayout', ['name', 'size', 'type_probe', 'level_probes', 'regions'])
+
+# 布局注册表，每个机型一项：坐标按截图宽、高归一化到 0~1，同一宽高比的任意分辨率都按比例换算；
+# size 是采集坐标所用截图的分辨率，只用于按原始分辨率绘制合成截图
+DEVICE_LAYOUTS = []
+
+# 原脚本（OCR.py、test.py 等）写死的像素坐标
+ORIGINAL_TYPE_PROBE = (27, 1934)
+ORIGINAL_SCREENS = {
+    'type1': {
+        'level_probe': (1590, 441),
+        'song': (935, 266, 2272, 346),
+        'artist': (1000, 351, 2200, 425),
+        'rating': (559, 1180, 1319, 1323),
+    },
+    'type2': {
+        'level_probe': (2982, 1520),
+        'song': (1603, 454, 3016, 535),
+        'artist': (1681, 555, 3018, 624),
+        'rating': (1946, 1485, 2420, 1596),
+    },
+}
+
+
+def _screen_points(type_probe, screens):
+    """布局中所有需要落在截图内的像素点：探针点和各区域的左上角、右下角"""
+    points = [type_probe]
+    for screen in screens.values():
+        points.append(screen['level_probe'])
+        for field in FIELDS:
+            x1, y1, x2, y2 = screen[field]
+            points += [(x1, y1), (x2 - 1, y2 - 1)]
+    return points
+
+
+def _fits(points, size):
+    return all(0 <= x < size[0] and 0 <= y < size[1] for x, y in points)
+
+
+def register_layout(name, size, type_probe, screens):
+    """登记一个机型的布局
+
+    坐标是在 size 分辨率的截图上采集的像素坐标（例如用 Count.py 点选），登记时换算成归一化坐标。
+    screens 为 {截图类型: {'level_probe': (x, y), 'song'/'artist'/'rating': (x1, y1, x2, y2)}}，
+    坐标超出 size 时抛出 ValueError。
+    """
+    width, height = size
+    for point in _screen_points(type_probe, screens):
+        if not _fits([point], size):
+            raise ValueError(f"布局 {name} 的坐标 {point} 超出截图尺寸 {width}x{height}")
+
+    def point(p):
+        return p[0] / width, p[1] / height
+
+    def region(r):
+        return r[0] / width, r[1] / height, r[2] / width, r[3] / height
+
+    layout = {
+        'name': name,
+        'size': tuple(size),
+        'aspect': width / height,
+        'type_probe': point(type_probe),
+        'screens': {result_type: dict({'level_probe': point(screen['level_probe'])},
+                                      **{field: region(screen[field]) for field in FIELDS})
+                    for result_type, screen in screens.items()},
+    }
+    DEVICE_LAYOUTS.append(layout)
+    layout_for_size.cache_clear()
+    return layout
+
+
+def find_layout(width, height):
+    """先找分辨率完全相同的机型，否则按宽高比选出最接近的布局，没有匹配的布局时返回None"""
+    for layout in DEVICE_LAYOUTS:
+        if layout['size'] == (width, height):
+            return layout
+    aspect = width / height
+    best = min(DEVICE_LAYOUTS, key=lambda layout: abs(layout['aspect'] - aspect), default=None)
+    if best is None or abs(best['aspect'] - aspect) > best['aspect'] * ASPECT_TOLERANCE:
+        return None
+    return best
+
+
+def _to_point(point, width, height):
+    # 探针点不能落到图像边界之外
+    return min(round(point[0] * width), width - 1), min(round(point[1] * height), height - 1)
+
+
+def _to_region(region, width, height):
+    x1, y1, x2, y2 = region
+    return round(x1 * width), round(y1 * height), round(x2 * width), round(y2 * height)
+
+
+def original_layout(width, height):
+    """原脚本写死的像素坐标，整个布局都落在截图内时返回，否则返回None"""
+    if not _fits(_screen_points(ORIGINAL_TYPE_PROBE, ORIGINAL_SCREENS), (width, height)):
+        return None
+    return PixelLayout('original', (width, height), ORIGINAL_TYPE_PROBE,
+                       {result_type: screen['level_probe'] for result_type, screen in ORIGINAL_SCREENS.items()},
+                       {result_type: tuple(screen[field] for field in FIELDS)
+                        for result_type, screen in ORIGINAL_SCREENS.items()})
+
+
+@lru_cache(maxsize=None)
+def layout_for_size(width, height):
+    """返回指定分辨率下的像素坐标布局，同一分辨率只换算一次
+
+    按宽高比匹配登记的布局，把归一化坐标换算成像素坐标；没有匹配的布局时，
+    与原脚本一样直接使用写死的像素坐标（如16:9、4K截图），坐标超出截图时返回None。
+    """
+    layout = find_layout(width, height)
+    if layout is None:
+        return original_layout(width, height)
+
+    level_probes = {}
+    regions = {}
+    for result_type, screen in layout['screens'].items():
+        level_probes[result_type] = _to_point(screen['level_probe'], width, height)
+        regions[result_type] = tuple(_to_region(screen[field], width, height) for field in FIELDS)
+    return PixelLayout(layout['name'], (width, height), _to_point(layout['type_probe'], width, height),
+                       level_probes, regions)
+
+
+# 写死坐标的采集分辨率没有记录下来；坐标最大到 x=3018、y=1934，按 3200x2000 (16:10) 登记。
+# 确认了实际分辨率时修改 size 即可，不要手工换算坐标
+ORIGINAL_LAYOUT = register_layout('16:10', size=(3200, 2000), type_probe=ORIGINAL_TYPE_PROBE,
+                                  screens=ORIGINAL_SCREENS)
+
+# 原机型分辨率下的布局，坐标与原先写死的像素坐标一致
+REFERENCE_LAYOUT = layout_for_size(*ORIGINAL_LAYOUT['size'])
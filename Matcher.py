@@ -0,0 +1,140 @@
+from Catalog import normalize_text
+
+# 联合匹配的默认权重，等权时总分与逐级匹配的 total_score 含义相同
+JOINT_WEIGHTS = {'difficulty': 1.0, 'artist': 1.0, 'title': 1.0}
+
+# 可选：rapidfuzz 提供多线程的批量匹配，未安装时调用方退回 fuzzywuzzy 逐条循环
+try:
+    import numpy as np
+    from rapidfuzz import fuzz, process
+    SCORERS = {
+        'ratio': fuzz.ratio,
+        'partial_ratio': fuzz.partial_ratio,
+        'token_sort_ratio': fuzz.token_sort_ratio,
+    }
+except ImportError:
+    from fuzzywuzzy import fuzz as fw_fuzz
+    process = None
+    SCORERS = {}
+
+HAVE_RAPIDFUZZ = process is not None
+
+
+def extract_best(ocr_text, items, keys, scorer='partial_ratio', threshold=70):
+    """单条查询，返回 (best_match, score)，约定与 fuzzywuzzy 版本相同
+
+    keys 为与 items 一一对应的已规范化文本；同分时取靠前的候选，分数取整。
+    """
+    if not keys:
+        return None, 0
+    result = process.extractOne(normalize_text(ocr_text), keys, scorer=SCORERS[scorer],
+                                processor=None, score_cutoff=threshold)
+    if result is None:
+        return None, 0
+    _, score, index = result
+    return items[index], int(round(score))
+
+
+def match_batch(ocr_texts, items, keys, scorer='partial_ratio', threshold=70, workers=-1):
+    """批量查询：一次原生多线程调用算出所有查询对所有候选的分数矩阵
+
+    返回与 ocr_texts 一一对应的 (best_match, score) 列表。
+    """
+    if not ocr_texts or not keys:
+        return [(None, 0)] * len(ocr_texts)
+
+    queries = [normalize_text(text) for text in ocr_texts]
+    scores = process.cdist(queries, keys, scorer=SCORERS[scorer], processor=None,
+                           score_cutoff=threshold, workers=workers)
+    best_indexes = np.argmax(scores, axis=1)
+
+    matches = []
+    for row, index in enumerate(best_indexes):
+        score = scores[row, index]
+        if score > 0 and score >= threshold:
+            matches.append((items[index], int(round(score))))
+        else:
+            matches.append((None, 0))
+    return matches
+
+
+def score_matrix(ocr_keys, keys):
+    """多条查询对一组候选的 partial_ratio 分数，每条查询一行（列表）
+
+    安装了rapidfuzz时一次原生多线程调用算完整个矩阵。
+    """
+    if not keys:
+        return [[] for _ in ocr_keys]
+    if HAVE_RAPIDFUZZ:
+        return process.cdist(ocr_keys, keys, scorer=fuzz.partial_ratio, processor=None, workers=-1).tolist()
+    return [[fw_fuzz.partial_ratio(ocr_key, key) for key in keys] for ocr_key in ocr_keys]
+
+
+def score_all(ocr_key, keys):
+    """一条查询对一组候选的 partial_ratio 分数列表"""
+    return score_matrix([ocr_key], keys)[0]
+
+
+def combine_joint(catalog, difficulty_scores, artist_scores, title_scores, weights, threshold):
+    """按行组合三个字段的分数，选出最佳歌曲，返回值同 match_joint"""
+    weight_sum = sum(weights.values())
+    if HAVE_RAPIDFUZZ:
+        totals = (weights['difficulty'] * np.asarray(difficulty_scores)[catalog.difficulty_ids]
+                  + weights['artist'] * np.asarray(artist_scores)[catalog.artist_ids]
+                  + weights['title'] * np.asarray(title_scores)) / weight_sum
+        order = np.argsort(-totals, kind='stable')
+        totals = totals.tolist()
+    else:
+        totals = [(weights['difficulty'] * difficulty_scores[d]
+                   + weights['artist'] * artist_scores[a]
+                   + weights['title'] * t) / weight_sum
+                  for d, a, t in zip(catalog.difficulty_ids, catalog.artist_ids, title_scores)]
+        order = sorted(range(len(totals)), key=lambda i: -totals[i])
+
+    if not totals:
+        return None, 0, 0, {}
+
+    best = order[0]
+    best_song = catalog.songs[best]
+    runner_up = 0
+    for index in order[1:]:
+        song = catalog.songs[index]
+        if song.get('title') != best_song.get('title') or song.get('artist') != best_song.get('artist'):
+            runner_up = totals[index]
+            break
+
+    components = {
+        'difficulty': difficulty_scores[catalog.difficulty_ids[best]],
+        'artist': artist_scores[catalog.artist_ids[best]],
+        'title': title_scores[best],
+    }
+    total_score = totals[best]
+    if total_score < threshold:
+        return None, total_score, total_score - runner_up, components
+    return best_song, total_score, total_score - runner_up, components
+
+
+def match_joint_batch(queries, catalog, weights=None, threshold=70):
+    """多张截图一起做联合匹配，queries 为 (难度, 曲师, 歌名) 列表
+
+    三个字段各用一次 score_matrix 对整个目录打分，返回与 queries 一一对应的 match_joint 结果。
+    """
+    weights = weights or JOINT_WEIGHTS
+    if not queries:
+        return []
+    difficulty_rows = score_matrix([normalize_text(q[0]) for q in queries], catalog.all_difficulties.keys)
+    artist_rows = score_matrix([normalize_text(q[1]) for q in queries], catalog.all_artists.keys)
+    title_rows = score_matrix([normalize_text(q[2]) for q in queries], catalog.title_keys)
+    return [combine_joint(catalog, difficulty_scores, artist_scores, title_scores, weights, threshold)
+            for difficulty_scores, artist_scores, title_scores in zip(difficulty_rows, artist_rows, title_rows)]
+
+
+def match_joint(ocr_difficulty, ocr_artist, ocr_song, catalog, weights=None, threshold=70):
+    """联合匹配：对目录中每一行 (歌名, 曲师, 难度) 只打一次加权总分
+
+    曲师和难度先按去重后的列表各打一次分，再按行组合，每张截图的开销固定为
+    一次歌名全量打分加一次曲师全量打分。
+    返回 (best_song, total_score, margin, component_scores)，margin 为与次优的
+    其他歌曲（歌名或曲师不同）之间的分差；总分低于 threshold 时 best_song 为None。
+    """
+    return match_joint_batch([(ocr_difficulty, ocr_artist, ocr_song)], catalog, weights, threshold)[0]
@@ -0,0 +1,117 @@
+import random
+import unicodedata
+from collections import Counter, defaultdict
+from itertools import groupby
+
+
+def is_cjk(ch):
+    """中日韩文字（含假名、韩文），单字就有足够区分度"""
+    return ch.isalpha() and unicodedata.east_asian_width(ch) in ('W', 'F')
+
+
+def text_grams(text, n=3):
+    """已规范化文本的字符n-gram集合
+
+    拉丁字母按单词加空格填充后取n元组；中日韩文字取单字和二元组。
+    """
+    grams = set()
+    for cjk, chars in groupby(text, key=is_cjk):
+        run = ''.join(chars)
+        if cjk:
+            grams.update(run)
+            grams.update(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            for word in run.split():
+                padded = f' {word} '
+                grams.update(padded[i:i + n] for i in range(max(1, len(padded) - n + 1)))
+    return grams
+
+
+class NGramIndex:
+    """n-gram 倒排索引，按共享n-gram数量给出候选短名单"""
+
+    def __init__(self, keys, n=3):
+        self.keys = list(keys)
+        self.n = n
+        self.postings = defaultdict(list)
+        for index, key in enumerate(self.keys):
+            for gram in text_grams(key, n):
+                self.postings[gram].append(index)
+
+    def shortlist(self, query_key, k=20):
+        """返回共享n-gram最多的前k个候选下标"""
+        counts = Counter()
+        for gram in text_grams(query_key, self.n):
+            for index in self.postings.get(gram, ()):
+                counts[index] += 1
+        return [index for index, _ in counts.most_common(k)]
+
+
+def shortlist_match(ocr_key, items, index, match_func, k=20, threshold=70):
+    """先用n-gram索引取短名单，只对短名单调用 match_func 打分
+
+    match_func 的签名与 method_partial_ratio 相同：(ocr_text, items, threshold, keys=...)
+    """
+    candidates = index.shortlist(ocr_key, k)
+    return match_func(ocr_key, [items[i] for i in candidates], threshold,
+                      keys=[index.keys[i] for i in candidates])
+
+
+def simulate_ocr_noise(text, rng):
+    """模拟OCR误差：截断、丢字、错字"""
+    chars = list(text)
+    if len(chars) > 6 and rng.random() < 0.3:
+        chars = chars[:rng.randint(len(chars) // 2, len(chars) - 1)]
+    for _ in range(rng.randint(0, 2)):
+        if len(chars) > 3:
+            position = rng.randrange(len(chars))
+            if rng.random() < 0.5:
+                del chars[position]
+            else:
+                chars[position] = rng.choice('abcdefghijklmnopqrstuvwxyz')
+    return ''.join(chars)
+
+
+def recall_check(queries, items, index, match_func, k=20, threshold=70, min_recall=0.99):
+    """对比短名单匹配和全量扫描，返回召回率（全量扫描匹配成功的查询中，短名单得到同样分数的比例）"""
+    total = 0
+    agree = 0
+    misses = []
+    for query in queries:
+        _, full_score = match_func(query, items, threshold, keys=index.keys)
+        if not full_score:
+            continue
+        total += 1
+        _, short_score = shortlist_match(query, items, index, match_func, k, threshold)
+        if short_score == full_score:
+            agree += 1
+        else:
+            misses.append((query, full_score, short_score))
+
+    recall = agree / total if total else 1.0
+    print(f"短名单召回率: {recall:.2%} ({agree}/{total}, k={k})")
+    for query, full_score, short_score in misses[:10]:
+        print(f"  '{query}': 全量 {full_score}%, 短名单 {short_score}%")
+    if recall < min_recall:
+        print(f"❌ 召回率低于要求的 {min_recall:.2%}，请增大 k")
+    return recall, recall >= min_recall
+
+
+if __name__ == "__main__":
+    import sys
+    import argparse
+    from Catalog import load_catalog
+    from test3 import method_partial_ratio
+
+    parser = argparse.ArgumentParser(description="检查n-gram短名单相对全量扫描的召回率")
+    parser.add_argument('--k', type=int, default=20, help="短名单长度")
+    parser.add_argument('--min-recall', type=float, default=0.99, help="召回率下限")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    catalog = load_catalog()
+    rng = random.Random(args.seed)
+    queries = [simulate_ocr_noise(key, rng) for key in catalog.title_keys]
+    _, ok = recall_check(queries, catalog.songs, catalog.title_index, method_partial_ratio,
+                         args.k, min_recall=args.min_recall)
+    sys.exit(0 if ok else 1)
@@ -1,31 +1,183 @@
-import requests
+import os
 import json
+import argparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from Catalog import build_snapshot
+
+# 可选：ijson 边下载边解析，不把整个响应读进内存
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+API_URL = "https://api.prp.icel.site/songs/"
+SONGS_FILE = 'songs_data.json'
+# 保存上次请求的 ETag / Last-Modified，用于条件请求
+META_FILE = 'songs_data.meta.json'
+# (连接超时, 读取超时)，单位秒
+REQUEST_TIMEOUT = (5, 30)
+
+_session = None
 
 
-def get_all_songs_levels():
-    url = "https://api.prp.icel.site/songs/"
-    response = requests.get(url)
+def get_session():
+    """复用连接池的会话，失败时按指数退避重试"""
+    global _session
+    if _session is None:
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=['GET'])
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers['Accept-Encoding'] = 'gzip, deflate'
+        _session = session
+    return _session
+
+
+def get_all_songs_levels(url=API_URL):
+    response = get_session().get(url, timeout=REQUEST_TIMEOUT)
     response.raise_for_status()
     songs_data = response.json()
     return songs_data
 
 
-if __name__ == "__main__":
-    songs = get_all_songs_levels()
+def iter_simplified_songs(response):
+    """逐首解析响应中的歌曲数组并立即精简，峰值内存不随原始响应大小增长"""
+    if ijson is None:
+        for song in response.json():
+            yield simplify_song(song)
+        return
+
+    # 让 urllib3 解压 gzip 后再交给 ijson
+    response.raw.decode_content = True
+    for song in ijson.items(response.raw, 'item', use_float=True):
+        yield simplify_song(song)
+
+
+def fetch_songs_if_changed(url=API_URL, etag=None, last_modified=None):
+    """条件请求歌曲数据，返回 (精简后的歌曲列表, 响应头)；数据未变化(304)时歌曲列表为None"""
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    with get_session().get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+        if response.status_code == 304:
+            return None, response.headers
+        response.raise_for_status()
+        return list(iter_simplified_songs(response)), response.headers
+
+
+def simplify_song(song):
+    return {
+        "title": song.get("title", "N/A"),
+        "artist": song.get("artist", "N/A"),
+        "level": song.get("level", "N/A"),
+        "difficulty": song.get("difficulty", "N/A")
+    }
+
+
+def song_key(song):
+    """一条谱面记录的唯一标识"""
+    return song['title'], song['artist'], song['difficulty']
+
 
+def diff_songs(old_songs, new_songs):
+    """逐首比较，返回 (新增, 删除, 等级变化[(旧, 新)])"""
+    old_map = {song_key(song): song for song in old_songs}
+    new_map = {song_key(song): song for song in new_songs}
 
-    simplified_songs = []
-    for song in songs:
-        simplified_song = {
-            "title": song.get("title", "N/A"),
-            "artist": song.get("artist", "N/A"),
-            "level": song.get("level", "N/A"),
-            "difficulty": song.get("difficulty", "N/A")
-        }
-        simplified_songs.append(simplified_song)
+    added = [song for key, song in new_map.items() if key not in old_map]
+    removed = [song for key, song in old_map.items() if key not in new_map]
+    changed = [(old_map[key], song) for key, song in new_map.items()
+               if key in old_map and old_map[key] != song]
+    return added, removed, changed
+
+
+def apply_diff(local_songs, added, removed, changed):
+    """把差异应用到本地目录：保留原有顺序，更新等级，删除下架谱面，新增的追加到末尾"""
+    removed_keys = {song_key(song) for song in removed}
+    updates = {song_key(new): new for _, new in changed}
+    songs = [updates.get(song_key(song), song) for song in local_songs
+             if song_key(song) not in removed_keys]
+    songs.extend(added)
+    return songs
+
+
+def load_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def save_songs(songs, songs_file):
+    """写入歌曲数据，并重建索引快照"""
+    with open(songs_file, 'w', encoding='utf-8') as f:
+        json.dump(songs, f, indent=2, ensure_ascii=False)
+
+    # 同时写入预先建好索引的二进制快照，识别脚本启动时直接加载
+    build_snapshot(songs_file)
+
+
+def sync_songs(url=API_URL, songs_file=SONGS_FILE, meta_file=META_FILE, force=False):
+    """增量同步歌曲数据
+
+    带上次的 ETag / Last-Modified 发送条件请求，304时不改动本地文件；
+    数据有变化时只把新增、删除、等级变化应用到本地目录。
+    """
+    local_songs = load_json(songs_file)
+    meta = load_json(meta_file) or {}
+    if force or local_songs is None or meta.get('url') != url:
+        meta = {}
+
+    songs, headers = fetch_songs_if_changed(url, meta.get('etag'), meta.get('last_modified'))
+    if songs is None:
+        print("歌曲数据未变化 (304)，跳过更新")
+        return local_songs
+
+    new_songs = songs
+    if local_songs is None:
+        save_songs(new_songs, songs_file)
+        print(f"\n已保存 {len(new_songs)} 首歌曲信息到 {songs_file}")
+        updated_songs = new_songs
+    else:
+        added, removed, changed = diff_songs(local_songs, new_songs)
+        print(f"新增 {len(added)} 条，删除 {len(removed)} 条，等级变化 {len(changed)} 条")
+        for old, new in changed:
+            print(f"  {new['title']} [{new['difficulty']}]: {old['level']} → {new['level']}")
+
+        updated_songs = local_songs
+        if added or removed or changed:
+            updated_songs = apply_diff(local_songs, added, removed, changed)
+            save_songs(updated_songs, songs_file)
+            print(f"\n已更新 {songs_file}，共 {len(updated_songs)} 首歌曲信息")
+
+    meta = {'url': url, 'etag': headers.get('ETag'), 'last_modified': headers.get('Last-Modified')}
+    with open(meta_file, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    return updated_songs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="同步 Paradigm: Reboot 歌曲数据")
+    parser.add_argument('--url', default=os.environ.get('PRP_API_URL', API_URL), help="歌曲API地址")
+    parser.add_argument('--output', default=SONGS_FILE, help="歌曲数据文件")
+    parser.add_argument('--force', action='store_true', help="忽略缓存的 ETag，强制完整下载")
+    parser.add_argument('--trace-memory', action='store_true', help="打印同步过程的Python内存峰值")
+    args = parser.parse_args()
 
+    if args.trace_memory:
+        import tracemalloc
+        tracemalloc.start()
 
-    with open('songs_data.json', 'w', encoding='utf-8') as f:
-        json.dump(simplified_songs, f, indent=2, ensure_ascii=False)
+    sync_songs(args.url, args.output, os.path.splitext(args.output)[0] + '.meta.json', args.force)
 
-    print(f"\n已保存 {len(simplified_songs)} 首歌曲信息到 songs_data.json")
\ No newline at end of file
+    if args.trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        print(f"内存峰值: {peak / 1024 / 1024:.1f} MB")
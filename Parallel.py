@@ -0,0 +1,105 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import test3
+import Trace
+from Cache import OCRCache
+from Digits import DigitReader
+from Engine import session_config
+from Screenshot import load_screenshot
+from TitleHash import TitleHashIndex
+
+# 子进程内的全局状态，由 init_worker 设置
+_songs_data = None
+_fast = False
+_cache = None
+
+
+def init_worker(fast, cache_path, match_mode, engine_config=None, rec_model=None, digits_path=None,
+                title_hash_path=None, songs_file=None, trace_path=None, cache_size=20000, match_memo_path=None):
+    """子进程初始化：各自创建一次OCR引擎并加载歌曲数据"""
+    global _songs_data, _fast, _cache
+    _fast = fast
+    test3.set_match_mode(match_mode)
+    test3.set_songs_file(songs_file)
+    if trace_path:
+        Trace.enable_worker(trace_path)
+    test3.set_rec_model(rec_model)
+    if digits_path:
+        # 子进程只读加载，不同时写同一个文件；新学到的内容随结果交给主进程合并保存
+        test3.digit_reader = DigitReader(digits_path, read_only=True)
+    if title_hash_path:
+        test3.title_index = TitleHashIndex(title_hash_path, read_only=True)
+    if engine_config is not None:
+        test3.set_engine_config(engine_config)
+    test3.get_engine()
+    _songs_data = test3.load_songs_data()
+    if match_memo_path:
+        # 与数字模板一样只读加载
+        test3.init_match_memo(_songs_data, match_memo_path, read_only=True)
+    if cache_path:
+        _cache = OCRCache(cache_path, cache_size)
+
+
+# 子进程会学习、需要由主进程合并保存的状态（test3 中的全局变量名）
+LEARNED_STATE = ('digit_reader', 'title_index', 'match_memo')
+
+
+def take_learned():
+    """子进程中自上次调用以来新学到的内容 {状态名: 新增内容}，只包含有新内容的项"""
+    learned = {}
+    for name in LEARNED_STATE:
+        state = getattr(test3, name)
+        if state is not None and state.read_only:
+            entries = state.take_learned()
+            if entries is not None:
+                learned[name] = entries
+    return learned
+
+
+def merge_learned(learned):
+    """在主进程中合并子进程学到的内容，运行结束时由 test3.main 统一保存"""
+    for name, entries in learned.items():
+        state = getattr(test3, name)
+        if state is not None:
+            state.merge_learned(entries)
+
+
+def process_file(img_path):
+    """在子进程中处理单张截图，返回 (result_data, 新学到的内容)"""
+    try:
+        with Trace.screenshot(os.path.basename(img_path)):
+            ctx = load_screenshot(img_path, fast=_fast)
+            if ctx is None:
+                return None, take_learned()
+            ctx.result_type = test3.distinguish(ctx)
+            return test3.process_screenshot(ctx, _songs_data, _cache), take_learned()
+    finally:
+        # 子进程没有退出时的回调，每张截图处理完（包括读取失败和出错）就写出记录
+        Trace.flush()
+
+
+def run_parallel(filenames, src_folder, workers, fast=False, cache_path=None, match_mode='cascade',
+                 engine_config=None, rec_model=None, digits_path=None, title_hash_path=None, songs_file=None,
+                 trace_path=None, cache_size=20000, match_memo_path=None, chunksize=4):
+    """多进程处理截图，按传入的文件名顺序逐个产出 result_data
+
+    每个子进程一次领取 chunksize 张截图；使用 spawn 启动，
+    避免子进程继承父进程中已经创建的 ONNX Runtime 会话。
+    engine_config 为各子进程引擎的ORT会话配置，未指定时把CPU预算平分给 workers 个进程。
+    数字模板、歌名图像索引和匹配缓存在各子进程中只读加载，子进程新学到的内容随每张截图的结果
+    传回，合并到主进程的 test3.digit_reader、test3.title_index、test3.match_memo 中。
+    """
+    if engine_config is None:
+        engine_config = session_config(workers)
+    paths = [os.path.join(src_folder, filename) for filename in filenames]
+    mp_context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=init_worker,
+                             initargs=(fast, cache_path, match_mode, engine_config, rec_model, digits_path,
+                                       title_hash_path, songs_file, trace_path, cache_size,
+                                       match_memo_path)) as executor:
+        for result_data, learned in executor.map(process_file, paths, chunksize=chunksize):
+            merge_learned(learned)
+            if result_data is not None:
+                yield result_data
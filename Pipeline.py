@@ -0,0 +1,165 @@
+import os
+import queue
+import threading
+import time
+
+import test3
+import Trace
+from Screenshot import load_screenshot
+
+# 队列结束标记
+_DONE = object()
+
+
+class Stage:
+    """流水线的一个阶段：从输入队列取任务，处理后放入输出队列"""
+
+    def __init__(self, name, func, in_queue, out_queue=None):
+        self.name = name
+        self.func = func
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.count = 0
+        self.busy = 0.0
+        self.depth_total = 0
+        self.depth_max = 0
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+
+    def run(self):
+        while True:
+            # 取任务前记录输入队列深度
+            depth = self.in_queue.qsize()
+            self.depth_total += depth
+            self.depth_max = max(self.depth_max, depth)
+
+            item = self.in_queue.get()
+            if item is _DONE:
+                if self.out_queue is not None:
+                    self.out_queue.put(_DONE)
+                break
+
+            start_time = time.perf_counter()
+            try:
+                output = self.func(item)
+            except Exception as e:
+                print(f"❌ {self.name} 阶段出错: {e}")
+                output = None
+            self.busy += time.perf_counter() - start_time
+            self.count += 1
+
+            if output is not None and self.out_queue is not None:
+                self.out_queue.put(output)
+
+    def stats(self, wall_time):
+        samples = self.count + 1
+        return {
+            'stage': self.name,
+            'items': self.count,
+            'busy_seconds': self.busy,
+            'utilisation': self.busy / wall_time if wall_time else 0.0,
+            'queue_depth_mean': self.depth_total / samples,
+            'queue_depth_max': self.depth_max,
+        }
+
+
+def decode_stage(fast, cache=None):
+    def decode(img_path):
+        """读取解码、判断类型并识别难度，取出区域；传入 cache 时先查缓存，命中则不解码区域
+
+        返回 (ctx, 缓存键, 缓存中的原始识别结果)，没有查缓存时后两项为None。
+        """
+        with Trace.screenshot(os.path.basename(img_path), 'pipeline.decode'):
+            ctx = load_screenshot(img_path, fast=fast)
+            if ctx is None:
+                return None
+            ctx.result_type = test3.distinguish(ctx)
+            key = raw_results = None
+            # 歌名图像索引要先用歌名区域查找，启用时仍按原顺序由OCR阶段查缓存
+            if cache is not None and test3.title_index is None:
+                ctx.level = test3.get_level(ctx, ctx.result_type)
+                key = test3.cache_key(cache, ctx)
+                raw_results = cache.get(key)
+            if raw_results is None:
+                test3.prepare_screenshot(ctx)
+        return ctx, key, raw_results
+    return decode
+
+
+def ocr_stage(songs_data, cache=None):
+    def ocr(item):
+        """识别三个区域（缓存命中时直接使用缓存结果，歌名图像命中时只识别分数），识别完后释放整图"""
+        ctx, key, raw_results = item
+        known_song = None
+        with Trace.screenshot(ctx.filename, 'pipeline.ocr'):
+            if raw_results is not None:
+                ocr_texts = test3.clean_raw_results(raw_results)
+            elif key is not None:
+                raw_results = test3.ocr_rois(ctx.rois)
+                cache.put(key, raw_results)
+                ocr_texts = test3.clean_raw_results(raw_results)
+            else:
+                known_song = test3.lookup_title(ctx, songs_data)
+                if known_song is not None:
+                    ocr_texts = test3.recognize_rois({'rating': ctx.rois['rating']})
+                else:
+                    ocr_texts = test3.recognize_screenshot(ctx, cache)
+        ctx.release()
+        return ctx, ocr_texts, known_song
+    return ocr
+
+
+def match_stage(songs_data):
+    def match(item):
+        ctx, ocr_texts, known_song = item
+        test3.print_file_header(ctx.filename)
+        if known_song is not None:
+            return test3.known_title_result(ctx, ocr_texts, known_song)
+        with Trace.screenshot(ctx.filename, 'pipeline.match'):
+            result_data = test3.match_screenshot(ctx, ocr_texts, songs_data)
+            test3.remember_title(ctx, result_data)
+        return result_data
+    return match
+
+
+def run_pipeline(filenames, src_folder, songs_data, queue_size=4, fast=False, cache=None):
+    """流水线处理截图：解码 → OCR → 匹配 → 写入，各阶段通过有界队列连接
+
+    已解码截图队列最多缓存 queue_size 张，结果顺序与 filenames 一致，写入结果日志；
+    传入 cache 时解码阶段先查缓存，命中的截图不解码区域也不经过识别。返回得到结果的截图数。
+    """
+    path_queue = queue.Queue()
+    decoded_queue = queue.Queue(maxsize=queue_size)
+    ocr_queue = queue.Queue(maxsize=queue_size)
+    result_queue = queue.Queue(maxsize=queue_size)
+
+    for filename in filenames:
+        path_queue.put(os.path.join(src_folder, filename))
+    path_queue.put(_DONE)
+
+    stages = [
+        Stage('decode', decode_stage(fast, cache), path_queue, decoded_queue),
+        Stage('ocr', ocr_stage(songs_data, cache), decoded_queue, ocr_queue),
+        Stage('match', match_stage(songs_data), ocr_queue, result_queue),
+        Stage('write', test3.collect_result, result_queue),
+    ]
+
+    start_time = time.perf_counter()
+    for stage in stages:
+        stage.thread.start()
+    for stage in stages:
+        stage.thread.join()
+    wall_time = time.perf_counter() - start_time
+
+    print_stage_report([stage.stats(wall_time) for stage in stages], wall_time)
+    return stages[-1].count
+
+
+def print_stage_report(stage_stats, wall_time):
+    """打印各阶段的利用率和输入队列深度"""
+    print("\n" + "=" * 70)
+    print(f"流水线统计 (总耗时 {wall_time:.2f} 秒)")
+    print("=" * 70)
+    print(f"{'阶段':<8}{'数量':>6}{'忙碌(秒)':>12}{'利用率':>10}{'队列均值':>10}{'队列最大':>10}")
+    for stats in stage_stats:
+        print(f"{stats['stage']:<8}{stats['items']:>6}{stats['busy_seconds']:>12.2f}"
+              f"{stats['utilisation']:>10.0%}{stats['queue_depth_mean']:>10.1f}{stats['queue_depth_max']:>10}")
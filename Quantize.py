@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import argparse
+import numpy as np
+
+import test3
+from Batch import FIELDS, collect_crops
+from Engine import create_engine
+from Screenshot import load_screenshot
+
+# 可选：onnxruntime 自带的量化工具，只有生成INT8模型时需要
+try:
+    import onnx
+    import onnxruntime as ort
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                          quantize_dynamic, quantize_static)
+except ImportError:
+    CalibrationDataReader = object
+    quantize_dynamic = quantize_static = None
+
+INT8_MODEL_FILE = 'rec_int8.onnx'
+# QDQ格式按通道量化时 DequantizeLinear 需要 axis 属性，opset 13 起才支持。
+# 模型的 opset 取决于导出方式，不能按 PP-OCR 版本推断（例如 PP-OCRv6 small 识别模型为 opset 11），
+# 量化前从模型文件读取
+PER_CHANNEL_MIN_OPSET = 13
+LABELS_FILE = 'labels.json'
+REPORT_FILE = 'quant_report.json'
+
+# 识别字段与标注字段的对应关系
+LABEL_KEYS = {'song': 'title', 'artist': 'artist', 'rating': 'rating'}
+
+
+def rec_model_path(engine):
+    """当前引擎使用的识别模型文件"""
+    # RapidOCR 在第一次识别时才加载识别模型，创建后 text_rec 为None
+    return engine._load_rec_model().session.session._model_path
+
+
+def model_opset(path):
+    """模型的默认域 opset 版本"""
+    model = onnx.load(path, load_external_data=False)
+    return next((entry.version for entry in model.opset_import if entry.domain in ('', 'ai.onnx')), 0)
+
+
+def character_list(path):
+    """模型元数据中的字符表，识别器按它把输出解码成文字"""
+    session = ort.InferenceSession(path, providers=['CPUExecutionProvider'])
+    return session.get_modelmeta().custom_metadata_map.get('character')
+
+
+def load_contexts(src_folder, limit=None):
+    """读取截图并取出三个区域，释放整图后返回上下文列表"""
+    contexts = []
+    for filename in test3.list_screenshots(src_folder)[:limit]:
+        ctx = load_screenshot(os.path.join(src_folder, filename))
+        if ctx is None:
+            continue
+        ctx.result_type = test3.distinguish(ctx)
+        test3.prepare_screenshot(ctx)
+        ctx.release()
+        contexts.append(ctx)
+    return contexts
+
+
+def calibration_batches(engine, imgs, batch_size=8):
+    """按识别器自己的预处理把区域图转成模型输入，同一批内按最宽的图补齐"""
+    text_rec = engine._load_rec_model()
+    _, img_h, img_w = text_rec.rec_image_shape[:3]
+    for start in range(0, len(imgs), batch_size):
+        chunk = imgs[start:start + batch_size]
+        max_wh_ratio = max([img_w / img_h] + [img.shape[1] / img.shape[0] for img in chunk])
+        yield np.stack([text_rec.resize_norm_img(img, max_wh_ratio) for img in chunk]).astype(np.float32)
+
+
+class CropCalibrationReader(CalibrationDataReader):
+    """用我们自己的歌名/曲师/分数区域做静态量化校准"""
+
+    def __init__(self, input_name, batches):
+        self.input_name = input_name
+        self.batches = iter(batches)
+
+    def get_next(self):
+        batch = next(self.batches, None)
+        return None if batch is None else {self.input_name: batch}
+
+
+def quantize_rec_model(engine, output_path=INT8_MODEL_FILE, mode='static', calibration_imgs=None):
+    """把引擎当前的FP32识别模型量化为INT8
+
+    dynamic 只量化权重，不需要校准数据；static 同时量化激活，按 calibration_imgs 统计激活范围。
+    先写到临时文件，检查通过后才替换 output_path；量化出错或检查不通过时不留下任何文件，
+    已有的 output_path 保持不变。
+    """
+    if quantize_dynamic is None:
+        print("请先安装onnxruntime: pip install onnxruntime")
+        return None
+
+    fp32_path = rec_model_path(engine)
+    tmp_path = output_path + '.tmp'
+    try:
+        if mode == 'dynamic':
+            quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+        else:
+            input_name = engine._load_rec_model().session.get_input_names()[0]
+            reader = CropCalibrationReader(input_name, calibration_batches(engine, calibration_imgs))
+            per_channel = model_opset(fp32_path) >= PER_CHANNEL_MIN_OPSET
+            if not per_channel:
+                print(f"ℹ️ 模型 opset 低于 {PER_CHANNEL_MIN_OPSET}，按张量量化权重")
+            quantize_static(fp32_path, tmp_path, reader, quant_format=QuantFormat.QDQ, per_channel=per_channel,
+                            activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+
+        # 识别器从模型元数据读取字符表，缺了它INT8模型无法解码
+        if character_list(tmp_path) != character_list(fp32_path):
+            print(f"❌ INT8模型丢失了字符表元数据，未写入 {output_path}")
+            return None
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    print(f"已生成INT8识别模型 ({mode}): {output_path}")
+    return output_path
+
+
+def edit_distance(a, b):
+    """两个字符串之间的编辑距离"""
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def evaluate(engine, contexts, labels, songs_data):
+    """逐个区域识别并统计速度和准确率"""
+    latencies = []
+    errors = {field: 0 for field in FIELDS}
+    lengths = {field: 0 for field in FIELDS}
+    matched = labelled = 0
+
+    for ctx in contexts:
+        ocr_texts = {}
+        for (_, field), roi in collect_crops(ctx):
+            start_time = time.perf_counter()
+            res = engine(roi, use_cls=False, use_det=False, use_rec=True)
+            latencies.append(time.perf_counter() - start_time)
+            ocr_texts[field] = test3.first_text(list(res.txts or []))
+
+        label = labels.get(ctx.filename)
+        if not label:
+            continue
+        labelled += 1
+        for field, key in LABEL_KEYS.items():
+            expected = str(label.get(key, ''))
+            errors[field] += edit_distance(ocr_texts[field], expected)
+            lengths[field] += len(expected)
+
+        best_song = test3.memoized_match(ctx.level, ocr_texts['artist'], ocr_texts['song'], songs_data)[2]
+        if best_song and all(best_song.get(key) == label.get(key) for key in ('title', 'artist', 'difficulty')):
+            matched += 1
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'crops': len(latencies),
+        'crops_per_second': len(latencies) / (latencies_ms.sum() / 1000) if latencies else 0.0,
+        'p50_ms': float(np.percentile(latencies_ms, 50)) if latencies else 0.0,
+        'p95_ms': float(np.percentile(latencies_ms, 95)) if latencies else 0.0,
+        'char_accuracy': {field: 1 - errors[field] / lengths[field] if lengths[field] else None
+                          for field in FIELDS},
+        'labelled': labelled,
+        'match_accuracy': matched / labelled if labelled else None,
+    }
+
+
+def compare_models(src_folder, labels_file=LABELS_FILE, int8_path=INT8_MODEL_FILE, report_file=REPORT_FILE):
+    """在带标注的本地截图上对比FP32和INT8识别模型"""
+    try:
+        with open(labels_file, 'r', encoding='utf-8') as f:
+            labels = json.load(f)
+    except FileNotFoundError:
+        print(f"{labels_file} 文件未找到，格式为 {{文件名: {{title, artist, difficulty, rating}}}}")
+        return None
+
+    songs_data = test3.load_songs_data()
+    contexts = load_contexts(src_folder)
+    if not contexts:
+        print(f"{src_folder} 中没有截图")
+        return None
+
+    report = {}
+    for name, params in (('fp32', test3.OCR_PARAMS),
+                         ('int8', dict(test3.OCR_PARAMS, **{'Rec.model_path': int8_path}))):
+        engine = create_engine(params, test3.ENGINE_CONFIG)
+        # 预热
+        engine(contexts[0].rois['song'], use_cls=False, use_det=False, use_rec=True)
+        report[name] = evaluate(engine, contexts, labels, songs_data)
+
+    print("=" * 70)
+    print(f"INT8量化对比: {report['fp32']['crops']} 个区域, {report['fp32']['labelled']} 张带标注截图")
+    print("=" * 70)
+    for name, result in report.items():
+        accuracy = ', '.join(f"{field} {value:.1%}" for field, value in result['char_accuracy'].items()
+                             if value is not None)
+        match_accuracy = result['match_accuracy']
+        print(f"{name}: {result['crops_per_second']:.1f} 区域/秒, p50 {result['p50_ms']:.1f} 毫秒, "
+              f"p95 {result['p95_ms']:.1f} 毫秒")
+        print(f"      字符准确率: {accuracy or '无标注'}")
+        if match_accuracy is not None:
+            print(f"      歌曲匹配准确率: {match_accuracy:.1%}")
+    print(f"INT8 加速比: {report['int8']['crops_per_second'] / report['fp32']['crops_per_second']:.2f} 倍")
+
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"报告已保存到 {report_file}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="识别模型INT8量化与对比")
+    parser.add_argument('command', choices=['quantize', 'compare'])
+    parser.add_argument('--src', default="SCR", help="截图文件夹（quantize 时作为校准数据）")
+    parser.add_argument('--mode', choices=['static', 'dynamic'], default='static', help="量化方式")
+    parser.add_argument('--calib-limit', type=int, default=None, help="最多使用多少张截图校准")
+    parser.add_argument('--model', default=INT8_MODEL_FILE, help="INT8模型文件")
+    parser.add_argument('--labels', default=LABELS_FILE, help="截图标注文件")
+    parser.add_argument('--report', default=REPORT_FILE, help="对比报告输出文件")
+    args = parser.parse_args()
+
+    if args.command == 'quantize':
+        contexts = load_contexts(args.src, args.calib_limit) if args.mode == 'static' else []
+        if args.mode == 'static' and not contexts:
+            print(f"{args.src} 中没有可用于校准的截图")
+        else:
+            imgs = [roi for ctx in contexts for _, roi in collect_crops(ctx)]
+            quantize_rec_model(test3.get_engine(), args.model, args.mode, imgs)
+    else:
+        compare_models(args.src, args.labels, args.model, args.report)
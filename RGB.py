@@ -1,20 +1,24 @@
 import os
 import time
-import cv2
 from pathlib import Path
-
-
-def classify_screenshot_fast(image_path):
-    img = cv2.imread(image_path)
-    if img is None:
+from Classify import classify_samples, probe_points
+from Decode import jpeg_size, probe_pixels, read_bytes
+from Layout import layout_for_size
+
+
+def probe_screenshot_fast(image_path):
+    """读取类型探针和难度探针的像素，失败时返回错误说明"""
+    data = read_bytes(image_path)
+    size = jpeg_size(data)
+    layout = layout_for_size(*size) if size else None
+    if layout is None:
+        return "不支持的分辨率"
+
+    # 只做缩小解码，不解码全分辨率图像
+    pixels = probe_pixels(data, probe_points(layout))
+    if pixels is None:
         return "读取失败"
-
-    # 获取左下角像素颜色
-    height, width = img.shape[:2]
-    x, y = 27, 1934
-    b, g, r = img[y, x]
-    print(b, g, r)
-    return "type1" if (60 <= r <= 66 and 136 <= g <= 142 and 170 <= b <= 176) else "type2"
+    return pixels
 
 
 # 预计结果：总耗时约0.1-0.2秒，平均每张0.1-0.2ms
@@ -27,10 +31,26 @@ image_path = Path(folder_path)
 # 快速遍历和分类
 src_folder = "SCR"
 
+start_time = time.perf_counter()
+count = 0
+probed_files = []
+samples = []
 for filename in os.listdir(src_folder):
     if filename.upper().endswith('.JPG'):
         img_path = os.path.join(src_folder, filename)
-
-        # 直接传递图像路径给函数
-        result = classify_screenshot_fast(img_path)
-        print(f"{filename}: {result}")
\ No newline at end of file
+        count += 1
+
+        pixels = probe_screenshot_fast(img_path)
+        if isinstance(pixels, str):
+            print(f"{filename}: {pixels}")
+            continue
+        probed_files.append(filename)
+        samples.append(pixels)
+
+# 所有截图的探针样本一次查表分类
+for filename, (result_type, level) in zip(probed_files, classify_samples(samples)):
+    print(f"{filename}: {result_type} {level}")
+
+if count:
+    total_time = time.perf_counter() - start_time
+    print(f"总耗时 {total_time:.3f} 秒，平均每张 {total_time / count * 1000:.2f} 毫秒")
\ No newline at end of file
@@ -0,0 +1,125 @@
+import os
+import json
+import hashlib
+import argparse
+
+# 最终输出中每条记录的字段顺序
+RECORD_FIELDS = ('title', 'artist', 'difficulty', 'level', 'score')
+
+
+def journal_path(output_file):
+    """处理过程中逐条追加结果的 JSON Lines 文件：songs_results.json → songs_results.jsonl"""
+    return os.path.splitext(output_file)[0] + '.jsonl'
+
+
+def result_record(result):
+    """把单张截图的识别结果转成输出记录，未匹配到歌曲时返回None"""
+    song = result.get('matched_song')
+    if not song:
+        return None
+    record = {field: song.get(field) for field in RECORD_FIELDS}
+    # 确保level是数值类型
+    try:
+        record['level'] = float(record['level'])
+    except (ValueError, TypeError):
+        record['level'] = 0.0
+    return record
+
+
+def record_key(record):
+    """(歌名, 曲师, 难度) 的定长哈希，去重索引只保存这16字节"""
+    text = '\0'.join(str(record[field]) for field in ('title', 'artist', 'difficulty'))
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+def unique_records(records):
+    """按 (歌名, 曲师, 难度) 去重，保留首次出现的记录和原有顺序"""
+    seen = set()
+    for record in records:
+        key = record_key(record)
+        if key not in seen:
+            seen.add(key)
+            yield record
+
+
+def output_records(results):
+    """识别结果 → 去重后的输出记录"""
+    return unique_records(record for record in map(result_record, results) if record is not None)
+
+
+def iter_journal(path):
+    """逐行读取结果日志
+
+    每行写完才带换行符，没有换行符的最后一行是崩溃时写了一半的记录，直接跳过；
+    其他无法解析的行说明日志损坏，给出行号提示后跳过。
+    """
+    with open(path, 'rb') as f:
+        for line_number, line in enumerate(f, 1):
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                if line.endswith(b'\n'):
+                    print(f"⚠️ {path} 第 {line_number} 行无法解析，已跳过: {e}")
+
+
+def write_records(records, output_file):
+    """逐条写出JSON数组，格式与 json.dump(records, indent=2, ensure_ascii=False) 完全相同
+
+    先写临时文件再替换，返回记录数和涉及的曲师、歌曲、难度数。
+    """
+    artists, songs, difficulties = set(), set(), set()
+    count = 0
+    tmp_file = output_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        for record in records:
+            text = json.dumps(record, indent=2, ensure_ascii=False).replace('\n', '\n  ')
+            f.write(('[\n  ' if count == 0 else ',\n  ') + text)
+            count += 1
+            artists.add(record['artist'])
+            songs.add(record['title'])
+            difficulties.add(record['difficulty'])
+        f.write('\n]' if count else '[]')
+    os.replace(tmp_file, output_file)
+    return {'records': count, 'artists': len(artists), 'songs': len(songs), 'difficulties': len(difficulties)}
+
+
+def compact(journal_file, output_file):
+    """把结果日志压缩成最终的JSON数组：一次顺序读取，内存中只保留去重索引"""
+    return write_records(output_records(iter_journal(journal_file)), output_file)
+
+
+class ResultWriter:
+    """处理过程中把每张截图的结果追加到 JSON Lines 文件，程序中途退出时已处理的结果不会丢失
+
+    每行是完整的识别结果（含未匹配的截图），按行缓冲写入。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.file = open(path, 'w', encoding='utf-8', buffering=1)
+
+    def append(self, result):
+        self.file.write(json.dumps(result, ensure_ascii=False) + '\n')
+        self.count += 1
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="把结果日志压缩为最终的结果文件（例如中途退出后恢复）")
+    parser.add_argument('journal', help="JSON Lines 结果日志")
+    parser.add_argument('--output', default='songs_results.json', help="结果输出文件")
+    args = parser.parse_args()
+
+    summary = compact(args.journal, args.output)
+    print(f"💾 结果已保存到 {args.output}，共 {summary['records']} 条记录")
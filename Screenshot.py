@@ -0,0 +1,132 @@
+import os
+
+from Cache import content_hash
+import numpy as np
+
+from Decode import (PROBE_SCALE, REGION_DECODE, decode_full, decode_reduced, decode_regions,
+                    jpeg_header, read_bytes)
+from Layout import layout_for_size
+from Trace import span
+
+
+class ScreenshotContext:
+    """单张截图的处理上下文，整个流程只解码一次
+
+    fast=True 时不做全图解码：探针像素从 1/PROBE_SCALE 的缩小图读取，
+    歌名、曲师、分数区域按需单独解码。没有PyTurboJPEG时无法只解码区域，fast 不起作用。
+    布局（探针和区域的像素坐标）按JPEG头中的分辨率选取，不支持的分辨率不做任何解码。
+    """
+
+    def __init__(self, img_path, fast=False):
+        self.path = img_path
+        self.filename = os.path.basename(img_path)
+        self.data = read_bytes(img_path)
+        self.fast = fast and REGION_DECODE
+        self.header = jpeg_header(self.data)
+        self.img = None
+        self.probe_img = None
+        self.result_type = None
+        self.level = None
+        self.rois = {}
+        # 类型/难度探针的取样结果，见 Classify.gather_samples
+        self.probe_samples = None
+        self._hash = None
+
+        self.layout = None
+        if self.header is not None:
+            self.layout = layout_for_size(*self.header[:2])
+            if self.layout is None:
+                return
+
+        if self.fast:
+            self.probe_img = decode_reduced(self.data, PROBE_SCALE)
+        else:
+            self.img = decode_full(self.data)
+        # 非JPEG文件只能解码后才知道尺寸
+        if self.layout is None and self.size is not None:
+            self.layout = layout_for_size(*self.size)
+
+    @property
+    def ok(self):
+        return self.layout is not None and (self.img is not None or self.probe_img is not None)
+
+    @property
+    def size(self):
+        """图像尺寸 (宽, 高)，无法得知时返回None"""
+        if self.header:
+            return self.header[:2]
+        if self.img is not None:
+            height, width = self.img.shape[:2]
+            return width, height
+        if self.probe_img is not None:
+            height, width = self.probe_img.shape[:2]
+            return width * PROBE_SCALE, height * PROBE_SCALE
+        return None
+
+    def content_hash(self):
+        """文件内容哈希，用作缓存键"""
+        if self._hash is None:
+            self._hash = content_hash(self.data)
+        return self._hash
+
+    def pixel(self, x, y):
+        """读取指定坐标的BGR像素"""
+        if self.img is None:
+            return self.probe_img[y // PROBE_SCALE, x // PROBE_SCALE]
+        return self.img[y, x]
+
+    def patch(self, x, y, radius=0):
+        """读取以指定坐标为中心的方形像素块（原图坐标），快速模式下按缩小比例取样"""
+        if self.img is None:
+            img, scale = self.probe_img, PROBE_SCALE
+        else:
+            img, scale = self.img, 1
+        x, y, radius = x // scale, y // scale, radius // scale
+        return img[max(y - radius, 0):y + radius + 1, max(x - radius, 0):x + radius + 1]
+
+    def roi(self, region_coords):
+        """返回区域视图（不复制像素）"""
+        x1, y1, x2, y2 = region_coords
+        return self.img[y1:y2, x1:x2]
+
+    def regions(self, result_type=None):
+        """当前分辨率下指定截图类型的 (歌名, 曲师, 分数) 区域坐标"""
+        return self.layout.regions[result_type or self.result_type]
+
+    def set_regions(self, region_song, region_artist, region_rating):
+        """按截图类型设置歌名、曲师、分数三个区域的视图"""
+        regions = [region_song, region_artist, region_rating]
+        rois = None
+        if self.img is None:
+            rois = decode_regions(self.data, regions, self.header)
+            if rois is None:
+                # 文件损坏或被截断时区域解码失败，改用OpenCV全图解码再试一次
+                self.img = decode_full(self.data)
+        if rois is None and self.img is not None:
+            rois = [self.roi(region) for region in regions]
+        if rois is None:
+            print(f"区域解码失败: {self.path}")
+            rois = [np.zeros((y2 - y1, x2 - x1, 3), dtype=np.uint8) for x1, y1, x2, y2 in regions]
+        self.rois = dict(zip(['song', 'artist', 'rating'], rois))
+        return self.rois
+
+    def release(self):
+        """复制区域像素后释放整图和原始字节，批量处理时避免同时持有多张4K图像"""
+        self.rois = {field: roi.copy() for field, roi in self.rois.items()}
+        self.data = None
+        self.img = None
+        self.probe_img = None
+
+
+def load_screenshot(img_path, fast=False):
+    """读取截图，读取失败时返回None"""
+    with span('decode', fast=fast):
+        ctx = ScreenshotContext(img_path, fast)
+    if not ctx.ok:
+        if ctx.size is not None and ctx.layout is None:
+            width, height = ctx.size
+            print(f"不支持的分辨率 {width}x{height}: {img_path}")
+        else:
+            print(f"读取失败: {img_path}")
+        return None
+    return ctx
@@ -0,0 +1,113 @@
+import gzip
+import json
+import random
+import hashlib
+import argparse
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubSongsAPI(ThreadingHTTPServer):
+    """模拟 /songs/ 接口的本地HTTP服务，支持 ETag / If-Modified-Since"""
+
+    def __init__(self, songs, host='127.0.0.1', port=0):
+        super().__init__((host, port), SongsHandler)
+        self.request_count = 0
+        self.set_songs(songs)
+
+    def set_songs(self, songs):
+        """替换歌曲数据，ETag 和 Last-Modified 随之更新"""
+        self.body = json.dumps(songs, ensure_ascii=False).encode('utf-8')
+        self.gzip_body = gzip.compress(self.body)
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:16] + '"'
+        self.last_modified = formatdate(usegmt=True)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/songs/"
+
+    def start(self):
+        """在后台线程中运行，返回接口地址"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.url
+
+
+def synthetic_songs(count, seed=0):
+    """生成指定数量的模拟歌曲，字段与真实接口一致并带一些多余字段"""
+    rng = random.Random(seed)
+    difficulties = ['Detected', 'Invaded', 'Massive']
+    songs = []
+    for i in range(count):
+        songs.append({
+            'title': f"Synthetic Song {i // 3}",
+            'artist': f"Artist {rng.randrange(max(1, count // 20))}",
+            'level': round(rng.uniform(1, 16), 1),
+            'difficulty': difficulties[i % 3],
+            'bpm': rng.randint(90, 220),
+            'notes': rng.randint(300, 2000),
+            'illustrator': f"Illustrator {rng.randrange(100)}",
+        })
+    return songs
+
+
+class SongsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.request_count += 1
+        if self.path.rstrip('/') != '/songs':
+            self.send_error(404)
+            return
+
+        if self.not_modified():
+            self.send_response(304)
+            self.send_header('ETag', server.etag)
+            self.send_header('Last-Modified', server.last_modified)
+            self.end_headers()
+            return
+
+        use_gzip = 'gzip' in self.headers.get('Accept-Encoding', '')
+        body = server.gzip_body if use_gzip else server.body
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', server.etag)
+        self.send_header('Last-Modified', server.last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def not_modified(self):
+        server = self.server
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return if_none_match == server.etag
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since) >= parsedate_to_datetime(server.last_modified)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地模拟歌曲API")
+    parser.add_argument('--data', default='songs_data.json', help="要提供的歌曲数据JSON")
+    parser.add_argument('--synthetic', type=int, default=0, help="改为提供指定数量的模拟歌曲")
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        songs = synthetic_songs(args.synthetic)
+    else:
+        with open(args.data, 'r', encoding='utf-8') as f:
+            songs = json.load(f)
+    server = StubSongsAPI(songs, port=args.port)
+    print(f"模拟歌曲API: {server.url} ({len(songs)} 首, gzip {len(server.gzip_body) / 1024:.0f} KB)")
+    server.serve_forever()
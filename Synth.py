@@ -0,0 +1,297 @@
+import os
+import json
+import time
+import random
+import argparse
+import resource
+import tempfile
+import cv2
+import numpy as np
+
+from Catalog import load_catalog
+from Results import iter_journal
+from Classify import LEVEL_BOXES, RESULT_TYPES, TYPE_BOXES
+from Layout import DEVICE_LAYOUTS, find_layout, layout_for_size
+
+# 可选：Pillow 配合支持中日文的字体绘制非ASCII歌名，未安装时只生成ASCII歌名的截图
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None
+
+# 生成截图使用的分辨率：各机型的原始分辨率，以及同宽高比的缩小分辨率（检验按比例换算的坐标）
+DEVICE_SIZES = [layout['size'] for layout in DEVICE_LAYOUTS]
+SIZES = DEVICE_SIZES + [(2560, 1600), (1920, 1200)]
+
+# 不落在任何颜色框中的颜色，对应默认的 type1 / Detected
+PLAIN_COLOUR = (40, 40, 40)
+
+LABELS_FILE = 'labels.json'
+
+
+def box_colour(box, rng=None):
+    """颜色框内的BGR颜色：不传 rng 时取中心，否则在中心附近随机取
+
+    有的颜色框每个通道只有几个色阶宽，扰动只占框宽的三分之一，
+    给噪声和JPEG压缩留出余量。
+    """
+    _, r, g, b = box
+    colour = []
+    for lower, upper in (b, g, r):
+        centre = (lower + upper) // 2
+        jitter = (upper - lower) // 6
+        colour.append(centre if rng is None else rng.randint(centre - jitter, centre + jitter))
+    return tuple(colour)
+
+
+def probe_colour(boxes, label, rng=None):
+    box = next((box for box in boxes if box[0] == label), None)
+    return PLAIN_COLOUR if box is None else box_colour(box, rng)
+
+
+def is_ascii(text):
+    return all(ord(c) < 128 for c in text)
+
+
+def draw_text(img, text, region, font_path=None):
+    """在区域内左对齐绘制白色文字，有字体文件时用Pillow绘制（支持中日文）"""
+    x1, y1, x2, y2 = region
+    height = y2 - y1
+    if font_path and Image is not None:
+        roi = Image.fromarray(cv2.cvtColor(img[y1:y2, x1:x2], cv2.COLOR_BGR2RGB))
+        font = ImageFont.truetype(font_path, int(height * 0.7))
+        ImageDraw.Draw(roi).text((10, height // 8), text, font=font, fill=(255, 255, 255))
+        img[y1:y2, x1:x2] = cv2.cvtColor(np.asarray(roi), cv2.COLOR_RGB2BGR)
+        return
+    scale = height / 40
+    cv2.putText(img, text, (x1 + 10, y2 - height // 4), cv2.FONT_HERSHEY_SIMPLEX, scale,
+                (255, 255, 255), max(1, int(scale * 2)), cv2.LINE_AA)
+
+
+def render_screenshot(result_type, level, title, artist, rating, size=DEVICE_SIZES[0], rng=None,
+                      font_path=None):
+    """按机型布局画出一张成绩截图：探针位置涂上类型/难度颜色，三个区域写入歌名、曲师、分数
+
+    总是按机型登记的原始坐标在其原始分辨率上绘制，size 与之不同时再整体缩放，
+    不经过识别时使用的坐标换算。传入 rng 时背景、探针颜色带随机扰动，否则结果固定不变。
+    """
+    device = find_layout(*size)
+    if device is None:
+        raise ValueError(f"没有适用于 {size[0]}x{size[1]} 的机型布局")
+    # 机型原始分辨率下的像素坐标，即登记时采集的坐标
+    native = layout_for_size(*device['size'])
+    width, height = native.size
+    if rng is None:
+        img = np.full((height, width, 3), 20, dtype=np.uint8)
+    else:
+        # 竖直方向的渐变背景
+        shade = np.linspace(rng.randint(10, 30), rng.randint(30, 60), height, dtype=np.float32)
+        img = np.repeat(shade[:, None, None], width, axis=1).repeat(3, axis=2).astype(np.uint8)
+
+    type_colour = probe_colour(TYPE_BOXES, result_type, rng)
+    level_colour = probe_colour(LEVEL_BOXES[result_type], level, rng)
+    # 色块缩小到 1920x1200 以下时仍要比取样区域和JPEG的8x8块大，否则边缘的色度失真会让颜色偏出颜色框
+    radius = max(8, width // 200)
+    for (x, y), colour in ((native.type_probe, type_colour), (native.level_probes[result_type], level_colour)):
+        cv2.rectangle(img, (x - radius, y - radius), (x + radius, y + radius), colour, -1)
+
+    for region, text in zip(native.regions[result_type], (title, artist, rating)):
+        draw_text(img, text, region, font_path)
+    if tuple(size) != device['size']:
+        img = cv2.resize(img, tuple(size), interpolation=cv2.INTER_AREA)
+    return img
+
+
+def add_noise(img, rng, sigma=2.0):
+    """叠加轻微的高斯噪声"""
+    noise = np.random.default_rng(rng.randrange(2 ** 32)).normal(0, sigma, img.shape)
+    return np.clip(img + noise, 0, 255).astype(np.uint8)
+
+
+def generate_corpus(songs, out_dir, count, seed=0, sizes=SIZES, font_path=None, quality=(75, 95)):
+    """生成 count 张带JPEG压缩噪声的合成截图，并写出标注文件 labels.json
+
+    歌曲从目录中随机抽取；没有字体文件时只使用歌名和曲师都是ASCII的歌曲。
+    返回 {文件名: 标注}，格式与 Quantize.py 的标注文件相同。
+    """
+    rng = random.Random(seed)
+    candidates = [song for song in songs
+                  if font_path or (is_ascii(song.get('title', '')) and is_ascii(song.get('artist', '')))]
+    if not candidates:
+        print("目录中没有可绘制的歌曲（非ASCII歌名需要 --font）")
+        return {}
+
+    os.makedirs(out_dir, exist_ok=True)
+    labels = {}
+    for i in range(count):
+        song = rng.choice(candidates)
+        result_type = rng.choice(RESULT_TYPES)
+        size = rng.choice(sizes)
+        rating = str(rng.randint(800000, 1010000))
+        img = add_noise(render_screenshot(result_type, song['difficulty'], song['title'], song['artist'],
+                                          rating, size, rng, font_path), rng)
+
+        filename = f'synth_{i:06d}.jpg'
+        # 不做色度二次采样，否则探针颜色在低质量下会偏出较窄的颜色框
+        cv2.imwrite(os.path.join(out_dir, filename), img,
+                    [cv2.IMWRITE_JPEG_QUALITY, rng.randint(*quality),
+                     cv2.IMWRITE_JPEG_SAMPLING_FACTOR, cv2.IMWRITE_JPEG_SAMPLING_FACTOR_444])
+        labels[filename] = {
+            'title': song['title'],
+            'artist': song['artist'],
+            'difficulty': song['difficulty'],
+            'level': song.get('level'),
+            'rating': rating,
+            'result_type': result_type,
+            'size': list(size),
+            'device': find_layout(*size)['name'],
+        }
+
+    with open(os.path.join(out_dir, LABELS_FILE), 'w', encoding='utf-8') as f:
+        json.dump(labels, f, indent=2, ensure_ascii=False)
+    return labels
+
+
+# 负载测试的最低准确率，低于任一项时 loadtest 以退出码1结束；
+# 难度颜色只看探针，不受OCR影响，坐标换算出错时最先体现在这里
+MIN_ACCURACY = {
+    'level_accuracy': 0.99,
+    'match_accuracy': 0.90,
+    'rating_accuracy': 0.90,
+}
+
+
+def accuracy(results, labels):
+    """按文件名对照标注，统计难度颜色、歌曲匹配和分数识别的准确率；results 可以是逐条读取的结果日志
+
+    by_size 按分辨率分别统计难度颜色的准确率，便于看出是哪个分辨率的坐标换算出了问题。
+    """
+    matched = rating_ok = level_ok = count = 0
+    by_size = {}
+    for label in labels.values():
+        by_size.setdefault('x'.join(map(str, label['size'])), [0, 0])[0] += 1
+    for result in results:
+        count += 1
+        label = labels.get(result['filename'])
+        if not label:
+            continue
+        if result['ocr_results'].get('level') == label['difficulty']:
+            level_ok += 1
+            by_size['x'.join(map(str, label['size']))][1] += 1
+        if result['ocr_results']['rating'] == label['rating']:
+            rating_ok += 1
+        song = result.get('matched_song')
+        if song and all(song.get(key) == label[key] for key in ('title', 'artist', 'difficulty')):
+            matched += 1
+    total = len(labels)
+    return {
+        'images': total,
+        'results': count,
+        'level_accuracy': level_ok / total if total else 0.0,
+        'match_accuracy': matched / total if total else 0.0,
+        'rating_accuracy': rating_ok / total if total else 0.0,
+        'by_size': {size: ok / images for size, (images, ok) in by_size.items()},
+    }
+
+
+def check_accuracy(report, thresholds=MIN_ACCURACY):
+    """返回低于阈值的准确率项，格式为 [(名称, 实际值, 阈值)]"""
+    return [(name, report[name], minimum) for name, minimum in thresholds.items() if report[name] < minimum]
+
+
+def peak_rss_mb():
+    """本进程和已结束子进程中的最大常驻内存（MB），Linux 上 ru_maxrss 单位为KB"""
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return self_rss / 1024, children_rss / 1024
+
+
+def run_load_test(songs_data, catalog_path, work_dir, count, seed=0, font_path=None, main_args=()):
+    """在 work_dir 中生成 count 张合成截图，用完整的 test3.main() 流程处理，返回报告"""
+    import test3
+
+    src_folder = os.path.join(work_dir, 'SCR')
+    start_time = time.perf_counter()
+    labels = generate_corpus(songs_data.songs, src_folder, count, seed, font_path=font_path)
+    if not labels:
+        return None
+    print(f"已生成 {len(labels)} 张合成截图到 {src_folder} ({time.perf_counter() - start_time:.1f} 秒)")
+
+    argv = ['--src', src_folder, '--output', os.path.join(work_dir, 'songs_results.json'),
+            '--songs', catalog_path] + list(main_args)
+    start_time = time.perf_counter()
+    summary = test3.main(argv)
+    wall_time = time.perf_counter() - start_time
+
+    self_rss, children_rss = peak_rss_mb()
+    # 从结果日志逐条读取，不把全部结果留在内存中
+    report = accuracy(iter_journal(summary['journal']) if summary else [], labels)
+    report.update({
+        'main_args': list(main_args),
+        'seconds': wall_time,
+        'images_per_second': len(labels) / wall_time if wall_time else 0.0,
+        'peak_rss_mb': self_rss,
+        'peak_child_rss_mb': children_rss,
+    })
+
+    print("=" * 70)
+    print(f"负载测试: {report['images']} 张合成截图, 参数 {' '.join(main_args) or '(默认)'}")
+    print("=" * 70)
+    print(f"吞吐量: {report['images_per_second']:.2f} 张/秒 (共 {wall_time:.1f} 秒)")
+    print(f"内存峰值: 主进程 {self_rss:.0f} MB, 子进程 {children_rss:.0f} MB")
+    print(f"难度识别准确率: {report['level_accuracy']:.1%} "
+          f"({', '.join(f'{size} {value:.1%}' for size, value in report['by_size'].items())})")
+    print(f"歌曲匹配准确率: {report['match_accuracy']:.1%}, 分数识别准确率: {report['rating_accuracy']:.1%}")
+    report['failures'] = check_accuracy(report)
+    for name, value, minimum in report['failures']:
+        print(f"❌ {name} {value:.1%} 低于要求的 {minimum:.1%}")
+    return report
+
+
+def load_test(count, catalog_path='songs_data.json', work_dir=None, seed=0, font_path=None, main_args=()):
+    """负载测试：报告吞吐量、内存峰值和准确率
+
+    work_dir 为None时在临时目录中进行，结束后删除；否则截图、结果和报告都保留在 work_dir 中。
+    准确率低于 MIN_ACCURACY 的项记录在报告的 failures 中。
+    """
+    songs_data = load_catalog(catalog_path)
+    if not songs_data:
+        return None
+
+    if work_dir is None:
+        with tempfile.TemporaryDirectory(prefix='prr-synth-') as tmp_dir:
+            return run_load_test(songs_data, catalog_path, tmp_dir, count, seed, font_path, main_args)
+
+    report = run_load_test(songs_data, catalog_path, work_dir, count, seed, font_path, main_args)
+    if report is not None:
+        with open(os.path.join(work_dir, 'load_test_report.json'), 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="合成截图生成与负载测试",
+                                     epilog="-- 之后的参数原样传给 test3.py，例如: -- --workers 4 --fast")
+    parser.add_argument('command', choices=['generate', 'loadtest'])
+    parser.add_argument('--count', type=int, default=100, help="生成的截图数")
+    parser.add_argument('--catalog', default='songs_data.json', help="歌曲目录，也是识别时使用的目录")
+    parser.add_argument('--out', default=None,
+                        help="输出目录；generate 必须指定，loadtest 默认使用用完即删的临时目录")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--font', default=None, help="支持中日文的字体文件，用于绘制非ASCII歌名")
+    args, main_args = parser.parse_known_args()
+    if main_args[:1] == ['--']:
+        main_args = main_args[1:]
+
+    if args.command == 'generate':
+        if not args.out:
+            parser.error("generate 需要用 --out 指定输出目录")
+        songs_data = load_catalog(args.catalog)
+        if not songs_data:
+            raise SystemExit(1)
+        labels = generate_corpus(songs_data.songs, args.out, args.count, args.seed, font_path=args.font)
+        print(f"已生成 {len(labels)} 张合成截图到 {args.out}")
+    else:
+        report = load_test(args.count, args.catalog, args.out, args.seed, args.font, main_args)
+        if report is None or report['failures']:
+            raise SystemExit(1)
@@ -0,0 +1,156 @@
+import os
+import json
+import threading
+import cv2
+import numpy as np
+
+TITLE_HASH_FILE = 'title_hashes.json'
+
+# 差值哈希的网格 (宽, 高)：歌名区域很宽，横向多取一些比较点，共 32*8=256 位
+HASH_SIZE = (32, 8)
+
+# 汉明距离不超过该值时认为是同一张歌名图
+MAX_DISTANCE = 12
+
+# 只把综合相似度不低于该值的匹配结果加入索引
+LEARN_MIN_SCORE = 90
+
+# 每首歌最多保留的哈希数（同一首歌在不同设备、不同压缩质量下略有差别）
+MAX_HASHES_PER_SONG = 4
+
+# 每个字节中1的个数
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint16)
+
+
+def dhash(roi):
+    """歌名区域的差值哈希：灰度化、缩放到固定网格后比较相邻像素，返回打包后的字节数组"""
+    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if roi.ndim == 3 else roi
+    width, height = HASH_SIZE
+    small = cv2.resize(gray, (width + 1, height), interpolation=cv2.INTER_AREA)
+    return np.packbits(small[:, 1:] > small[:, :-1])
+
+
+class TitleHashIndex:
+    """歌名图像的感知哈希索引
+
+    键为歌名区域的差值哈希，值为已确认的 (歌名, 曲师)。同一首歌的歌名横幅每次显示的像素
+    几乎相同，命中时可以跳过歌名和曲师的OCR以及模糊匹配。索引从匹配成功的结果中自动学习。
+    read_only 时不写文件，新加入的条目另外记录，由 take_learned 取出交给负责保存的进程合并。
+    """
+
+    def __init__(self, path=None, max_distance=MAX_DISTANCE, read_only=False):
+        self.path = path
+        self.max_distance = max_distance
+        self.read_only = read_only
+        self.hashes = np.zeros((0, HASH_SIZE[0] * HASH_SIZE[1] // 8), dtype=np.uint8)
+        self.songs = []
+        self.per_song = {}
+        self.learned = []
+        # 流水线模式下查找和学习在不同线程中进行
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self.load()
+
+    def __len__(self):
+        return len(self.songs)
+
+    def _distances(self, value):
+        return _POPCOUNT[np.bitwise_xor(self.hashes, value)].sum(axis=1)
+
+    def lookup(self, roi):
+        """返回 (歌名, 曲师)；没有足够接近的哈希，或最近的几个属于不同歌曲时返回None"""
+        value = dhash(roi)
+        with self.lock:
+            song = None
+            if self.songs:
+                distances = self._distances(value)
+                best = int(distances.min())
+                if best <= self.max_distance:
+                    candidates = {self.songs[i] for i in np.flatnonzero(distances == best)}
+                    if len(candidates) == 1:
+                        song = candidates.pop()
+            if song is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return song
+
+    def add(self, roi, title, artist):
+        """记录一张已确认歌曲的歌名图，已有足够接近的同曲哈希时不重复添加"""
+        value = dhash(roi)
+        added = self.add_hash(value, title, artist)
+        if added and self.read_only:
+            with self.lock:
+                self.learned.append([value.tobytes().hex(), title, artist])
+        return added
+
+    def add_hash(self, value, title, artist):
+        """按哈希值记录一首已确认的歌曲，规则同 add"""
+        song = (title, artist)
+        with self.lock:
+            if self.per_song.get(song, 0) >= MAX_HASHES_PER_SONG:
+                return False
+            if self.songs:
+                distances = self._distances(value)
+                same_song = [i for i in np.flatnonzero(distances <= self.max_distance // 2)
+                             if self.songs[i] == song]
+                if same_song:
+                    return False
+            self.hashes = np.vstack([self.hashes, value[None, :]])
+            self.songs.append(song)
+            self.per_song[song] = self.per_song.get(song, 0) + 1
+            return True
+
+    def take_learned(self):
+        """取出上次调用以来新加入的条目 [[哈希, 歌名, 曲师], ...]，没有时返回None"""
+        with self.lock:
+            learned, self.learned = self.learned, []
+        return learned or None
+
+    def merge_learned(self, entries):
+        """合并其他进程 take_learned 取出的条目，返回实际加入的条数"""
+        return sum(self.add_hash(np.frombuffer(bytes.fromhex(value), dtype=np.uint8), title, artist)
+                   for value, title, artist in entries)
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        # 哈希网格变化后旧索引不可用
+        if data.get('hash_size') != list(HASH_SIZE):
+            return
+        entries = data.get('entries', [])
+        if entries:
+            self.hashes = np.array([np.frombuffer(bytes.fromhex(value), dtype=np.uint8)
+                                    for value, _, _ in entries])
+        self.songs = [(title, artist) for _, title, artist in entries]
+        for song in self.songs:
+            self.per_song[song] = self.per_song.get(song, 0) + 1
+
+    def save(self):
+        if not self.path or self.read_only:
+            return
+        entries = [[value.tobytes().hex(), title, artist]
+                   for value, (title, artist) in zip(self.hashes, self.songs)]
+        tmp_file = self.path + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'hash_size': list(HASH_SIZE), 'entries': entries}, f, ensure_ascii=False)
+        os.replace(tmp_file, self.path)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': len(self.songs),
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"🖼️ 歌名图像索引: 命中 {stats['hits']} 次, 未命中 {stats['misses']} 次, "
+              f"命中率 {stats['hit_rate']:.0%}, 共 {stats['entries']} 条")
@@ -0,0 +1,266 @@
+import os
+import glob
+import json
+import time
+import argparse
+import threading
+import contextlib
+
+TRACE_FILE = 'trace.jsonl'
+
+# 内存中累积到这么多条span时写出一次，长时间运行时内存占用不随截图数增长
+FLUSH_EVERY = 256
+
+# 当前进程的记录器，未启用追踪时为None，span() 直接返回空操作对象
+_tracer = None
+
+# 每个线程当前处理的截图文件名，流水线模式下各阶段线程同时处理不同截图
+_local = threading.local()
+
+
+class _NoSpan:
+    """追踪关闭时使用的空操作span，全进程共用一个实例"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+class Span:
+    """一段计时，退出时交给记录器；set() 可在计时过程中补充参数（如缓存是否命中）"""
+
+    __slots__ = ('tracer', 'name', 'args', 'start')
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.start, time.perf_counter_ns(), self.args)
+        return False
+
+    def set(self, **args):
+        self.args.update(args)
+
+
+class Tracer:
+    """把span先缓存在内存中，每 flush_every 条或 flush() 时追加写入JSON Lines文件
+
+    时间取自 perf_counter_ns（Linux 上为系统范围的单调时钟），多个进程的记录可以直接合并。
+    """
+
+    def __init__(self, path, worker='main', flush_every=FLUSH_EVERY):
+        self.path = path
+        self.worker = worker
+        self.flush_every = flush_every
+        self.pid = os.getpid()
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def record(self, name, start_ns, end_ns, args):
+        thread = threading.current_thread()
+        span = {
+            'name': name,
+            'file': getattr(_local, 'file', None),
+            'worker': self.worker,
+            'pid': self.pid,
+            'tid': thread.native_id,
+            'thread': thread.name,
+            'start_us': start_ns / 1000,
+            'dur_us': (end_ns - start_ns) / 1000,
+            'args': args,
+        }
+        # 流水线模式下多个线程同时记录，追加和写出都在锁内进行
+        with self.lock:
+            self.spans.append(span)
+            if len(self.spans) >= self.flush_every:
+                self._write()
+
+    def flush(self):
+        with self.lock:
+            self._write()
+
+    def _write(self):
+        """写出缓存的span，调用方需持有 self.lock"""
+        spans, self.spans = self.spans, []
+        if not spans:
+            return
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.writelines(json.dumps(span, ensure_ascii=False) + '\n' for span in spans)
+
+
+def enabled():
+    return _tracer is not None
+
+
+def span(name, **args):
+    """计时一个处理步骤，未启用追踪时几乎没有开销"""
+    tracer = _tracer
+    if tracer is None:
+        return NO_SPAN
+    return Span(tracer, name, args)
+
+
+@contextlib.contextmanager
+def _screenshot_scope(tracer, filename, name):
+    previous = getattr(_local, 'file', None)
+    _local.file = filename
+    try:
+        with Span(tracer, name, {}):
+            yield
+    finally:
+        _local.file = previous
+
+
+def screenshot(filename, name='screenshot'):
+    """在该范围内记录的span都带上截图文件名，并把整个范围记为一个名为 name 的span"""
+    tracer = _tracer
+    if tracer is None:
+        return NO_SPAN
+    return _screenshot_scope(tracer, filename, name)
+
+
+def part_path(path, pid):
+    """子进程各自写入的临时文件，结束时由主进程合并"""
+    return f'{path}.{pid}.part'
+
+
+def chrome_path(path):
+    """Chrome/Perfetto 追踪文件路径：trace.jsonl → trace.trace.json"""
+    return os.path.splitext(path)[0] + '.trace.json'
+
+
+def enable(path=TRACE_FILE):
+    """在主进程中启用追踪，清空上次运行留下的记录"""
+    global _tracer
+    for stale in [path] + glob.glob(glob.escape(path) + '.*.part'):
+        if os.path.exists(stale):
+            os.remove(stale)
+    _tracer = Tracer(path)
+    return _tracer
+
+
+def enable_worker(path):
+    """在子进程中启用追踪，记录写入各自的临时文件"""
+    global _tracer
+    pid = os.getpid()
+    _tracer = Tracer(part_path(path, pid), worker=f'worker-{pid}')
+    return _tracer
+
+
+def flush():
+    if _tracer is not None:
+        _tracer.flush()
+
+
+def finish():
+    """写出剩余记录，合并子进程的临时文件，并导出 Chrome 追踪文件；返回两个文件路径"""
+    global _tracer
+    tracer = _tracer
+    if tracer is None:
+        return None
+    tracer.flush()
+    _tracer = None
+
+    with open(tracer.path, 'a', encoding='utf-8') as out:
+        for part in sorted(glob.glob(glob.escape(tracer.path) + '.*.part')):
+            with open(part, 'r', encoding='utf-8') as f:
+                for line in f:
+                    out.write(line)
+            os.remove(part)
+
+    trace_file = chrome_path(tracer.path)
+    export_chrome(tracer.path, trace_file)
+    print_summary(tracer.path)
+    print(f"🧭 追踪记录已保存到 {tracer.path}，Chrome/Perfetto 追踪文件: {trace_file}")
+    return tracer.path, trace_file
+
+
+def iter_spans(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def export_chrome(jsonl_path, output_path):
+    """逐行转换为 Chrome Trace Event 格式（chrome://tracing、ui.perfetto.dev 可直接打开）"""
+    processes = {}
+    threads = {}
+    with open(output_path, 'w', encoding='utf-8') as out:
+        out.write('{"displayTimeUnit": "ms", "traceEvents": [\n')
+        first = True
+        for record in iter_spans(jsonl_path):
+            processes[record['pid']] = record['worker']
+            threads[(record['pid'], record['tid'])] = record['thread']
+            args = dict(record['args'])
+            if record['file']:
+                args['file'] = record['file']
+            args['worker'] = record['worker']
+            event = {'name': record['name'], 'cat': 'prr', 'ph': 'X', 'ts': record['start_us'],
+                     'dur': record['dur_us'], 'pid': record['pid'], 'tid': record['tid'], 'args': args}
+            out.write(('' if first else ',\n') + json.dumps(event, ensure_ascii=False))
+            first = False
+
+        # 进程和线程名称
+        metadata = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': worker}}
+                    for pid, worker in processes.items()]
+        metadata += [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                     for (pid, tid), name in threads.items()]
+        for event in metadata:
+            out.write(('' if first else ',\n') + json.dumps(event, ensure_ascii=False))
+            first = False
+        out.write('\n]}\n')
+
+
+def summarize(jsonl_path):
+    """按span名称汇总次数和耗时（毫秒）"""
+    totals = {}
+    for record in iter_spans(jsonl_path):
+        count, total, longest = totals.get(record['name'], (0, 0.0, 0.0))
+        duration = record['dur_us'] / 1000
+        totals[record['name']] = (count + 1, total + duration, max(longest, duration))
+    return {name: {'count': count, 'total_ms': total, 'mean_ms': total / count, 'max_ms': longest}
+            for name, (count, total, longest) in totals.items()}
+
+
+def print_summary(jsonl_path):
+    summary = summarize(jsonl_path)
+    if not summary:
+        return
+    print("\n" + "=" * 70)
+    print("追踪统计 (按总耗时排序)")
+    print("=" * 70)
+    print(f"{'步骤':<24}{'次数':>8}{'总计(毫秒)':>14}{'平均(毫秒)':>14}{'最长(毫秒)':>14}")
+    for name, stats in sorted(summary.items(), key=lambda item: item[1]['total_ms'], reverse=True):
+        print(f"{name:<24}{stats['count']:>8}{stats['total_ms']:>14.1f}{stats['mean_ms']:>14.2f}"
+              f"{stats['max_ms']:>14.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="追踪记录转换与统计")
+    parser.add_argument('command', choices=['chrome', 'summary'])
+    parser.add_argument('path', nargs='?', default=TRACE_FILE, help="JSON Lines 追踪记录")
+    parser.add_argument('--output', default=None, help="Chrome 追踪文件，默认与记录同名")
+    args = parser.parse_args()
+
+    if args.command == 'chrome':
+        output = args.output or chrome_path(args.path)
+        export_chrome(args.path, output)
+        print(f"已导出 {output}")
+    else:
+        print_summary(args.path)
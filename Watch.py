@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import argparse
+
+import test3
+from Cache import CACHE_FILE, OCRCache
+from Screenshot import load_screenshot
+
+# 可选：Linux 下用 inotify 等待文件变化，否则定时轮询
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+STATE_FILE = 'watch_state.json'
+
+
+def file_signature(path):
+    """用修改时间和大小判断文件是否变化"""
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def load_state(state_file):
+    """加载已处理截图的记录 {文件名: {'signature': ..., 'result': ...}}"""
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_state(state, state_file):
+    """先写临时文件再替换，避免中途退出时损坏记录"""
+    tmp_file = state_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_file, state_file)
+
+
+def scan_changes(src_folder, state):
+    """返回新增或修改过的截图，以及已被删除的截图"""
+    changed = []
+    current = set()
+    for filename in test3.list_screenshots(src_folder):
+        current.add(filename)
+        try:
+            signature = file_signature(os.path.join(src_folder, filename))
+        except FileNotFoundError:
+            continue
+        if state.get(filename, {}).get('signature') != signature:
+            changed.append(filename)
+    removed = [filename for filename in state if filename not in current]
+    return changed, removed
+
+
+def process_files(filenames, src_folder, songs_data, state, fast=False, cache=None):
+    """处理变化的截图并更新记录"""
+    for filename in filenames:
+        img_path = os.path.join(src_folder, filename)
+        try:
+            signature = file_signature(img_path)
+        except FileNotFoundError:
+            continue
+
+        test3.print_file_header(filename)
+        # 读取失败、不支持的分辨率或处理出错时也按签名记录，文件再次变化（例如写完）之前不再重试
+        try:
+            ctx = load_screenshot(img_path, fast=fast)
+            if ctx is None:
+                state[filename] = {'signature': signature, 'result': None, 'error': '无法读取或不支持的分辨率'}
+                continue
+            ctx.result_type = test3.distinguish(ctx)
+            result_data = test3.process_screenshot(ctx, songs_data, cache)
+        except Exception as e:
+            print(f"❌ 处理 {filename} 出错: {e}")
+            state[filename] = {'signature': signature, 'result': None, 'error': str(e)}
+            continue
+        state[filename] = {'signature': signature, 'result': result_data}
+
+
+def sync(src_folder, songs_data, state, output_file, state_file, fast=False, cache=None):
+    """处理所有变化并增量更新结果文件"""
+    changed, removed = scan_changes(src_folder, state)
+    if not changed and not removed:
+        return
+
+    for filename in removed:
+        print(f"🗑️ 截图已删除: {filename}")
+        del state[filename]
+    process_files(changed, src_folder, songs_data, state, fast, cache)
+
+    results = [state[filename]['result'] for filename in sorted(state) if state[filename]['result'] is not None]
+    test3.save_results_to_json(results, output_file)
+    save_state(state, state_file)
+
+
+def wait_inotify(src_folder):
+    """阻塞等待文件夹变化，短时间内的多次变化合并为一次"""
+    inotify = INotify()
+    watch_flags = flags.CLOSE_WRITE | flags.MOVED_TO | flags.MOVED_FROM | flags.DELETE
+    inotify.add_watch(src_folder, watch_flags)
+    while True:
+        inotify.read()
+        while inotify.read(timeout=200):
+            pass
+        yield
+
+
+def wait_polling(interval):
+    """定时轮询"""
+    while True:
+        time.sleep(interval)
+        yield
+
+
+def watch(src_folder="SCR", output_file='songs_results.json', state_file=STATE_FILE,
+          interval=2.0, fast=False, poll=False, cache_path=None):
+    """常驻运行：OCR引擎和歌曲数据只加载一次，只处理新增或修改的截图"""
+    songs_data = test3.load_songs_data()
+    if not songs_data:
+        return
+    test3.get_engine()
+    state = load_state(state_file)
+    cache = OCRCache(cache_path) if cache_path else None
+
+    # 先补上停止期间的变化
+    sync(src_folder, songs_data, state, output_file, state_file, fast, cache)
+
+    use_inotify = INotify is not None and not poll
+    print(f"👀 正在监视 {src_folder} ({'inotify' if use_inotify else f'每 {interval} 秒轮询'})，Ctrl+C 退出")
+    waiter = wait_inotify(src_folder) if use_inotify else wait_polling(interval)
+    try:
+        for _ in waiter:
+            sync(src_folder, songs_data, state, output_file, state_file, fast, cache)
+    except KeyboardInterrupt:
+        print("\n已停止监视")
+    if cache is not None:
+        cache.print_stats()
+        cache.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="监视截图文件夹并增量识别")
+    parser.add_argument('--src', default="SCR", help="截图文件夹")
+    parser.add_argument('--output', default='songs_results.json', help="结果输出文件")
+    parser.add_argument('--state', default=STATE_FILE, help="已处理截图记录文件")
+    parser.add_argument('--interval', type=float, default=2.0, help="轮询间隔（秒）")
+    parser.add_argument('--poll', action='store_true', help="不使用inotify，强制轮询")
+    parser.add_argument('--fast', action='store_true',
+                        help="探针使用缩小解码，只解码歌名/曲师/分数区域")
+    parser.add_argument('--cache', nargs='?', const=CACHE_FILE, default=None,
+                        help="启用OCR结果缓存（SQLite文件路径）")
+    parser.add_argument('--match', choices=['cascade', 'joint'], default='cascade',
+                        help="匹配方式：cascade 逐级匹配，joint 联合打分")
+    args = parser.parse_args()
+
+    test3.set_match_mode(args.match)
+    watch(args.src, args.output, args.state, args.interval, args.fast, args.poll, args.cache)
@@ -1,9 +1,11 @@
 import os
 import json
-import cv2
-import re
 from rapidocr import EngineType, ModelType, OCRVersion, RapidOCR
 from fuzzywuzzy import fuzz
+from Screenshot import load_screenshot
+from Classify import classify, level_for
+from Catalog import load_catalog, normalize_text
+from NGram import shortlist_match
 
 # 初始化OCR引擎
 engine = RapidOCR(
@@ -16,54 +18,25 @@ engine = RapidOCR(
 
 
 def load_songs_data():
-    """加载歌曲数据"""
-    try:
-        with open('songs_data.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print("songs_data.json 文件未找到，请先运行获取歌曲数据的脚本")
-        return []
+    """加载歌曲数据，返回预先规范化并建好查找表的歌曲目录"""
+    return load_catalog('songs_data.json')
 
 
-def ocr_region(image_path, region_coords):
+def ocr_region(roi):
     """OCR识别指定区域"""
-    img = cv2.imread(image_path)
-    x1, y1, x2, y2 = region_coords
-    roi = img[y1:y2, x1:x2]
     res = engine(roi, use_cls=False, use_det=False, use_rec=True)
     return res
 
 
-def distinguish(image_path):
-    """识别截图类型"""
-    img = cv2.imread(image_path)
-    x, y = 27, 1934
-    b, g, r = img[y, x]
-    return "type2" if (60 <= r <= 66 and 136 <= g <= 142 and 170 <= b <= 176) else "type1"
+def distinguish(ctx):
+    """识别截图类型（同时取好难度探针的样本）"""
+    result_type, _ = classify(ctx)
+    return result_type
 
 
-def get_level(image_path, result_type):
+def get_level(ctx, result_type):
     """获取难度等级"""
-    img = cv2.imread(image_path)
-    if result_type == "type1":
-        x, y = 1590, 441
-        b, g, r = img[y, x]
-        if 210 <= r <= 225 and 135 <= g <= 150 and 235 <= b <= 255:
-            return "Massive"
-        elif 225 <= r <= 238 and 108 <= g <= 120 and 105 <= b <= 120:
-            return "Invaded"
-        else:
-            return "Detected"
-    elif result_type == "type2":
-        x, y = 2982, 1520
-        b, g, r = img[y, x]
-        if 170 <= r <= 190 and 120 <= g <= 135 and 200 <= b <= 215:
-            return "Massive"
-        elif 195 <= r <= 210 and 110 <= g <= 120 and 105 <= b <= 120:
-            return "Invaded"
-        else:
-            return "Detected"
-    return "Unknown"
+    return level_for(ctx, result_type)
 
 
 def clean_ocr_text(text):
@@ -71,17 +44,17 @@ def clean_ocr_text(text):
     return text.replace('/', '').replace('、', '').replace(',', '').strip()
 
 
-def method_partial_ratio(ocr_title, songs, threshold=70):
-    """方法2: 部分匹配"""
+def method_partial_ratio(ocr_title, songs, threshold=70, keys=None):
+    """方法2: 部分匹配，keys 为与 songs 一一对应的已规范化歌名"""
     best_match = None
     best_score = 0
 
-    ocr_clean = re.sub(r'[^\w\s]', '', ocr_title.lower().strip())
+    ocr_clean = normalize_text(ocr_title)
 
-    for song in songs:
-        api_title = song.get('title', '')
-        api_clean = re.sub(r'[^\w\s]', '', api_title.lower().strip())
+    if keys is None:
+        keys = [normalize_text(song.get('title', '')) for song in songs]
 
+    for song, api_clean in zip(songs, keys):
         ratio = fuzz.partial_ratio(ocr_clean, api_clean)
 
         if ratio > best_score and ratio >= threshold:
@@ -91,18 +64,18 @@ def method_partial_ratio(ocr_title, songs, threshold=70):
     return best_match, best_score
 
 
-def find_matching_song(song_name, artist, level, songs_data):
-    """使用部分匹配方法查找匹配的歌曲"""
-    # 首先尝试匹配当前难度的歌曲
-    same_level_songs = [song for song in songs_data if song.get('difficulty', '').lower() == level.lower()]
-
-    if same_level_songs:
-        match, score = method_partial_ratio(song_name, same_level_songs)
-        if match:
-            return match, score, 'same_level'
+def find_matching_song(song_name, artist, level, songs_data, shortlist_size=20):
+    """使用部分匹配方法查找匹配的歌曲：先在同难度的歌曲中匹配，再用n-gram索引的短名单在全部歌曲中匹配"""
+    # 首先在当前难度的歌曲中匹配，目录已按难度分好桶，直接取用
+    same_level = songs_data.songs_for_difficulty(level)
+    match, score = method_partial_ratio(song_name, same_level.items, keys=same_level.keys)
+    if match:
+        return match, score, 'same_level'
 
     # 如果同难度没找到，尝试所有歌曲
-    all_songs_match, all_songs_score = method_partial_ratio(song_name, songs_data)
+    all_songs_match, all_songs_score = shortlist_match(normalize_text(song_name), songs_data.songs,
+                                                       songs_data.title_index, method_partial_ratio,
+                                                       shortlist_size)
 
     if all_songs_match:
         return all_songs_match, all_songs_score, 'all_songs'
@@ -110,23 +83,20 @@ def find_matching_song(song_name, artist, level, songs_data):
     return None, 0, 'no_match'
 
 
-def process_screenshot(img_path, result_type, songs_data):
+def process_screenshot(ctx, songs_data):
     """处理单张截图"""
-    # OCR识别各个区域
-    if result_type == "type1":
-        song_result = ocr_region(img_path, region_song1)
-        artist_result = ocr_region(img_path, region_artist1)
-        rating_result = ocr_region(img_path, region_rating1)
-    else:  # type2
-        song_result = ocr_region(img_path, region_song2)
-        artist_result = ocr_region(img_path, region_artist2)
-        rating_result = ocr_region(img_path, region_rating2)
+    # OCR识别各个区域，坐标按截图分辨率换算
+    rois = ctx.set_regions(*ctx.regions())
+    song_result = ocr_region(rois['song'])
+    artist_result = ocr_region(rois['artist'])
+    rating_result = ocr_region(rois['rating'])
 
     # 清理识别结果
     song_name = clean_ocr_text(song_result.txts[0]) if song_result.txts else "Unknown"
     artist = clean_ocr_text(artist_result.txts[0]) if artist_result.txts else "Unknown"
     rating = clean_ocr_text(rating_result.txts[0]) if rating_result.txts else "Unknown"
-    level = get_level(img_path, result_type)
+    level = get_level(ctx, ctx.result_type)
+    ctx.level = level
 
     print(f"识别结果:")
     print(f"  歌曲: {song_name}")
@@ -138,7 +108,7 @@ def process_screenshot(img_path, result_type, songs_data):
     match, score, match_type = find_matching_song(song_name, artist, level, songs_data)
 
     result_data = {
-        'filename': os.path.basename(img_path),
+        'filename': ctx.filename,
         'ocr_results': {
             'song': song_name,
             'artist': artist,
@@ -190,29 +160,22 @@ def save_results_to_json(results, output_file='songs_results.json'):
 
             formatted_results.append(song_data)
 
-    # 按歌曲名和艺术家分组，合并不同难度的记录
-    final_output = []
-    seen_songs = set()
-
+    # 按歌曲名和艺术家分组，合并不同难度的记录（按首次出现的顺序，一次遍历完成分组）
+    song_groups = {}
     for song in formatted_results:
-        # 创建唯一标识符
-        song_key = f"{song['title']}|{song['artist']}"
-
-        if song_key not in seen_songs:
-            seen_songs.add(song_key)
-            # 查找这首歌的所有难度记录
-            same_song_records = [s for s in formatted_results
-                                 if s['title'] == song['title'] and s['artist'] == song['artist']]
-
-            # 为每个难度创建单独的记录
-            for record in same_song_records:
-                final_output.append({
-                    "title": record['title'],
-                    "artist": record['artist'],
-                    "difficulty": record['difficulty'],
-                    "level": record['level'],
-                    "score": record['score']
-                })
+        song_groups.setdefault((song['title'], song['artist']), []).append(song)
+
+    final_output = []
+    for same_song_records in song_groups.values():
+        # 为每个难度创建单独的记录
+        for record in same_song_records:
+            final_output.append({
+                "title": record['title'],
+                "artist": record['artist'],
+                "difficulty": record['difficulty'],
+                "level": record['level'],
+                "score": record['score']
+            })
 
     with open(output_file, 'w', encoding='utf-8') as f:
         json.dump(final_output, f, indent=2, ensure_ascii=False)
@@ -221,16 +184,6 @@ def save_results_to_json(results, output_file='songs_results.json'):
     print(f"共保存 {len(final_output)} 条记录")
 
 
-# 区域坐标定义
-region_rating1 = (559, 1180, 1319, 1323)
-region_song1 = (935, 266, 2272, 346)
-region_artist1 = (1000, 351, 2200, 425)
-
-region_song2 = (1603, 454, 3016, 535)
-region_artist2 = (1681, 555, 3018, 624)
-region_rating2 = (1946, 1485, 2420, 1596)
-
-
 def main():
 
     # 加载歌曲数据
@@ -247,8 +200,11 @@ def main():
             img_path = os.path.join(src_folder, filename)
             print(f"处理文件: {filename}")
 
-            result_type = distinguish(img_path)
-            result_data = process_screenshot(img_path, result_type, songs_data)
+            ctx = load_screenshot(img_path)
+            if ctx is None:
+                continue
+            ctx.result_type = distinguish(ctx)
+            result_data = process_screenshot(ctx, songs_data)
             results.append(result_data)
 
     # 保存结果
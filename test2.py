@@ -1,9 +1,10 @@
 import os
 import json
-import cv2
-import re
 from rapidocr import EngineType, ModelType, OCRVersion, RapidOCR
 from fuzzywuzzy import fuzz
+from Screenshot import load_screenshot
+from Classify import classify, level_for
+from Catalog import Bucket, load_catalog, normalize_text
 
 # 初始化OCR引擎
 engine = RapidOCR(
@@ -16,54 +17,25 @@ engine = RapidOCR(
 
 
 def load_songs_data():
-    """加载歌曲数据"""
-    try:
-        with open('songs_data.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print("songs_data.json 文件未找到，请先运行获取歌曲数据的脚本")
-        return []
+    """加载歌曲数据，返回预先规范化并建好查找表的歌曲目录"""
+    return load_catalog('songs_data.json')
 
 
-def ocr_region(image_path, region_coords):
+def ocr_region(roi):
     """OCR识别指定区域"""
-    img = cv2.imread(image_path)
-    x1, y1, x2, y2 = region_coords
-    roi = img[y1:y2, x1:x2]
     res = engine(roi, use_cls=False, use_det=False, use_rec=True)
     return res
 
 
-def distinguish(image_path):
-    """识别截图类型"""
-    img = cv2.imread(image_path)
-    x, y = 27, 1934
-    b, g, r = img[y, x]
-    return "type2" if (60 <= r <= 66 and 136 <= g <= 142 and 170 <= b <= 176) else "type1"
+def distinguish(ctx):
+    """识别截图类型（同时取好难度探针的样本）"""
+    result_type, _ = classify(ctx)
+    return result_type
 
 
-def get_level(image_path, result_type):
+def get_level(ctx, result_type):
     """获取难度等级"""
-    img = cv2.imread(image_path)
-    if result_type == "type1":
-        x, y = 1590, 441
-        b, g, r = img[y, x]
-        if 210 <= r <= 225 and 135 <= g <= 150 and 235 <= b <= 255:
-            return "Massive"
-        elif 225 <= r <= 238 and 108 <= g <= 120 and 105 <= b <= 120:
-            return "Invaded"
-        else:
-            return "Detected"
-    elif result_type == "type2":
-        x, y = 2982, 1520
-        b, g, r = img[y, x]
-        if 170 <= r <= 190 and 120 <= g <= 135 and 200 <= b <= 215:
-            return "Massive"
-        elif 195 <= r <= 210 and 110 <= g <= 120 and 105 <= b <= 120:
-            return "Invaded"
-        else:
-            return "Detected"
-    return "Unknown"
+    return level_for(ctx, result_type)
 
 
 def clean_ocr_text(text):
@@ -71,21 +43,17 @@ def clean_ocr_text(text):
     return text.replace('/', '').replace('、', '').replace(',', '').strip()
 
 
-def method_partial_ratio(ocr_text, items, threshold=70, key=None):
-    """部分匹配方法"""
+def method_partial_ratio(ocr_text, items, threshold=70, key=None, keys=None):
+    """部分匹配方法，keys 为与 items 一一对应的已规范化文本"""
     best_match = None
     best_score = 0
 
-    ocr_clean = re.sub(r'[^\w\s]', '', ocr_text.lower().strip())
-
-    for item in items:
-        if key:
-            compare_text = item.get(key, '')
-        else:
-            compare_text = str(item)
+    ocr_clean = normalize_text(ocr_text)
 
-        api_clean = re.sub(r'[^\w\s]', '', compare_text.lower().strip())
+    if keys is None:
+        keys = [normalize_text(item.get(key, '') if key else str(item)) for item in items]
 
+    for item, api_clean in zip(items, keys):
         ratio = fuzz.partial_ratio(ocr_clean, api_clean)
 
         if ratio > best_score and ratio >= threshold:
@@ -98,43 +66,46 @@ def method_partial_ratio(ocr_text, items, threshold=70, key=None):
 def find_artist_songs(ocr_artist, songs_data, artist_threshold=70):
     """先匹配曲师，返回该曲师的所有歌曲"""
     # 获取所有唯一的曲师
-    all_artists = list(set([song.get('artist', '') for song in songs_data]))
+    all_artists = songs_data.all_artists
 
     # 匹配曲师
-    matched_artist, artist_score = method_partial_ratio(ocr_artist, all_artists, artist_threshold)
+    matched_artist, artist_score = method_partial_ratio(ocr_artist, all_artists.items, artist_threshold,
+                                                        keys=all_artists.keys)
 
     if matched_artist:
         print(f"匹配到曲师: {matched_artist} (相似度: {artist_score}%)")
 
         # 获取该曲师的所有歌曲
-        artist_songs = [song for song in songs_data if song.get('artist', '') == matched_artist]
-        print(f"该曲师有以下歌曲 ({len(artist_songs)} 首):")
-        for i, song in enumerate(artist_songs, 1):
+        artist_songs = songs_data.songs_for_artist(matched_artist)
+        print(f"该曲师有以下歌曲 ({len(artist_songs.items)} 首):")
+        for i, song in enumerate(artist_songs.items, 1):
             print(
                 f"  {i}. {song.get('title', 'N/A')} - {song.get('difficulty', 'N/A')} (等级: {song.get('level', 'N/A')})")
 
         return matched_artist, artist_songs
     else:
         print(f"未找到匹配的曲师: {ocr_artist}")
-        return None, []
+        return None, Bucket([], [])
 
 
 def find_song_in_artist_songs(ocr_song, artist_songs, level, song_threshold=70):
     """在曲师的歌曲中匹配歌名"""
-    if not artist_songs:
+    if not artist_songs.items:
         return None, 0
 
     # 首先尝试匹配同难度的歌曲
-    same_level_songs = [song for song in artist_songs if song.get('difficulty', '').lower() == level.lower()]
+    same_level_songs = [(song, title_key) for song, title_key in zip(*artist_songs)
+                        if song.get('difficulty', '').lower() == level.lower()]
 
     if same_level_songs:
-        match, score = method_partial_ratio(ocr_song, same_level_songs, song_threshold, key='title')
+        songs, title_keys = zip(*same_level_songs)
+        match, score = method_partial_ratio(ocr_song, songs, song_threshold, keys=title_keys)
         if match:
             print(f"在同难度歌曲中匹配成功 (相似度: {score}%)")
             return match, score
 
     # 如果同难度没找到，尝试所有该曲师的歌曲
-    match, score = method_partial_ratio(ocr_song, artist_songs, song_threshold, key='title')
+    match, score = method_partial_ratio(ocr_song, artist_songs.items, song_threshold, keys=artist_songs.keys)
     if match:
         print(f"在曲师所有歌曲中匹配成功 (相似度: {score}%)")
         return match, score
@@ -142,23 +113,20 @@ def find_song_in_artist_songs(ocr_song, artist_songs, level, song_threshold=70):
     return None, 0
 
 
-def process_screenshot(img_path, result_type, songs_data):
+def process_screenshot(ctx, songs_data):
     """处理单张截图"""
-    # OCR识别各个区域
-    if result_type == "type1":
-        song_result = ocr_region(img_path, region_song1)
-        artist_result = ocr_region(img_path, region_artist1)
-        rating_result = ocr_region(img_path, region_rating1)
-    else:  # type2
-        song_result = ocr_region(img_path, region_song2)
-        artist_result = ocr_region(img_path, region_artist2)
-        rating_result = ocr_region(img_path, region_rating2)
+    # OCR识别各个区域，坐标按截图分辨率换算
+    rois = ctx.set_regions(*ctx.regions())
+    song_result = ocr_region(rois['song'])
+    artist_result = ocr_region(rois['artist'])
+    rating_result = ocr_region(rois['rating'])
 
     # 清理识别结果
     song_name = clean_ocr_text(song_result.txts[0]) if song_result.txts else "Unknown"
     artist = clean_ocr_text(artist_result.txts[0]) if artist_result.txts else "Unknown"
     rating = clean_ocr_text(rating_result.txts[0]) if rating_result.txts else "Unknown"
-    level = get_level(img_path, result_type)
+    level = get_level(ctx, ctx.result_type)
+    ctx.level = level
 
     print(f"\n识别结果:")
     print(f"  歌曲: {song_name}")
@@ -170,7 +138,7 @@ def process_screenshot(img_path, result_type, songs_data):
     matched_artist, artist_songs = find_artist_songs(artist, songs_data)
 
     result_data = {
-        'filename': os.path.basename(img_path),
+        'filename': ctx.filename,
         'ocr_results': {
             'song': song_name,
             'artist': artist,
@@ -179,12 +147,12 @@ def process_screenshot(img_path, result_type, songs_data):
         },
         'match_info': {
             'matched_artist': matched_artist,
-            'artist_song_count': len(artist_songs) if matched_artist else 0
+            'artist_song_count': len(artist_songs.items) if matched_artist else 0
         }
     }
 
     # 第二步：在曲师的歌曲中匹配歌名
-    if matched_artist and artist_songs:
+    if matched_artist and artist_songs.items:
         match, score = find_song_in_artist_songs(song_name, artist_songs, level)
 
         result_data['match_info']['song_match_score'] = score
@@ -265,16 +233,6 @@ def save_results_to_json(results, output_file='songs_results.json'):
         print(f"涉及 {len(artists)} 位曲师，{len(songs)} 首歌曲")
 
 
-# 区域坐标定义
-region_rating1 = (559, 1180, 1319, 1323)
-region_song1 = (935, 266, 2272, 346)
-region_artist1 = (1000, 351, 2200, 425)
-
-region_song2 = (1603, 454, 3016, 535)
-region_artist2 = (1681, 555, 3018, 624)
-region_rating2 = (1946, 1485, 2420, 1596)
-
-
 def main():
     # 检查是否安装了fuzzywuzzy
     try:
@@ -297,8 +255,11 @@ def main():
             img_path = os.path.join(src_folder, filename)
             print(f"处理文件: {filename}")
 
-            result_type = distinguish(img_path)
-            result_data = process_screenshot(img_path, result_type, songs_data)
+            ctx = load_screenshot(img_path)
+            if ctx is None:
+                continue
+            ctx.result_type = distinguish(ctx)
+            result_data = process_screenshot(ctx, songs_data)
             results.append(result_data)
 
     # 保存结果
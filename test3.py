@@ -1,69 +1,156 @@
 import os
-import json
-import cv2
-import re
-from rapidocr import EngineType, ModelType, OCRVersion, RapidOCR
-from fuzzywuzzy import fuzz
-
-# 初始化OCR引擎
-engine = RapidOCR(
-    params={
-        "Rec.ocr_version": OCRVersion.PPOCRV5,
-        "Rec.engine_type": EngineType.ONNXRUNTIME,
-        "Rec.model_type": ModelType.MOBILE,
-    }
-)
+import argparse
+from rapidocr import EngineType, ModelType, OCRVersion
+from Decode import REGION_DECODE
+from Screenshot import load_screenshot
+from Classify import classify, level_for
+from Batch import FIELDS, collect_crops, recognize_batch
+from Cache import CACHE_FILE, MATCH_MEMO_FILE, MatchMemo, OCRCache
+from Catalog import load_catalog, normalize_text
+from Digits import DIGITS_FILE, DigitReader
+from TitleHash import LEARN_MIN_SCORE, TITLE_HASH_FILE, TitleHashIndex
+from Engine import add_session_arguments, config_from_args, create_engine, session_config
+from Matcher import HAVE_RAPIDFUZZ, extract_best, match_joint, match_joint_batch
+from NGram import shortlist_match
+from Results import ResultWriter, compact, iter_journal, journal_path, output_records, write_records
+import Trace
+from Trace import TRACE_FILE
+
+# 未安装rapidfuzz时用fuzzywuzzy逐条打分
+try:
+    from fuzzywuzzy import fuzz
+except ImportError:
+    fuzz = None
+
+# OCR引擎参数
+OCR_PARAMS = {
+    "Rec.ocr_version": OCRVersion.PPOCRV5,
+    "Rec.engine_type": EngineType.ONNXRUNTIME,
+    "Rec.model_type": ModelType.MOBILE,
+}
+
+# 匹配方式：cascade 按难度→曲师→歌名逐级匹配，joint 对每一行联合打分
+MATCH_MODE = 'cascade'
+
+# 匹配结果的LRU缓存，首次匹配时按歌曲目录版本创建
+match_memo = None
+
+# OCR引擎在首次使用时创建，多进程时每个子进程各自创建一次
+engine = None
+
+# 分数区域的数字识别器，启用后置信度足够的分数不再经过OCR
+digit_reader = None
+
+# 歌名图像的感知哈希索引，启用后已确认过的歌名不再OCR和模糊匹配
+title_index = None
+
+# 结果日志，启用后每张截图处理完就追加一行，程序中途退出时已处理的结果不会丢失
+result_writer = None
+
+# ORT会话配置（线程数、图优化级别等），默认整机CPU预算给一个引擎
+ENGINE_CONFIG = session_config()
+
+# 歌曲目录文件，负载测试时改用生成截图所用的目录
+SONGS_FILE = 'songs_data.json'
+
+
+def set_match_mode(mode):
+    """设置匹配方式"""
+    global MATCH_MODE
+    MATCH_MODE = mode
+
+
+def set_songs_file(path):
+    """设置歌曲目录文件，需在加载歌曲数据之前调用"""
+    global SONGS_FILE
+    if path:
+        SONGS_FILE = path
+
+
+def set_rec_model(model_path):
+    """改用指定的识别模型文件（例如INT8量化模型），需在首次创建引擎之前调用"""
+    if model_path:
+        OCR_PARAMS["Rec.model_path"] = model_path
+
+
+def init_digit_reader(path=None):
+    """启用分数数字识别器，path 不为空时在多次运行之间保留学到的模板"""
+    global digit_reader
+    digit_reader = DigitReader(path)
+    return digit_reader
+
+
+def init_title_index(path=None):
+    """启用歌名图像索引，path 不为空时在多次运行之间保留"""
+    global title_index
+    title_index = TitleHashIndex(path)
+    return title_index
+
+
+def init_result_writer(path):
+    """启用结果日志（JSON Lines），每次运行重新开始"""
+    global result_writer
+    result_writer = ResultWriter(path)
+    return result_writer
+
+
+def collect_result(result_data):
+    """把一张截图的结果追加到结果日志，运行过程中结果只保存在日志中，不在内存中累积"""
+    if result_writer is not None:
+        result_writer.append(result_data)
+
+
+def set_engine_config(config):
+    """设置ORT会话配置，需在首次创建引擎之前调用"""
+    global ENGINE_CONFIG
+    ENGINE_CONFIG = config
+
+
+def init_match_memo(songs_data, path=None, max_entries=4096, read_only=False):
+    """创建匹配结果缓存，path 不为空时在多次运行之间保留"""
+    global match_memo
+    match_memo = MatchMemo(songs_data.version, max_entries, path, read_only)
+    return match_memo
+
+
+def get_match_memo(songs_data):
+    """获取匹配结果缓存，歌曲目录变化时自动失效"""
+    if match_memo is None:
+        return init_match_memo(songs_data)
+    match_memo.check_catalog(songs_data.version)
+    return match_memo
+
+
+def get_engine():
+    """获取当前进程的OCR引擎"""
+    global engine
+    if engine is None:
+        engine = create_engine(OCR_PARAMS, ENGINE_CONFIG)
+    return engine
 
 
 def load_songs_data():
-    """加载歌曲数据"""
-    try:
-        with open('songs_data.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print("songs_data.json 文件未找到，请先运行获取歌曲数据的脚本")
-        return []
+    """加载歌曲数据，返回预先规范化并建好查找表的歌曲目录"""
+    return load_catalog(SONGS_FILE)
 
 
-def ocr_region(image_path, region_coords):
+def ocr_region(roi):
     """OCR识别指定区域"""
-    img = cv2.imread(image_path)
-    x1, y1, x2, y2 = region_coords
-    roi = img[y1:y2, x1:x2]
-    res = engine(roi, use_cls=False, use_det=False, use_rec=True)
+    res = get_engine()(roi, use_cls=False, use_det=False, use_rec=True)
     return res
 
 
-def distinguish(image_path):
-    """识别截图类型"""
-    img = cv2.imread(image_path)
-    x, y = 27, 1934
-    b, g, r = img[y, x]
-    return "type2" if (60 <= r <= 66 and 136 <= g <= 142 and 170 <= b <= 176) else "type1"
+def distinguish(ctx):
+    """识别截图类型（同时取好难度探针的样本）"""
+    with Trace.span('classify'):
+        result_type, _ = classify(ctx)
+    return result_type
 
 
-def get_level(image_path, result_type):
+def get_level(ctx, result_type):
     """获取难度等级"""
-    img = cv2.imread(image_path)
-    if result_type == "type1":
-        x, y = 1590, 441
-        b, g, r = img[y, x]
-        if 210 <= r <= 225 and 135 <= g <= 150 and 235 <= b <= 255:
-            return "Massive"
-        elif 225 <= r <= 238 and 108 <= g <= 120 and 105 <= b <= 120:
-            return "Invaded"
-        else:
-            return "Detected"
-    elif result_type == "type2":
-        x, y = 2982, 1520
-        b, g, r = img[y, x]
-        if 170 <= r <= 190 and 120 <= g <= 135 and 200 <= b <= 215:
-            return "Massive"
-        elif 195 <= r <= 210 and 110 <= g <= 120 and 105 <= b <= 120:
-            return "Invaded"
-        else:
-            return "Detected"
-    return "Unknown"
+    with Trace.span('level'):
+        return level_for(ctx, result_type)
 
 
 def clean_ocr_text(text):
@@ -71,21 +158,21 @@ def clean_ocr_text(text):
     return text.replace('/', '').replace('、', '').replace(',', '').strip()
 
 
-def method_partial_ratio(ocr_text, items, threshold=70, key=None):
-    """部分匹配方法"""
+def method_partial_ratio(ocr_text, items, threshold=70, key=None, keys=None):
+    """部分匹配方法，keys 为与 items 一一对应的已规范化文本"""
     best_match = None
     best_score = 0
 
-    ocr_clean = re.sub(r'[^\w\s]', '', ocr_text.lower().strip())
+    ocr_clean = normalize_text(ocr_text)
 
-    for item in items:
-        if key:
-            compare_text = item.get(key, '')
-        else:
-            compare_text = str(item)
+    if keys is None:
+        keys = [normalize_text(item.get(key, '') if key else str(item)) for item in items]
 
-        api_clean = re.sub(r'[^\w\s]', '', compare_text.lower().strip())
+    # 安装了rapidfuzz时用原生实现一次扫完所有候选
+    if HAVE_RAPIDFUZZ:
+        return extract_best(ocr_text, items, keys, 'partial_ratio', threshold)
 
+    for item, api_clean in zip(items, keys):
         ratio = fuzz.partial_ratio(ocr_clean, api_clean)
 
         if ratio > best_score and ratio >= threshold:
@@ -97,17 +184,12 @@ def method_partial_ratio(ocr_text, items, threshold=70, key=None):
 
 def get_artists_by_difficulty(difficulty, songs_data):
     """获取指定难度的所有曲师"""
-    artists = list(set([song.get('artist', '') for song in songs_data
-                        if song.get('difficulty', '').lower() == difficulty.lower()]))
-    return artists
+    return songs_data.artists_for_difficulty(difficulty)
 
 
 def get_songs_by_artist_and_difficulty(artist, difficulty, songs_data):
     """获取指定曲师在指定难度下的所有歌曲"""
-    songs = [song for song in songs_data
-             if song.get('artist', '').lower() == artist.lower()
-             and song.get('difficulty', '').lower() == difficulty.lower()]
-    return songs
+    return songs_data.songs_for(artist, difficulty)
 
 
 def match_difficulty_artist_song(ocr_difficulty, ocr_artist, ocr_song, songs_data,
@@ -116,8 +198,10 @@ def match_difficulty_artist_song(ocr_difficulty, ocr_artist, ocr_song, songs_dat
 
     # 第一步：匹配难度
     print(f"\n第一步：匹配难度 '{ocr_difficulty}'")
-    all_difficulties = list(set([song.get('difficulty', '') for song in songs_data]))
-    matched_difficulty, diff_score = method_partial_ratio(ocr_difficulty, all_difficulties, difficulty_threshold)
+    all_difficulties = songs_data.all_difficulties
+    with Trace.span('match.difficulty'):
+        matched_difficulty, diff_score = method_partial_ratio(ocr_difficulty, all_difficulties.items,
+                                                              difficulty_threshold, keys=all_difficulties.keys)
 
     if not matched_difficulty:
         print(f"❌ 未找到匹配的难度")
@@ -128,13 +212,18 @@ def match_difficulty_artist_song(ocr_difficulty, ocr_artist, ocr_song, songs_dat
     # 第二步：在匹配的难度中匹配曲师
     print(f"\n第二步：在难度 '{matched_difficulty}' 中匹配曲师 '{ocr_artist}'")
     difficulty_artists = get_artists_by_difficulty(matched_difficulty, songs_data)
-    matched_artist, artist_score = method_partial_ratio(ocr_artist, difficulty_artists, artist_threshold)
+    with Trace.span('match.artist', candidates=len(difficulty_artists.items)):
+        matched_artist, artist_score = method_partial_ratio(ocr_artist, difficulty_artists.items,
+                                                            artist_threshold, keys=difficulty_artists.keys)
 
     if not matched_artist:
         print(f"❌ 在难度 '{matched_difficulty}' 中未找到匹配的曲师")
         # 尝试在所有曲师中匹配
-        all_artists = list(set([song.get('artist', '') for song in songs_data]))
-        matched_artist, artist_score = method_partial_ratio(ocr_artist, all_artists, artist_threshold)
+        # 曲师较多，先用n-gram索引取短名单
+        with Trace.span('match.artist_all'):
+            matched_artist, artist_score = shortlist_match(normalize_text(ocr_artist), songs_data.all_artists.items,
+                                                           songs_data.artist_index, method_partial_ratio,
+                                                           threshold=artist_threshold)
         if matched_artist:
             print(f"⚠️  在所有曲师中匹配到: {matched_artist} (相似度: {artist_score}%)")
         else:
@@ -147,12 +236,14 @@ def match_difficulty_artist_song(ocr_difficulty, ocr_artist, ocr_song, songs_dat
     print(f"\n第三步：在难度 '{matched_difficulty}' 和曲师 '{matched_artist}' 中匹配歌名 '{ocr_song}'")
     artist_songs = get_songs_by_artist_and_difficulty(matched_artist, matched_difficulty, songs_data)
 
-    if artist_songs:
-        print(f"曲师 '{matched_artist}' 在难度 '{matched_difficulty}' 下有 {len(artist_songs)} 首歌曲:")
-        for i, song in enumerate(artist_songs, 1):
+    if artist_songs.items:
+        print(f"曲师 '{matched_artist}' 在难度 '{matched_difficulty}' 下有 {len(artist_songs.items)} 首歌曲:")
+        for i, song in enumerate(artist_songs.items, 1):
             print(f"  {i}. {song.get('title', 'N/A')} (等级: {song.get('level', 'N/A')})")
 
-        matched_song, song_score = method_partial_ratio(ocr_song, artist_songs, song_threshold, key='title')
+        with Trace.span('match.song', candidates=len(artist_songs.items)):
+            matched_song, song_score = method_partial_ratio(ocr_song, artist_songs.items, song_threshold,
+                                                            keys=artist_songs.keys)
 
         if matched_song:
             print(f"✅ 匹配到歌曲: {matched_song.get('title', 'N/A')} (相似度: {song_score}%)")
@@ -165,14 +256,16 @@ def match_difficulty_artist_song(ocr_difficulty, ocr_artist, ocr_song, songs_dat
 
     # 如果在前三步没找到，尝试在曲师的所有歌曲中匹配
     print(f"\n备选方案：在曲师 '{matched_artist}' 的所有歌曲中匹配")
-    all_artist_songs = [song for song in songs_data if song.get('artist', '').lower() == matched_artist.lower()]
-    if all_artist_songs:
-        print(f"曲师 '{matched_artist}' 共有 {len(all_artist_songs)} 首歌曲:")
-        for i, song in enumerate(all_artist_songs, 1):
+    all_artist_songs = songs_data.songs_for_artist(matched_artist)
+    if all_artist_songs.items:
+        print(f"曲师 '{matched_artist}' 共有 {len(all_artist_songs.items)} 首歌曲:")
+        for i, song in enumerate(all_artist_songs.items, 1):
             print(
                 f"  {i}. {song.get('title', 'N/A')} - {song.get('difficulty', 'N/A')} (等级: {song.get('level', 'N/A')})")
 
-        matched_song, song_score = method_partial_ratio(ocr_song, all_artist_songs, song_threshold, key='title')
+        with Trace.span('match.song_all', candidates=len(all_artist_songs.items)):
+            matched_song, song_score = method_partial_ratio(ocr_song, all_artist_songs.items, song_threshold,
+                                                            keys=all_artist_songs.keys)
         if matched_song:
             print(
                 f"✅ 匹配到歌曲: {matched_song.get('title', 'N/A')} (难度: {matched_song.get('difficulty', 'N/A')}) (相似度: {song_score}%)")
@@ -183,23 +276,232 @@ def match_difficulty_artist_song(ocr_difficulty, ocr_artist, ocr_song, songs_dat
     return matched_difficulty, matched_artist, None, 0
 
 
-def process_screenshot(img_path, result_type, songs_data):
+def match_joint_difficulty_artist_song(ocr_difficulty, ocr_artist, ocr_song, songs_data, threshold=70,
+                                       joint_result=None):
+    """联合匹配：目录中每一行 (歌名, 曲师, 难度) 只打一次加权总分
+
+    返回值与 match_difficulty_artist_song 相同，末尾多一个与次优歌曲的分差。
+    joint_result 为 prematch_joint 预先算好的 match_joint 结果。
+    """
+    print(f"\n联合匹配：难度 '{ocr_difficulty}'、曲师 '{ocr_artist}'、歌名 '{ocr_song}'")
+    if joint_result is None:
+        with Trace.span('match.joint'):
+            joint_result = match_joint(ocr_difficulty, ocr_artist, ocr_song, songs_data, threshold=threshold)
+    matched_song, total_score, margin, components = joint_result
+
+    if not matched_song:
+        print(f"❌ 未找到匹配的歌曲 (最高综合分: {total_score:.1f}%)")
+        return None, None, None, 0, margin
+
+    print(f"✅ 难度 {components['difficulty']:.0f}% / 曲师 {components['artist']:.0f}% / "
+          f"歌名 {components['title']:.0f}%，领先次优歌曲 {margin:.1f} 分")
+    return (matched_song.get('difficulty', ''), matched_song.get('artist', ''), matched_song,
+            total_score, margin)
+
+
+def match_memo_key(memo, level, artist, song_name):
+    return memo.make_key(MATCH_MODE, level, normalize_text(artist), normalize_text(song_name))
+
+
+def prematch_joint(queries, songs_data):
+    """联合匹配模式下一次算出多张截图的匹配结果
+
+    queries 为 (难度, 曲师, 歌名) 列表，已在匹配缓存中的跳过；
+    返回 {匹配缓存键: match_joint 结果}，供 memoized_match 使用。
+    """
+    memo = get_match_memo(songs_data)
+    pending = {}
+    for level, artist, song_name in queries:
+        key = match_memo_key(memo, level, artist, song_name)
+        if key not in memo.entries:
+            pending[key] = (level, artist, song_name)
+    if not pending:
+        return {}
+    with Trace.span('match.joint_batch', queries=len(pending)):
+        results = match_joint_batch(list(pending.values()), songs_data)
+    return dict(zip(pending, results))
+
+
+def memoized_match(level, artist, song_name, songs_data, prematched=None):
+    """带LRU缓存的匹配，同一组OCR文本只匹配一次
+
+    返回 (难度, 曲师, 歌曲, 综合分, 次优分差)，逐级匹配时分差为None。
+    prematched 为 prematch_joint 的结果，只在联合匹配时使用。
+    """
+    memo = get_match_memo(songs_data)
+    key = match_memo_key(memo, level, artist, song_name)
+    with Trace.span('match.memo') as trace_span:
+        cached = memo.get(key)
+        trace_span.set(hit=cached is not None)
+    if cached is not None:
+        print("\n♻️ 命中匹配缓存")
+        return tuple(cached)
+
+    if MATCH_MODE == 'joint':
+        joint_result = prematched.get(key) if prematched else None
+        result = match_joint_difficulty_artist_song(level, artist, song_name, songs_data,
+                                                    joint_result=joint_result)
+    else:
+        # 按照难度→曲师→歌名的顺序进行匹配
+        result = match_difficulty_artist_song(level, artist, song_name, songs_data) + (None,)
+    memo.put(key, list(result))
+    return result
+
+
+def select_regions(ctx):
+    """按截图类型取出歌名、曲师、分数区域，坐标按截图分辨率换算；已取出时直接复用"""
+    if ctx.rois:
+        return ctx.rois
+    # 快速模式下区域在这里单独解码
+    with Trace.span('regions', fast=ctx.fast):
+        return ctx.set_regions(*ctx.regions())
+
+
+def first_text(txts):
+    """取第一条识别结果并清理"""
+    return clean_ocr_text(txts[0]) if txts else "Unknown"
+
+
+def prepare_screenshot(ctx):
+    """取出待识别区域并识别难度（OCR之前的全部步骤）"""
+    rois = select_regions(ctx)
+    ctx.level = get_level(ctx, ctx.result_type)
+    return rois
+
+
+def ocr_rois(rois):
+    """OCR识别各区域，返回原始文本和置信度"""
+    raw_results = {}
+    for field, roi in rois.items():
+        with Trace.span(f'ocr.{field}') as trace_span:
+            if field == 'rating' and digit_reader is not None:
+                text, confidence = digit_reader.read(roi)
+                if text is not None:
+                    trace_span.set(via='digits')
+                    raw_results[field] = {'txts': [text], 'scores': [confidence]}
+                    continue
+
+            trace_span.set(via='rec')
+            res = ocr_region(roi)
+            raw_results[field] = {'txts': list(res.txts or []), 'scores': list(res.scores or [])}
+            if field == 'rating' and digit_reader is not None:
+                digit_reader.learn_from_ocr(roi, raw_results[field]['txts'], raw_results[field]['scores'])
+    return raw_results
+
+
+def clean_raw_results(raw_results):
+    """从原始识别结果中取出清理后的文本"""
+    return {field: first_text(raw['txts']) for field, raw in raw_results.items()}
+
+
+def recognize_rois(rois):
+    """OCR识别歌名、曲师、分数区域"""
+    return clean_raw_results(ocr_rois(rois))
+
+
+def cache_key(cache, ctx):
+    """截图的OCR缓存键，需在释放原始字节之前计算"""
+    return cache.make_key(ctx.content_hash(), ctx.result_type, ctx.regions(), OCR_PARAMS)
+
+
+def recognize_screenshot(ctx, cache=None):
+    """OCR识别歌名、曲师、分数区域，并识别难度
+
+    传入 cache 时先按文件内容查缓存，命中则跳过区域解码和识别。
+    """
+    if cache is None:
+        return recognize_rois(prepare_screenshot(ctx))
+
+    ctx.level = get_level(ctx, ctx.result_type)
+    key = cache_key(cache, ctx)
+    raw_results = cache.get(key)
+    if raw_results is None:
+        raw_results = ocr_rois(select_regions(ctx))
+        cache.put(key, raw_results)
+    return clean_raw_results(raw_results)
+
+
+def process_screenshot(ctx, songs_data, cache=None):
     """处理单张截图"""
-    # OCR识别各个区域
-    if result_type == "type1":
-        song_result = ocr_region(img_path, region_song1)
-        artist_result = ocr_region(img_path, region_artist1)
-        rating_result = ocr_region(img_path, region_rating1)
-    else:  # type2
-        song_result = ocr_region(img_path, region_song2)
-        artist_result = ocr_region(img_path, region_artist2)
-        rating_result = ocr_region(img_path, region_rating2)
-
-    # 清理识别结果
-    song_name = clean_ocr_text(song_result.txts[0]) if song_result.txts else "Unknown"
-    artist = clean_ocr_text(artist_result.txts[0]) if artist_result.txts else "Unknown"
-    rating = clean_ocr_text(rating_result.txts[0]) if rating_result.txts else "Unknown"
-    level = get_level(img_path, result_type)
+    if title_index is not None:
+        prepare_screenshot(ctx)
+        known_song = lookup_title(ctx, songs_data)
+        if known_song is not None:
+            return known_title_result(ctx, recognize_rois({'rating': ctx.rois['rating']}), known_song)
+
+    ocr_texts = recognize_screenshot(ctx, cache)
+    result_data = match_screenshot(ctx, ocr_texts, songs_data)
+    remember_title(ctx, result_data)
+    return result_data
+
+
+def lookup_title(ctx, songs_data):
+    """按歌名区域的图像哈希查找已确认过的歌曲，返回当前难度下的目录记录，未命中返回None"""
+    if title_index is None or 'song' not in ctx.rois:
+        return None
+    with Trace.span('title_hash') as trace_span:
+        song = title_index.lookup(ctx.rois['song'])
+        trace_span.set(hit=song is not None)
+    if song is None:
+        return None
+    title, artist = song
+    bucket = songs_data.songs_for(artist, ctx.level)
+    return next((item for item in bucket.items if item.get('title') == title), None)
+
+
+def remember_title(ctx, result_data):
+    """把高相似度的匹配结果加入歌名图像索引"""
+    matched_song = result_data.get('matched_song')
+    if (title_index is None or not matched_song or 'song' not in ctx.rois
+            or result_data['match_info']['total_match_score'] < LEARN_MIN_SCORE):
+        return
+    title_index.add(ctx.rois['song'], matched_song['title'], matched_song['artist'])
+
+
+def matched_song_record(song, rating):
+    """结果中的 matched_song 字段"""
+    return {
+        'title': song.get('title', ''),
+        'artist': song.get('artist', ''),
+        'level': song.get('level', ''),
+        'difficulty': song.get('difficulty', ''),
+        'score': rating
+    }
+
+
+def known_title_result(ctx, ocr_texts, song):
+    """歌名图像命中时直接生成结果数据，只用到分数的识别结果"""
+    rating = ocr_texts['rating']
+    print(f"\n🖼️ 歌名图像命中:")
+    print(f"  📝 歌曲: {song.get('title', 'N/A')}")
+    print(f"  👤 曲师: {song.get('artist', 'N/A')}")
+    print(f"  🎯 难度: {song.get('difficulty', 'N/A')}")
+    print(f"  分数: {rating}")
+    print("=" * 70)
+    return {
+        'filename': ctx.filename,
+        'ocr_results': {
+            'song': song.get('title', ''),
+            'artist': song.get('artist', ''),
+            'rating': rating,
+            'level': ctx.level
+        },
+        'match_info': {
+            'matched_difficulty': song.get('difficulty', ''),
+            'matched_artist': song.get('artist', ''),
+            'total_match_score': 100,
+            'matched_by': 'title_hash'
+        },
+        'matched_song': matched_song_record(song, rating)
+    }
+
+
+def match_screenshot(ctx, ocr_texts, songs_data, prematched=None):
+    """根据OCR结果匹配歌曲并生成结果数据，prematched 见 memoized_match"""
+    song_name = ocr_texts['song']
+    artist = ocr_texts['artist']
+    rating = ocr_texts['rating']
+    level = ctx.level
 
     print(f"\n🎯 识别结果:")
     print(f"  歌曲: {song_name}")
@@ -207,12 +509,11 @@ def process_screenshot(img_path, result_type, songs_data):
     print(f"  分数: {rating}")
     print(f"  难度: {level}")
 
-    # 按照难度→曲师→歌名的顺序进行匹配
-    matched_difficulty, matched_artist, matched_song, total_score = match_difficulty_artist_song(
-        level, artist, song_name, songs_data)
+    matched_difficulty, matched_artist, matched_song, total_score, margin = memoized_match(
+        level, artist, song_name, songs_data, prematched)
 
     result_data = {
-        'filename': os.path.basename(img_path),
+        'filename': ctx.filename,
         'ocr_results': {
             'song': song_name,
             'artist': artist,
@@ -225,6 +526,8 @@ def process_screenshot(img_path, result_type, songs_data):
             'total_match_score': total_score
         }
     }
+    if margin is not None:
+        result_data['match_info']['runner_up_margin'] = margin
 
     if matched_song:
         print(f"\n🎉 最终匹配成功 (综合相似度: {total_score:.1f}%):")
@@ -234,13 +537,7 @@ def process_screenshot(img_path, result_type, songs_data):
         print(f"  🎯 难度: {matched_song.get('difficulty', 'N/A')}")
 
         # 添加匹配的歌曲信息
-        result_data['matched_song'] = {
-            'title': matched_song.get('title', ''),
-            'artist': matched_song.get('artist', ''),
-            'level': matched_song.get('level', ''),
-            'difficulty': matched_song.get('difficulty', ''),
-            'score': rating
-        }
+        result_data['matched_song'] = matched_song_record(matched_song, rating)
     else:
         print(f"\n❌ 匹配失败")
         result_data['matched_song'] = None
@@ -249,69 +546,209 @@ def process_screenshot(img_path, result_type, songs_data):
     return result_data
 
 
-def save_results_to_json(results, output_file='songs_results.json'):
-    """按照指定格式保存结果到JSON文件"""
-    formatted_results = []
-
-    for result in results:
-        if result.get('matched_song'):
-            song_data = result['matched_song'].copy()
-            # 确保level是数值类型
-            try:
-                song_data['level'] = float(song_data['level'])
-            except (ValueError, TypeError):
-                song_data['level'] = 0.0
-
-            formatted_results.append(song_data)
-
-    # 按歌曲名和艺术家分组，合并不同难度的记录
-    final_output = []
-    seen_combinations = set()
-
-    for song in formatted_results:
-        # 创建唯一标识符（歌曲+艺术家+难度）
-        combo_key = f"{song['title']}|{song['artist']}|{song['difficulty']}"
-
-        if combo_key not in seen_combinations:
-            seen_combinations.add(combo_key)
-            final_output.append({
-                "title": song['title'],
-                "artist": song['artist'],
-                "difficulty": song['difficulty'],
-                "level": song['level'],
-                "score": song['score']
-            })
-
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(final_output, f, indent=2, ensure_ascii=False)
-
+def print_save_summary(output_file, summary):
     print(f"\n💾 结果已保存到 {output_file}")
-    print(f"📊 共保存 {len(final_output)} 条记录")
-
-    # 显示统计信息
-    if final_output:
-        artists = set([song['artist'] for song in final_output])
-        songs = set([song['title'] for song in final_output])
-        difficulties = set([song['difficulty'] for song in final_output])
-        print(f"🎵 涉及 {len(artists)} 位曲师，{len(songs)} 首歌曲，{len(difficulties)} 种难度")
-
-
-# 区域坐标定义
-region_rating1 = (559, 1180, 1319, 1323)
-region_song1 = (935, 266, 2272, 346)
-region_artist1 = (1000, 351, 2200, 425)
+    print(f"📊 共保存 {summary['records']} 条记录")
+    if summary['records']:
+        print(f"🎵 涉及 {summary['artists']} 位曲师，{summary['songs']} 首歌曲，{summary['difficulties']} 种难度")
 
-region_song2 = (1603, 454, 3016, 535)
-region_artist2 = (1681, 555, 3018, 624)
-region_rating2 = (1946, 1485, 2420, 1596)
 
-
-def main():
-    # 检查是否安装了fuzzywuzzy
-    try:
-        from fuzzywuzzy import fuzz
-    except ImportError:
-        print("请先安装fuzzywuzzy: pip install fuzzywuzzy python-Levenshtein")
+def save_results_to_json(results, output_file='songs_results.json'):
+    """按照指定格式保存结果到JSON文件，同一 (歌名, 曲师, 难度) 只保留首次出现的记录"""
+    with Trace.span('write') as trace_span:
+        summary = write_records(output_records(results), output_file)
+        trace_span.set(records=summary['records'])
+    print_save_summary(output_file, summary)
+
+
+def compact_results(journal_file, output_file='songs_results.json'):
+    """由结果日志生成最终的JSON文件，输出与 save_results_to_json 相同"""
+    with Trace.span('write', journal=True) as trace_span:
+        summary = compact(journal_file, output_file)
+        trace_span.set(records=summary['records'])
+    print_save_summary(output_file, summary)
+    return summary
+
+
+def list_screenshots(src_folder):
+    """按文件名排序列出截图"""
+    return [filename for filename in sorted(os.listdir(src_folder))
+            if filename.upper().endswith('.JPG')]
+
+
+def print_file_header(filename):
+    print(f"\n{'=' * 80}")
+    print(f"📁 处理文件: {filename}")
+    print(f"{'=' * 80}")
+
+
+def run_serial(filenames, src_folder, songs_data, args, cache=None):
+    """逐张处理截图，返回得到结果的截图数"""
+    count = 0
+    for filename in filenames:
+        img_path = os.path.join(src_folder, filename)
+        print_file_header(filename)
+
+        with Trace.screenshot(filename):
+            ctx = load_screenshot(img_path, fast=args.fast)
+            if ctx is None:
+                continue
+            ctx.result_type = distinguish(ctx)
+            result_data = process_screenshot(ctx, songs_data, cache)
+        collect_result(result_data)
+        count += 1
+    return count
+
+
+def batch_raw_results(rec_results, filename):
+    """把批量识别结果整理成与 ocr_rois 相同的格式，用于写入缓存"""
+    raw_results = {}
+    for field in FIELDS:
+        txt, score = rec_results[(filename, field)]
+        raw_results[field] = {'txts': [txt] if txt else [], 'scores': [score]}
+    return raw_results
+
+
+def run_batched(filenames, src_folder, songs_data, args, cache=None):
+    """先收集所有截图的区域，再跨截图批量识别，最后逐张匹配
+
+    传入 cache 时命中缓存的截图不参与批量识别，其余截图识别后写入缓存。返回得到结果的截图数。
+    """
+    contexts = []
+    crops = []
+    digit_results = {}
+    known_songs = {}
+    cached_texts = {}
+    cache_keys = {}
+    for filename in filenames:
+        with Trace.screenshot(filename, 'batch.prepare'):
+            ctx = load_screenshot(os.path.join(src_folder, filename), fast=args.fast)
+            if ctx is None:
+                continue
+            ctx.result_type = distinguish(ctx)
+            prepare_screenshot(ctx)
+            key = cache_key(cache, ctx) if cache is not None else None
+            # 只保留区域像素，释放整张截图
+            ctx.release()
+            contexts.append(ctx)
+            known_song = lookup_title(ctx, songs_data)
+            if known_song is not None:
+                known_songs[ctx.filename] = known_song
+            elif key is not None:
+                raw_results = cache.get(key)
+                if raw_results is not None:
+                    cached_texts[ctx.filename] = clean_raw_results(raw_results)
+                    continue
+                cache_keys[ctx.filename] = key
+            for key, roi in collect_crops(ctx):
+                # 歌名图像命中时只需要识别分数
+                if known_song is not None and key[1] != 'rating':
+                    continue
+                if key[1] == 'rating' and digit_reader is not None:
+                    with Trace.span('ocr.rating', via='digits'):
+                        text, confidence = digit_reader.read(roi)
+                    if text is not None:
+                        digit_results[key] = (text, confidence)
+                        continue
+                crops.append((key, roi))
+
+    rec_results = {}
+    # 全部命中缓存或由数字模板读出时没有需要识别的区域，不必加载识别模型
+    if crops:
+        print(f"批量识别 {len(crops)} 个区域 (batch_size={args.batch_size})")
+        # 跨截图的批量识别不属于某一张截图
+        with Trace.span('ocr.batch', crops=len(crops), batch_size=args.batch_size):
+            rec_results = recognize_batch(get_engine(), crops, args.batch_size)
+    if digit_reader is not None:
+        for key, roi in crops:
+            if key[1] == 'rating':
+                txt, score = rec_results[key]
+                digit_reader.learn_from_ocr(roi, [txt], [score])
+    rec_results.update(digit_results)
+    for filename, key in cache_keys.items():
+        cache.put(key, batch_raw_results(rec_results, filename))
+
+    all_texts = {}
+    for ctx in contexts:
+        ocr_texts = dict(cached_texts.get(ctx.filename, {}))
+        for field in FIELDS:
+            if (ctx.filename, field) in rec_results:
+                txt, _ = rec_results[(ctx.filename, field)]
+                ocr_texts[field] = first_text([txt] if txt else [])
+        all_texts[ctx.filename] = ocr_texts
+
+    # 联合匹配时所有截图一起对整个目录打分；逐级匹配的候选集合依赖上一步的结果，仍逐张匹配
+    prematched = None
+    if MATCH_MODE == 'joint':
+        prematched = prematch_joint([(ctx.level, all_texts[ctx.filename]['artist'], all_texts[ctx.filename]['song'])
+                                     for ctx in contexts if ctx.filename not in known_songs], songs_data)
+
+    for ctx in contexts:
+        print_file_header(ctx.filename)
+        ocr_texts = all_texts[ctx.filename]
+        if ctx.filename in known_songs:
+            collect_result(known_title_result(ctx, ocr_texts, known_songs[ctx.filename]))
+            continue
+        with Trace.screenshot(ctx.filename, 'batch.match'):
+            result_data = match_screenshot(ctx, ocr_texts, songs_data, prematched)
+            remember_title(ctx, result_data)
+        collect_result(result_data)
+    return len(contexts)
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="Paradigm: Reboot 成绩截图识别")
+    parser.add_argument('--src', default="SCR", help="截图文件夹")
+    parser.add_argument('--output', default='songs_results.json', help="结果输出文件")
+    parser.add_argument('--songs', default=SONGS_FILE, help="歌曲目录文件")
+    parser.add_argument('--fast', action='store_true',
+                        help="探针使用缩小解码，只解码歌名/曲师/分数区域（需要 PyTurboJPEG）")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="多进程处理的进程数，0表示单进程")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="解码、OCR、匹配、写入四个阶段并行的流水线模式")
+    parser.add_argument('--queue-size', type=int, default=4,
+                        help="流水线模式下最多缓存的已解码截图数")
+    parser.add_argument('--match', choices=['cascade', 'joint'], default='cascade',
+                        help="匹配方式：cascade 逐级匹配，joint 联合打分")
+    parser.add_argument('--match-memo', nargs='?', const=MATCH_MEMO_FILE, default=None,
+                        help="在多次运行之间保留匹配结果缓存（JSON文件路径）")
+    parser.add_argument('--cache', nargs='?', const=CACHE_FILE, default=None,
+                        help="启用OCR结果缓存（SQLite文件路径）")
+    parser.add_argument('--cache-size', type=int, default=20000, help="缓存最多保留的截图数")
+    parser.add_argument('--batch-size', type=int, default=0,
+                        help="跨截图批量识别的批大小，0表示逐个区域识别")
+    parser.add_argument('--digits', nargs='?', const=DIGITS_FILE, default=None,
+                        help="分数区域使用模板数字识别，低置信度时退回OCR（模板文件路径）")
+    parser.add_argument('--title-hash', nargs='?', const=TITLE_HASH_FILE, default=None,
+                        help="歌名图像命中已确认的歌曲时跳过OCR和模糊匹配（索引文件路径）")
+    parser.add_argument('--trace', nargs='?', const=TRACE_FILE, default=None,
+                        help="记录各步骤耗时（JSON Lines 文件路径），同时导出 Chrome/Perfetto 追踪文件")
+    parser.add_argument('--rec-model', default=None,
+                        help="使用指定的识别模型文件，例如 Quantize.py 生成的INT8模型")
+    add_session_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None, return_results=False):
+    """识别所有截图并生成结果文件，返回保存摘要（截图数、记录数、结果文件和结果日志路径）
+
+    运行过程中结果只写入结果日志；return_results 为True时在结束后从日志读回全部结果，放在摘要的 results 中。
+    """
+    args = parse_args(argv)
+    if args.fast and not REGION_DECODE:
+        print("⚠️  未安装 PyTurboJPEG，无法只解码区域，--fast 不起作用，改为全图解码")
+        args.fast = False
+    set_match_mode(args.match)
+    set_songs_file(args.songs)
+    set_rec_model(args.rec_model)
+    # 多进程时CPU预算平分给各子进程的引擎
+    set_engine_config(config_from_args(args, workers=max(1, args.workers)))
+
+    # 没有rapidfuzz时需要fuzzywuzzy
+    if not HAVE_RAPIDFUZZ and fuzz is None:
+        print("请先安装rapidfuzz: pip install rapidfuzz（或 fuzzywuzzy python-Levenshtein）")
         return
 
     # 加载歌曲数据
@@ -319,24 +756,67 @@ def main():
     if not songs_data:
         return
 
-    src_folder = "SCR"
-    results = []
+    # 多进程时匹配在子进程中进行，主进程的匹配缓存只用来合并子进程的新结果并保存
+    init_match_memo(songs_data, args.match_memo)
+    if args.digits:
+        init_digit_reader(args.digits)
+    if args.title_hash:
+        init_title_index(args.title_hash)
+    if args.trace:
+        Trace.enable(args.trace)
+    init_result_writer(journal_path(args.output))
+    filenames = list_screenshots(args.src)
+    # 多进程时各子进程各自打开缓存，主进程不再打开
+    cache = OCRCache(args.cache, args.cache_size) if args.cache and args.workers == 0 else None
 
     # 处理所有截图
-    for filename in os.listdir(src_folder):
-        if filename.upper().endswith('.JPG'):
-            img_path = os.path.join(src_folder, filename)
-            print(f"\n{'=' * 80}")
-            print(f"📁 处理文件: {filename}")
-            print(f"{'=' * 80}")
-
-            result_type = distinguish(img_path)
-            result_data = process_screenshot(img_path, result_type, songs_data)
-            results.append(result_data)
-
-    # 保存结果
-    save_results_to_json(results)
+    if args.workers > 0:
+        from Parallel import run_parallel
+        count = 0
+        for result_data in run_parallel(filenames, args.src, args.workers, args.fast, args.cache,
+                                        args.match, ENGINE_CONFIG, args.rec_model, args.digits,
+                                        args.title_hash, args.songs, args.trace,
+                                        cache_size=args.cache_size, match_memo_path=args.match_memo):
+            collect_result(result_data)
+            count += 1
+            print(f"完成 {count}/{len(filenames)}: {result_data['filename']}")
+    elif args.pipeline:
+        from Pipeline import run_pipeline
+        count = run_pipeline(filenames, args.src, songs_data, args.queue_size, args.fast, cache)
+    elif args.batch_size > 0:
+        count = run_batched(filenames, args.src, songs_data, args, cache)
+    else:
+        count = run_serial(filenames, args.src, songs_data, args, cache)
+
+    if cache is not None:
+        cache.print_stats()
+        cache.close()
+    elif args.cache and args.workers > 0:
+        print("ℹ️ 多进程模式下OCR缓存由各子进程分别读写，不汇总命中统计")
+    if args.workers == 0:
+        match_memo.print_stats()
+    elif args.match_memo:
+        print(f"ℹ️ 多进程模式下不汇总匹配缓存的命中统计，合并子进程结果后共 {len(match_memo.entries)} 条")
+    match_memo.save()
+    if digit_reader is not None:
+        digit_reader.print_stats()
+        digit_reader.save()
+    if title_index is not None:
+        title_index.print_stats()
+        title_index.save()
+
+    # 由结果日志生成最终结果
+    result_writer.close()
+    summary = compact_results(result_writer.path, args.output)
+    Trace.finish()
+    summary.update({'screenshots': count, 'output': args.output, 'journal': result_writer.path})
+    if return_results:
+        summary['results'] = list(iter_journal(result_writer.path))
+    return summary
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # 作为脚本运行时本文件是 __main__，Pipeline 等模块 import test3 会得到另一份模块，
+    # 全局状态（引擎参数、匹配缓存、结果日志等）互不相通；改为在导入的 test3 中运行
+    import test3
+    test3.main()
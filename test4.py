@@ -2,6 +2,8 @@ import re
 import time
 from fuzzywuzzy import fuzz
 import requests
+from Catalog import normalize_text
+from Matcher import HAVE_RAPIDFUZZ, extract_best, match_batch
 
 
 def get_all_songs_levels():
@@ -88,6 +90,15 @@ def speed_test():
         "token_sort_ratio(令牌排序)": method_token_sort_ratio
     }
 
+    # rapidfuzz 版本：歌名只规范化一次
+    song_keys = [normalize_text(song.get('title', '')) for song in songs]
+    if HAVE_RAPIDFUZZ:
+        for scorer in ['ratio', 'partial_ratio', 'token_sort_ratio']:
+            methods[f"{scorer}(rapidfuzz)"] = (
+                lambda ocr_title, songs, scorer=scorer: extract_best(ocr_title, songs, song_keys, scorer))
+    else:
+        print("未安装rapidfuzz，跳过rapidfuzz测试: pip install rapidfuzz")
+
     # 预热（避免冷启动影响）
     print("预热中...")
     for method_name, method_func in methods.items():
@@ -124,9 +135,28 @@ def speed_test():
             'total_operations': total_operations
         }
 
+    # rapidfuzz 批量版本：每轮所有OCR结果一次性与全部歌名计算分数矩阵
+    if HAVE_RAPIDFUZZ:
+        method_name = "partial_ratio(rapidfuzz cdist 批量)"
+        print(f"\n正在测试 {method_name}...")
+        match_batch(ocr_results, songs, song_keys)
+
+        start_time = time.time()
+        for i in range(iterations):
+            match_batch(ocr_results, songs, song_keys)
+        total_time = time.time() - start_time
+
+        total_operations = len(ocr_results) * iterations
+        test_results[method_name] = {
+            'total_time': total_time,
+            'avg_time_microseconds': (total_time / total_operations) * 1_000_000,
+            'operations_per_second': total_operations / total_time,
+            'total_operations': total_operations
+        }
+
     # 打印结果
     print("\n" + "=" * 70)
-    print("三种匹配方法速度测试结果")
+    print("匹配方法速度测试结果")
     print("=" * 70)
 
     # 按速度排序（从快到慢）
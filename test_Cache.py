@@ -0,0 +1,111 @@
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+import Cache
+import test3
+from Cache import MatchMemo, OCRCache
+from Catalog import SongCatalog
+
+PARAMS = {'Rec.ocr_version': 'PP-OCRv5', 'Global.text_score': 0.5}
+REGIONS = {'song': [[0, 0], [10, 10]]}
+
+
+def result(text):
+    return {'song': {'txts': [text], 'scores': [0.99]}}
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    # 单调递增的时钟，保证 last_used 的先后顺序确定
+    clock = itertools.count(1)
+    monkeypatch.setattr(Cache, 'time', SimpleNamespace(time=lambda: next(clock)))
+    cache = OCRCache(str(tmp_path / 'ocr_cache.sqlite'), max_entries=3)
+    yield cache
+    cache.close()
+
+
+def test_make_key_changes_with_every_input():
+    key = OCRCache.make_key('hash', 'type1', REGIONS, PARAMS)
+    assert key == OCRCache.make_key('hash', 'type1', REGIONS, dict(PARAMS))
+    assert key != OCRCache.make_key('other', 'type1', REGIONS, PARAMS)
+    assert key != OCRCache.make_key('hash', 'type2', REGIONS, PARAMS)
+    assert key != OCRCache.make_key('hash', 'type1', {'song': [[0, 0], [10, 11]]}, PARAMS)
+    assert key != OCRCache.make_key('hash', 'type1', REGIONS, dict(PARAMS, **{'Rec.ocr_version': 'PP-OCRv4'}))
+
+
+def test_get_returns_stored_result_and_counts_hits(cache):
+    assert cache.get('a') is None
+    cache.put('a', result('夜明けの歌'))
+    assert cache.get('a') == result('夜明けの歌')
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+
+def test_evicts_least_recently_used(cache):
+    for key in 'abc':
+        cache.put(key, result(key))
+    # 读取 a 后，b 成为最久未使用的记录
+    assert cache.get('a') == result('a')
+    cache.put('d', result('d'))
+    assert cache.get('b') is None
+    for key in 'acd':
+        assert cache.get(key) == result(key)
+
+    cache.put('e', result('e'))
+    assert cache.get('a') is None
+    assert cache.conn.execute('SELECT COUNT(*) FROM ocr_cache').fetchone()[0] == 3
+
+
+def test_entries_persist_across_instances(tmp_path):
+    path = str(tmp_path / 'ocr_cache.sqlite')
+    cache = OCRCache(path)
+    cache.put('a', result('Aurora Drive'))
+    cache.close()
+
+    cache = OCRCache(path)
+    assert cache.get('a') == result('Aurora Drive')
+    cache.close()
+
+
+def test_match_memo_evicts_least_recently_used():
+    memo = MatchMemo('v1', max_entries=2)
+    memo.put('a', [1])
+    memo.put('b', [2])
+    assert memo.get('a') == [1]
+    memo.put('c', [3])
+    assert memo.get('b') is None
+    assert list(memo.entries) == ['a', 'c']
+    assert memo.stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'entries': 2}
+
+
+def test_match_memo_is_cleared_when_catalog_changes(tmp_path, capsys):
+    path = str(tmp_path / 'match_memo.json')
+    memo = MatchMemo('v1', path=path)
+    memo.put('a', ['Massive', 'Kaede Lights', {'title': '夜明けの歌'}, 95, 95, None])
+    memo.save()
+    assert MatchMemo('v1', path=path).get('a') == memo.get('a')
+
+    # 目录版本不同：加载时丢弃，运行中切换目录时清空
+    assert not MatchMemo('v2', path=path).entries
+    assert '失效' in capsys.readouterr().out
+    memo.check_catalog('v2')
+    assert not memo.entries
+
+
+def test_memoized_match_matches_each_ocr_text_once(monkeypatch):
+    songs_data = SongCatalog([{'title': 'Aurora Drive', 'artist': 'Kaede Lights',
+                               'difficulty': 'Massive', 'level': 12.5}])
+    monkeypatch.setattr(test3, 'match_memo', None)
+    calls = []
+
+    def match(level, artist, song_name, songs_data):
+        calls.append(song_name)
+        return level, artist, songs_data.songs[0], 95
+
+    monkeypatch.setattr(test3, 'match_difficulty_artist_song', match)
+    first = test3.memoized_match('Massive', 'Kaede Lights', 'Aurora Drive!', songs_data)
+    # 规范化后相同的OCR文本命中缓存
+    assert test3.memoized_match('MASSIVE', 'kaede lights', 'aurora drive', songs_data) == first
+    assert calls == ['Aurora Drive!']
+    assert test3.match_memo.stats()['hits'] == 1
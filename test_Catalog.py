@@ -0,0 +1,70 @@
+import os
+import json
+import pickle
+
+from Catalog import CACHE_DIR_ENV, SongCatalog, load_catalog, load_snapshot, save_snapshot, snapshot_path_for
+
+SONGS = [
+    {'title': 'Aurora Drive', 'artist': 'Kaede Lights', 'difficulty': 'Massive', 'level': 12.5},
+    {'title': 'Aurora Drive', 'artist': 'Kaede Lights', 'difficulty': 'Invaded', 'level': 9.0},
+    {'title': '夜明けの歌', 'artist': '月見', 'difficulty': 'Detected', 'level': 4.0},
+]
+
+
+def assert_same_catalog(loaded, catalog):
+    assert loaded.songs == catalog.songs
+    assert loaded.version == catalog.version
+    assert loaded.title_keys == catalog.title_keys
+    assert loaded.artist_ids == catalog.artist_ids
+    assert loaded.difficulty_ids == catalog.difficulty_ids
+    assert loaded.songs_for('kaede lights', 'MASSIVE') == catalog.songs_for('Kaede Lights', 'Massive')
+    assert loaded.artists_for_difficulty('detected') == catalog.artists_for_difficulty('Detected')
+    assert loaded.title_index.shortlist('aurora drive') == catalog.title_index.shortlist('aurora drive')
+
+
+def test_snapshot_round_trip(tmp_path):
+    catalog = SongCatalog(SONGS)
+    path = str(tmp_path / 'songs.pkl')
+    save_snapshot(catalog, path, 'hash-1')
+    assert_same_catalog(load_snapshot(path, 'hash-1'), catalog)
+
+
+def test_snapshot_rejects_other_source_or_format(tmp_path):
+    path = str(tmp_path / 'songs.pkl')
+    save_snapshot(SongCatalog(SONGS), path, 'hash-1')
+    assert load_snapshot(path, 'hash-2') is None
+
+    with open(path, 'wb') as f:
+        pickle.dump({'magic': 'PRR-CATALOG', 'format': -1, 'source_hash': 'hash-1'}, f)
+    assert load_snapshot(path, 'hash-1') is None
+
+    with open(path, 'wb') as f:
+        f.write(b'not a pickle')
+    assert load_snapshot(path, 'hash-1') is None
+    assert load_snapshot(str(tmp_path / 'missing.pkl'), 'hash-1') is None
+
+
+def test_load_catalog_writes_and_reuses_snapshot(tmp_path, monkeypatch):
+    cache_dir = tmp_path / 'cache'
+    monkeypatch.setenv(CACHE_DIR_ENV, str(cache_dir))
+    path = tmp_path / 'songs_data.json'
+    path.write_text(json.dumps(SONGS, ensure_ascii=False), encoding='utf-8')
+    catalog = load_catalog(str(path))
+    # 快照写在缓存目录中，JSON旁边不生成文件
+    assert [p.name for p in tmp_path.iterdir() if p.is_file()] == ['songs_data.json']
+    assert os.path.exists(snapshot_path_for(str(path)))
+    assert_same_catalog(load_catalog(str(path)), catalog)
+
+    # JSON内容变化后快照失效，重新建立索引
+    path.write_text(json.dumps(SONGS[:2]), encoding='utf-8')
+    assert load_catalog(str(path)).songs == SONGS[:2]
+
+
+def test_snapshot_path_for(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path))
+    first = snapshot_path_for('data/songs_data.json')
+    assert os.path.dirname(first) == str(tmp_path)
+    assert os.path.basename(first).startswith('songs_data-') and first.endswith('.pkl')
+    # 不同位置的同名目录使用不同的快照
+    assert snapshot_path_for('other/songs_data.json') != first
+    assert snapshot_path_for(os.path.abspath('data/songs_data.json')) == first
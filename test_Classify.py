@@ -0,0 +1,63 @@
+import cv2
+import numpy as np
+import pytest
+
+from Classify import (LEVEL_BOXES, LEVEL_DEFAULT, RESULT_TYPES, TYPE_BOXES, TYPE_DEFAULT, classify, classify_batch,
+                      classify_samples, compile_boxes, level_for, match_boxes)
+from Screenshot import ScreenshotContext
+from Synth import render_screenshot
+
+LEVELS = ('Massive', 'Invaded', 'Detected')
+
+
+def bgr(r, g, b):
+    return [b, g, r]
+
+
+def test_match_boxes_is_inclusive_and_takes_first_box():
+    table = compile_boxes([('a', (10, 20), (10, 20), (10, 20)), ('b', (15, 30), (15, 30), (15, 30))])
+    samples = [bgr(10, 20, 10), bgr(18, 18, 18), bgr(25, 25, 25), bgr(21, 10, 10), bgr(9, 15, 15)]
+    assert match_boxes(samples, table, 'x') == ['a', 'a', 'b', 'x', 'x']
+    # 单个样本、空表
+    assert match_boxes(bgr(25, 25, 25), table, 'x') == ['b']
+    assert match_boxes(samples, compile_boxes([]), 'x') == ['x'] * len(samples)
+
+
+def center(box):
+    _, r, g, b = box
+    return bgr(sum(r) / 2, sum(g) / 2, sum(b) / 2)
+
+
+def test_classify_samples_reads_level_for_the_detected_type():
+    type2 = center(TYPE_BOXES[0])
+    outside = bgr(0, 0, 0)
+    samples = [
+        [outside, center(LEVEL_BOXES['type1'][0]), center(LEVEL_BOXES['type2'][1])],
+        [type2, center(LEVEL_BOXES['type1'][0]), center(LEVEL_BOXES['type2'][1])],
+        [type2, outside, outside],
+    ]
+    assert classify_samples(samples) == [(TYPE_DEFAULT, 'Massive'), ('type2', 'Invaded'), ('type2', LEVEL_DEFAULT)]
+    assert classify_samples(np.zeros((0, 3, 3))) == []
+
+
+def load(tmp_path, name, result_type, level):
+    path = str(tmp_path / name)
+    cv2.imwrite(path, render_screenshot(result_type, level, 'Aurora Drive', 'Kaede Lights', '1003456'))
+    return ScreenshotContext(path)
+
+
+@pytest.mark.parametrize('result_type', RESULT_TYPES)
+@pytest.mark.parametrize('level', LEVELS)
+def test_classify_rendered_screenshot(tmp_path, result_type, level):
+    ctx = load(tmp_path, 'a.jpg', result_type, level)
+    assert classify(ctx) == (result_type, level)
+    assert (ctx.result_type, ctx.level) == (result_type, level)
+    assert level_for(ctx, result_type) == level
+    assert level_for(ctx, 'type3') == 'Unknown'
+
+
+def test_classify_batch_equals_single_screenshots(tmp_path):
+    cases = [(result_type, level) for result_type in RESULT_TYPES for level in LEVELS]
+    contexts = [load(tmp_path, f'{n}.jpg', *case) for n, case in enumerate(cases)]
+    assert classify_batch(contexts) == cases
+    assert classify_batch([]) == []
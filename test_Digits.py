@@ -0,0 +1,68 @@
+import cv2
+import numpy as np
+
+from Digits import DigitReader, binarize, segment_glyphs
+
+
+def score_roi(text, background=255, color=0):
+    """固定字体画出的分数区域"""
+    roi = np.full((60, 30 * len(text) + 20, 3), background, dtype=np.uint8)
+    cv2.putText(roi, text, (10, 45), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (color,) * 3, 3, cv2.LINE_AA)
+    return roi
+
+
+def trained_reader(path=None):
+    reader = DigitReader(path)
+    assert reader.learn(score_roi('0123456789'), '0123456789')
+    assert reader.learn(score_roi('9876543210'), '9876543210')
+    return reader
+
+
+def test_segment_glyphs_drops_separators():
+    mask = binarize(score_roi('1,003,456'))
+    assert len(segment_glyphs(mask)) == 7
+    assert segment_glyphs(np.zeros((10, 10), dtype=bool)) == []
+
+
+def test_binarize_takes_minority_side_as_foreground():
+    assert binarize(score_roi('42')).mean() < 0.5
+    assert binarize(score_roi('42', background=0, color=255)).mean() < 0.5
+
+
+def test_reads_scores_after_learning():
+    reader = trained_reader()
+    for text in ('1003456', '987654', '0000000', '5'):
+        digits, confidence = reader.read(score_roi(text))
+        assert digits == text and confidence >= reader.min_confidence
+    assert reader.read(score_roi('1,003,456'))[0] == '1003456'
+    assert reader.stats()['learned_digits'] == 10
+
+
+def test_returns_none_without_templates_or_confidence():
+    reader = DigitReader()
+    assert reader.read(score_roi('123')) == (None, 0.0)
+    # 只学过 1 和 2 时，3 的字形匹配不上
+    reader.learn(score_roi('12'), '12')
+    digits, confidence = reader.read(score_roi('123'))
+    assert digits is None and confidence < reader.min_confidence
+    assert reader.stats()['hits'] == 0 and reader.stats()['misses'] == 2
+
+
+def test_learn_from_ocr_only_uses_confident_digit_results():
+    reader = DigitReader()
+    assert not reader.learn_from_ocr(score_roi('123'), ['123'], [0.5])
+    assert not reader.learn_from_ocr(score_roi('123'), ['12a'], [0.99])
+    # 字形数与位数不一致
+    assert not reader.learn_from_ocr(score_roi('123'), ['1234'], [0.99])
+    assert reader.learn_from_ocr(score_roi('1,234'), ['1,234'], [0.99])
+    assert reader.counts.tolist() == [0, 1, 1, 1, 1, 0, 0, 0, 0, 0]
+
+
+def test_templates_persist(tmp_path):
+    path = str(tmp_path / 'digit_templates.npz')
+    trained_reader(path).save()
+    reader = DigitReader(path)
+    assert reader.read(score_roi('20240517'))[0] == '20240517'
+    # 只读实例不写文件
+    DigitReader(str(tmp_path / 'other.npz'), read_only=True).save()
+    assert not (tmp_path / 'other.npz').exists()
@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+import pytest
+
+from Engine import apply_session_config, needs_session_rebuild, session_config
+
+
+class FakeEngine:
+    """只记录识别模型是否被加载的引擎"""
+
+    def __init__(self, session):
+        self.loads = 0
+        self.text_rec = None
+        self.session = session
+
+    def _load_rec_model(self):
+        self.loads += 1
+        self.text_rec = SimpleNamespace(session=SimpleNamespace(session=self.session))
+        return self.text_rec
+
+
+def test_default_config_keeps_rapidocr_session():
+    config = session_config(budget=4)
+    assert not needs_session_rebuild(config)
+    # 线程数、内存池不同也不需要重建，它们由 RapidOCR 参数设置
+    assert not needs_session_rebuild(session_config(budget=4, intra_threads=2, mem_arena=False))
+    engine = FakeEngine(session=None)
+    assert apply_session_config(engine, config)
+    assert engine.loads == 0 and engine.text_rec is None
+
+
+def test_rebuild_needed_for_graph_opt_or_execution_mode():
+    assert needs_session_rebuild(session_config(budget=4, graph_opt='basic'))
+    assert needs_session_rebuild(session_config(budget=4, execution_mode='parallel'))
+
+
+def test_missing_model_path_is_reported(capsys):
+    pytest.importorskip('onnxruntime')
+    session = SimpleNamespace(get_providers=lambda: ['CPUExecutionProvider'])
+    engine = FakeEngine(session)
+    assert not apply_session_config(engine, session_config(budget=4, graph_opt='basic'))
+    assert engine.loads == 1
+    assert engine.text_rec.session.session is session
+    assert '模型路径' in capsys.readouterr().out
@@ -0,0 +1,73 @@
+import pytest
+
+import Layout
+from Layout import (DEVICE_LAYOUTS, ORIGINAL_LAYOUT, ORIGINAL_SCREENS, ORIGINAL_TYPE_PROBE, find_layout,
+                    layout_for_size, register_layout)
+
+
+@pytest.fixture
+def registry():
+    """测试中登记的布局在结束后移除"""
+    saved = list(DEVICE_LAYOUTS)
+    yield
+    DEVICE_LAYOUTS[:] = saved
+    layout_for_size.cache_clear()
+
+
+def test_reference_size_uses_original_pixels():
+    layout = layout_for_size(*ORIGINAL_LAYOUT['size'])
+    assert layout.type_probe == ORIGINAL_TYPE_PROBE
+    for result_type, screen in ORIGINAL_SCREENS.items():
+        assert layout.level_probes[result_type] == screen['level_probe']
+        assert layout.regions[result_type] == (screen['song'], screen['artist'], screen['rating'])
+
+
+def test_layouts_are_stored_normalized():
+    assert ORIGINAL_LAYOUT['type_probe'] == (27 / 3200, 1934 / 2000)
+    assert all(0 <= value <= 1 for value in ORIGINAL_LAYOUT['screens']['type2']['artist'])
+
+
+def test_same_aspect_scales_proportionally():
+    layout = layout_for_size(1600, 1000)
+    assert layout.name == '16:10'
+    assert layout.type_probe == (14, 967)
+    assert layout.regions['type1'][0] == (468, 133, 1136, 173)
+    assert layout_for_size(1600, 1000) is layout
+
+
+def test_find_layout_matches_aspect_within_tolerance():
+    assert find_layout(1920, 1200) is ORIGINAL_LAYOUT
+    assert find_layout(1920, 1190) is ORIGINAL_LAYOUT
+    assert find_layout(1920, 1080) is None
+    assert find_layout(2000, 2000) is None
+
+
+def test_unmatched_aspect_falls_back_to_original_pixels():
+    layout = layout_for_size(3840, 2160)
+    assert layout.name == 'original'
+    assert layout.type_probe == ORIGINAL_TYPE_PROBE
+    assert layout.regions['type2'][1] == ORIGINAL_SCREENS['type2']['artist']
+    # 写死的坐标超出截图时不支持
+    assert layout_for_size(1920, 1080) is None
+    assert layout_for_size(3000, 2000) is None
+
+
+def test_exact_device_size_wins_over_aspect(registry):
+    device = register_layout('tablet', size=(1600, 1000), type_probe=(10, 900), screens={
+        'type1': {'level_probe': (800, 200), 'song': (400, 100, 1200, 150),
+                  'artist': (400, 160, 1100, 200), 'rating': (300, 600, 700, 700)},
+    })
+    assert find_layout(1600, 1000) is device
+    assert layout_for_size(1600, 1000).type_probe == (10, 900)
+    assert find_layout(3200, 2000) is ORIGINAL_LAYOUT
+
+
+def test_register_layout_rejects_points_outside(registry):
+    count = len(DEVICE_LAYOUTS)
+    with pytest.raises(ValueError):
+        register_layout('bad', size=(100, 100), type_probe=(10, 10), screens={
+            'type1': {'level_probe': (50, 50), 'song': (0, 0, 101, 10),
+                      'artist': (0, 10, 50, 20), 'rating': (0, 20, 50, 30)},
+        })
+    assert len(DEVICE_LAYOUTS) == count
+    assert Layout.layout_for_size(3200, 2000).name == '16:10'
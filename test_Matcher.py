@@ -0,0 +1,109 @@
+import pytest
+
+import Matcher
+from Catalog import SongCatalog
+from Matcher import JOINT_WEIGHTS, combine_joint, extract_best, match_batch, match_joint, match_joint_batch, score_all
+
+SONGS = [
+    {'title': 'Aurora Drive', 'artist': 'Kaede Lights', 'difficulty': 'Massive', 'level': 12.5},
+    {'title': 'Aurora Drive', 'artist': 'Kaede Lights', 'difficulty': 'Invaded', 'level': 9.0},
+    {'title': 'Midnight Drive', 'artist': 'Lumen', 'difficulty': 'Massive', 'level': 11.0},
+    {'title': '夜明けの歌', 'artist': '月見', 'difficulty': 'Detected', 'level': 4.0},
+]
+CATALOG = SongCatalog(SONGS)
+
+# 分数按 all_difficulties / all_artists / 目录行的顺序给出
+DIFFICULTY_SCORES = [100, 40, 20]
+ARTIST_SCORES = [90, 30, 0]
+TITLE_SCORES = [95, 95, 60, 0]
+
+
+@pytest.fixture(params=[True, False], ids=['numpy', 'python'])
+def vectorized(request, monkeypatch):
+    """两种实现都要得到同样的结果"""
+    if request.param and not Matcher.HAVE_RAPIDFUZZ:
+        pytest.skip('需要 rapidfuzz')
+    monkeypatch.setattr(Matcher, 'HAVE_RAPIDFUZZ', request.param)
+    return request.param
+
+
+needs_rapidfuzz = pytest.mark.skipif(not Matcher.HAVE_RAPIDFUZZ, reason='需要 rapidfuzz')
+
+
+@needs_rapidfuzz
+def test_extract_best_matches_fuzzywuzzy_conventions():
+    keys = CATALOG.title_keys
+    assert extract_best('Aurora Driv', SONGS, keys) == (SONGS[0], 100)
+    # 同分时取靠前的候选
+    assert extract_best('drive', SONGS, keys)[0] is SONGS[0]
+    assert extract_best('zzzz', SONGS, keys) == (None, 0)
+    assert extract_best('Aurora', [], []) == (None, 0)
+
+
+@needs_rapidfuzz
+def test_match_batch_equals_extract_best():
+    queries = ['Aurora Driv', 'Midnight', '夜明けの', 'zzzz', '']
+    keys = CATALOG.title_keys
+    assert match_batch(queries, SONGS, keys) == [extract_best(query, SONGS, keys) for query in queries]
+    assert match_batch([], SONGS, keys) == []
+    assert match_batch(['Aurora'], [], []) == [(None, 0)]
+
+
+def test_score_all_returns_one_score_per_key():
+    scores = score_all('aurora drive', CATALOG.title_keys)
+    assert len(scores) == len(SONGS)
+    assert scores[0] == scores[1] == 100
+    assert score_all('aurora', []) == []
+
+
+def test_combine_joint_picks_best_row(vectorized):
+    assert CATALOG.all_difficulties.items == ['Massive', 'Invaded', 'Detected']
+    assert CATALOG.all_artists.items == ['Kaede Lights', 'Lumen', '月見']
+    song, total, margin, components = combine_joint(CATALOG, DIFFICULTY_SCORES, ARTIST_SCORES, TITLE_SCORES,
+                                                    JOINT_WEIGHTS, 70)
+    assert song is SONGS[0]
+    assert total == pytest.approx(95)
+    # 次优取另一首歌（Midnight Drive），同一首歌的其他难度不算
+    assert margin == pytest.approx(95 - 190 / 3)
+    assert components == {'difficulty': 100, 'artist': 90, 'title': 95}
+
+
+def test_combine_joint_below_threshold(vectorized):
+    song, total, _, components = combine_joint(CATALOG, DIFFICULTY_SCORES, ARTIST_SCORES, TITLE_SCORES,
+                                               JOINT_WEIGHTS, 96)
+    assert song is None
+    assert total == pytest.approx(95)
+    assert components['title'] == 95
+
+
+def test_combine_joint_weights_and_ties(vectorized):
+    # 只看歌名时两个难度同分，取目录中靠前的一行；同一首歌之间没有次优
+    weights = {'difficulty': 0.0, 'artist': 0.0, 'title': 1.0}
+    song, total, margin, _ = combine_joint(CATALOG, DIFFICULTY_SCORES, ARTIST_SCORES, TITLE_SCORES, weights, 70)
+    assert song is SONGS[0]
+    assert total == pytest.approx(95)
+    assert margin == pytest.approx(35)
+
+    weights = {'difficulty': 3.0, 'artist': 0.0, 'title': 1.0}
+    song, _, _, _ = combine_joint(CATALOG, [0, 100, 0], ARTIST_SCORES, TITLE_SCORES, weights, 70)
+    assert song is SONGS[1]
+
+
+def test_combine_joint_empty_catalog(vectorized):
+    assert combine_joint(SongCatalog([]), [], [], [], JOINT_WEIGHTS, 70) == (None, 0, 0, {})
+
+
+def test_match_joint_uses_difficulty_to_pick_the_row():
+    song, total, _, components = match_joint('MASSIVE', 'Kaede Light', 'Aurora Driv', CATALOG)
+    assert song is SONGS[0]
+    assert components['difficulty'] == 100 and total > 90
+    assert match_joint('Invaded', 'Kaede Lights', 'Aurora Drive', CATALOG)[0] is SONGS[1]
+    assert match_joint('Detected', '月見', '夜明けの歌', CATALOG)[0] is SONGS[3]
+    assert match_joint('Massive', 'nobody', 'zzzz', CATALOG)[0] is None
+
+
+def test_match_joint_batch_matches_single_queries():
+    queries = [('MASSIVE', 'Kaede Light', 'Aurora Driv'), ('Massive', 'Lumen', 'Midnight'),
+               ('Detected', '月見', '夜明け')]
+    assert match_joint_batch(queries, CATALOG) == [match_joint(*query, CATALOG) for query in queries]
+    assert match_joint_batch([], CATALOG) == []
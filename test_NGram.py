@@ -0,0 +1,45 @@
+import random
+
+from Catalog import normalize_text
+from NGram import NGramIndex, recall_check, shortlist_match, simulate_ocr_noise, text_grams
+from test3 import method_partial_ratio
+
+TITLES = ['Aurora Drive', 'Aurora Borealis', 'Neon Genesis', 'Midnight Drive', 'Crystal Rain',
+          '夜明けの歌', '夜の街', 'Echo Chamber', 'Lumen Drift', 'Starfall Memory']
+SONGS = [{'title': title} for title in TITLES]
+KEYS = [normalize_text(title) for title in TITLES]
+
+
+def test_text_grams_pads_latin_words_and_uses_cjk_bigrams():
+    assert text_grams('ab') == {' ab', 'ab '}
+    assert {' au', 'aur', 'ora', 'ra '} <= text_grams('aurora')
+    # 中日韩文字取单字和相邻二字
+    assert text_grams('夜明け') == {'夜', '明', 'け', '夜明', '明け'}
+    assert {'夜', '夜の', ' x '} <= text_grams('夜の x')
+
+
+def test_shortlist_ranks_by_shared_grams():
+    index = NGramIndex(KEYS)
+    shortlist = index.shortlist(normalize_text('Aurora Drive'), k=3)
+    assert shortlist[0] == TITLES.index('Aurora Drive')
+    assert set(shortlist[1:]) == {TITLES.index('Aurora Borealis'), TITLES.index('Midnight Drive')}
+    assert index.shortlist(normalize_text('夜明'), k=1) == [TITLES.index('夜明けの歌')]
+    # 没有共享n-gram的查询得到空短名单
+    assert index.shortlist('zzzz') == []
+
+
+def test_shortlist_match_agrees_with_full_scan():
+    index = NGramIndex(KEYS)
+    for query in ('Aurora Driv', 'neon genesis', 'Echo Chamber 2', '夜明けの'):
+        expected = method_partial_ratio(query, SONGS, 70, keys=KEYS)
+        assert shortlist_match(query, SONGS, index, method_partial_ratio, k=5) == expected
+    assert shortlist_match('zzzz', SONGS, index, method_partial_ratio) == (None, 0)
+
+
+def test_recall_check_on_noisy_queries():
+    index = NGramIndex(KEYS)
+    rng = random.Random(0)
+    queries = [simulate_ocr_noise(key, rng) for key in KEYS]
+    recall, ok = recall_check(queries, SONGS, index, method_partial_ratio, k=len(KEYS))
+    # 短名单覆盖整个目录时必然与全量扫描一致
+    assert recall == 1.0 and ok
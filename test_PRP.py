@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+from Catalog import CACHE_DIR_ENV, load_catalog
+from PRP import apply_diff, diff_songs, load_json, sync_songs
+from StubAPI import StubSongsAPI
+
+OLD = [
+    {'title': 'A', 'artist': 'X', 'difficulty': 'Massive', 'level': 12.0},
+    {'title': 'B', 'artist': 'Y', 'difficulty': 'Invaded', 'level': 9.5},
+    {'title': 'C', 'artist': 'Z', 'difficulty': 'Detected', 'level': 5.0},
+]
+NEW = [
+    {'title': 'C', 'artist': 'Z', 'difficulty': 'Detected', 'level': 5.0},
+    {'title': 'A', 'artist': 'X', 'difficulty': 'Massive', 'level': 12.3},
+    {'title': 'D', 'artist': 'X', 'difficulty': 'Massive', 'level': 11.0},
+]
+
+
+def test_diff_songs():
+    added, removed, changed = diff_songs(OLD, NEW)
+    assert added == [NEW[2]]
+    assert removed == [OLD[1]]
+    assert changed == [(OLD[0], NEW[1])]
+
+
+def test_diff_songs_unchanged():
+    assert diff_songs(OLD, list(OLD)) == ([], [], [])
+
+
+def test_apply_diff_keeps_local_order_and_appends_new_songs():
+    songs = apply_diff(OLD, *diff_songs(OLD, NEW))
+    assert songs == [NEW[1], OLD[2], NEW[2]]
+    # 应用差异后与新目录内容一致，只是顺序沿用本地目录
+    assert sorted(songs, key=lambda song: song['title']) == sorted(NEW, key=lambda song: song['title'])
+    assert diff_songs(songs, NEW) == ([], [], [])
+
+
+def test_apply_diff_does_not_modify_local_songs():
+    local = [dict(song) for song in OLD]
+    apply_diff(local, *diff_songs(local, NEW))
+    assert local == OLD
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """在随机端口上启动的模拟歌曲API"""
+    monkeypatch.setenv('NO_PROXY', '127.0.0.1')
+    stub = StubSongsAPI([dict(song, bpm=180) for song in OLD])
+    stub.start()
+    yield stub
+    stub.shutdown()
+    stub.server_close()
+
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / 'cache'))
+    return str(tmp_path / 'songs_data.json'), str(tmp_path / 'songs_data.meta.json')
+
+
+def test_sync_downloads_then_skips_unchanged_catalog(server, files, capsys):
+    songs_file, meta_file = files
+    # 200：完整下载，只保留需要的字段
+    assert sync_songs(server.url, songs_file, meta_file) == OLD
+    assert load_json(songs_file) == OLD
+    assert load_json(meta_file)['etag'] == server.etag
+    assert load_catalog(songs_file).songs == OLD
+
+    # 304：带上 ETag 的条件请求，不改动本地文件
+    mtime = os.stat(songs_file).st_mtime_ns
+    assert sync_songs(server.url, songs_file, meta_file) == OLD
+    assert '304' in capsys.readouterr().out
+    assert os.stat(songs_file).st_mtime_ns == mtime
+    assert server.request_count == 2
+
+
+def test_sync_applies_only_the_diff(server, files, capsys):
+    songs_file, meta_file = files
+    sync_songs(server.url, songs_file, meta_file)
+    capsys.readouterr()
+
+    # 新增 D、下架 B、A 的等级变化
+    server.set_songs(NEW)
+    songs = sync_songs(server.url, songs_file, meta_file)
+    assert '新增 1 条，删除 1 条，等级变化 1 条' in capsys.readouterr().out
+    assert songs == [NEW[1], OLD[2], NEW[2]]
+    assert load_json(songs_file) == songs
+    assert load_json(meta_file)['etag'] == server.etag
+    # 派生的索引快照随之更新
+    assert load_catalog(songs_file).songs == songs
+
+    assert sync_songs(server.url, songs_file, meta_file) == songs
+    assert '304' in capsys.readouterr().out
+
+
+def test_force_ignores_cached_etag(server, files):
+    songs_file, meta_file = files
+    sync_songs(server.url, songs_file, meta_file)
+    sync_songs(server.url, songs_file, meta_file, force=True)
+    assert load_json(songs_file) == OLD
+    assert server.request_count == 2
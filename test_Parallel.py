@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+import Parallel
+import test3
+from Cache import MatchMemo
+from Digits import DigitReader
+from TitleHash import TitleHashIndex
+
+
+def digit_roi(text):
+    """白底黑字的分数区域，每个数字画成宽度不同的竖条，便于按列切分"""
+    roi = np.full((40, 20 * len(text) + 10, 3), 255, dtype=np.uint8)
+    for i, c in enumerate(text):
+        x = 10 + i * 20
+        roi[5:35, x:x + 2 + int(c)] = 0
+    return roi
+
+
+def title_roi(seed):
+    return np.random.default_rng(seed).integers(0, 256, (60, 400, 3), dtype=np.uint8)
+
+
+@pytest.fixture
+def state(monkeypatch):
+    """把 test3 的全局状态换成测试用的对象，返回 (子进程状态, 主进程状态)"""
+    worker = {'digit_reader': DigitReader(read_only=True), 'title_index': TitleHashIndex(read_only=True),
+              'match_memo': MatchMemo('v1', read_only=True)}
+    parent = {'digit_reader': DigitReader(), 'title_index': TitleHashIndex(), 'match_memo': MatchMemo('v1')}
+
+    def use(states):
+        for name, value in states.items():
+            monkeypatch.setattr(test3, name, value)
+    return worker, parent, use
+
+
+def test_worker_learning_is_merged_into_parent(state):
+    worker, parent, use = state
+    use(worker)
+    assert worker['digit_reader'].learn(digit_roi('1203'), '1203')
+    assert worker['title_index'].add(title_roi(0), 'Aurora Drive', 'Kaede Lights')
+    worker['match_memo'].put('cascade|massive|a|b', ['Massive', 'A', {'title': 'B'}, 95, 95, 95, None])
+    learned = Parallel.take_learned()
+    assert set(learned) == {'digit_reader', 'title_index', 'match_memo'}
+    # 取出后清空，下一张截图只带新内容
+    assert Parallel.take_learned() == {}
+
+    use(parent)
+    Parallel.merge_learned(learned)
+    assert parent['digit_reader'].counts.tolist() == worker['digit_reader'].counts.tolist()
+    assert np.allclose(parent['digit_reader'].sums, worker['digit_reader'].sums)
+    assert parent['title_index'].lookup(title_roi(0)) == ('Aurora Drive', 'Kaede Lights')
+    assert parent['match_memo'].get('cascade|massive|a|b')[1] == 'A'
+
+
+def test_merging_from_several_workers_keeps_dedup_rules(state):
+    worker, parent, use = state
+    use(worker)
+    worker['title_index'].add(title_roi(1), 'Glass Horizon', 'ORBITAL')
+    first = Parallel.take_learned()
+    # 另一个子进程学到同一张歌名图
+    other = TitleHashIndex(read_only=True)
+    other.add(title_roi(1), 'Glass Horizon', 'ORBITAL')
+    second = {'title_index': other.take_learned()}
+
+    use(parent)
+    Parallel.merge_learned(first)
+    Parallel.merge_learned(second)
+    assert len(parent['title_index']) == 1
+
+
+def test_writable_state_is_not_collected(monkeypatch):
+    monkeypatch.setattr(test3, 'digit_reader', DigitReader())
+    monkeypatch.setattr(test3, 'title_index', None)
+    monkeypatch.setattr(test3, 'match_memo', MatchMemo('v1'))
+    test3.digit_reader.learn(digit_roi('42'), '42')
+    test3.match_memo.put('k', ['v'])
+    assert Parallel.take_learned() == {}
+    assert test3.match_memo.learned == []
@@ -0,0 +1,46 @@
+import cv2
+import pytest
+
+import test3
+from Cache import OCRCache
+from Pipeline import decode_stage, ocr_stage
+from Synth import render_screenshot
+
+RAW = {field: {'txts': [text], 'scores': [0.99]}
+       for field, text in (('song', 'Aurora Drive'), ('artist', 'Kaede Lights'), ('rating', '1003456'))}
+
+
+@pytest.fixture
+def screenshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(test3, 'title_index', None)
+    path = str(tmp_path / 'a.jpg')
+    cv2.imwrite(path, render_screenshot('type1', 'Massive', 'Aurora Drive', 'Kaede Lights', '1003456'))
+    return path
+
+
+def test_decode_stage_skips_regions_on_cache_hit(tmp_path, screenshot):
+    cache = OCRCache(str(tmp_path / 'cache.sqlite'))
+    decode = decode_stage(False, cache)
+
+    ctx, key, raw_results = decode(screenshot)
+    assert raw_results is None and set(ctx.rois) == {'song', 'artist', 'rating'}
+    cache.put(key, RAW)
+
+    ctx, hit_key, raw_results = decode(screenshot)
+    assert hit_key == key and raw_results == RAW
+    assert ctx.rois == {}
+    assert ctx.level == 'Massive'
+
+    # 命中时OCR阶段直接使用缓存结果，不需要区域
+    ctx, ocr_texts, known_song = ocr_stage(None, cache)((ctx, hit_key, raw_results))
+    assert ocr_texts == {'song': 'Aurora Drive', 'artist': 'Kaede Lights', 'rating': '1003456'}
+    assert known_song is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+    cache.close()
+
+
+def test_decode_stage_without_cache_prepares_regions(screenshot):
+    ctx, key, raw_results = decode_stage(False)(screenshot)
+    assert key is None and raw_results is None
+    assert set(ctx.rois) == {'song', 'artist', 'rating'}
+    assert ctx.level == 'Massive'
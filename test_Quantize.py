@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+import pytest
+
+import Quantize
+
+pytest.importorskip('onnxruntime.quantization')
+
+
+def fake_engine(model_path):
+    session = SimpleNamespace(session=SimpleNamespace(_model_path=model_path))
+    return SimpleNamespace(_load_rec_model=lambda: SimpleNamespace(session=session))
+
+
+@pytest.fixture
+def model(tmp_path, monkeypatch):
+    """FP32模型占位文件，量化函数只写出带标记的文件"""
+    fp32_path = tmp_path / 'rec.onnx'
+    fp32_path.write_bytes(b'fp32')
+
+    def quantize_dynamic(model_input, model_output, **kwargs):
+        with open(model_output, 'wb') as f:
+            f.write(b'int8')
+    monkeypatch.setattr(Quantize, 'quantize_dynamic', quantize_dynamic)
+    return fp32_path
+
+
+def test_output_replaced_only_after_validation(tmp_path, model, monkeypatch):
+    monkeypatch.setattr(Quantize, 'character_list', lambda path: 'abc')
+    output_path = str(tmp_path / 'rec_int8.onnx')
+    assert Quantize.quantize_rec_model(fake_engine(str(model)), output_path, 'dynamic') == output_path
+    assert open(output_path, 'rb').read() == b'int8'
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['rec.onnx', 'rec_int8.onnx']
+
+
+def test_failed_validation_leaves_existing_model(tmp_path, model, monkeypatch):
+    monkeypatch.setattr(Quantize, 'character_list', lambda path: 'abc' if path == str(model) else None)
+    output = tmp_path / 'rec_int8.onnx'
+    output.write_bytes(b'old')
+    assert Quantize.quantize_rec_model(fake_engine(str(model)), str(output), 'dynamic') is None
+    assert output.read_bytes() == b'old'
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['rec.onnx', 'rec_int8.onnx']
+
+
+def test_quantization_error_leaves_no_file(tmp_path, model, monkeypatch):
+    def broken(model_input, model_output, **kwargs):
+        with open(model_output, 'wb') as f:
+            f.write(b'half')
+        raise RuntimeError('量化失败')
+    monkeypatch.setattr(Quantize, 'quantize_dynamic', broken)
+    output_path = str(tmp_path / 'rec_int8.onnx')
+    with pytest.raises(RuntimeError):
+        Quantize.quantize_rec_model(fake_engine(str(model)), output_path, 'dynamic')
+    assert [p.name for p in tmp_path.iterdir()] == ['rec.onnx']
@@ -0,0 +1,71 @@
+import json
+
+from Results import compact, iter_journal, unique_records, write_records
+
+RECORDS = [
+    {'title': 'Aurora Drive', 'artist': 'Kaede Lights', 'difficulty': 'Massive', 'level': 12.5, 'score': '1003456'},
+    {'title': '夜明けの歌', 'artist': '月見', 'difficulty': 'Invaded', 'level': 10.0, 'score': '987654'},
+    {'title': 'Echo "Chamber"', 'artist': 'Lumen\\Drift', 'difficulty': 'Detected', 'level': 0.0, 'score': None},
+]
+
+
+def dumped(records):
+    return json.dumps(records, indent=2, ensure_ascii=False)
+
+
+def test_write_records_matches_json_dump(tmp_path):
+    for records in ([], RECORDS[:1], RECORDS):
+        output_file = tmp_path / 'out.json'
+        summary = write_records(iter(records), str(output_file))
+        assert output_file.read_text(encoding='utf-8') == dumped(records)
+        assert summary['records'] == len(records)
+    assert summary == {'records': 3, 'artists': 3, 'songs': 3, 'difficulties': 3}
+    assert not (tmp_path / 'out.json.tmp').exists()
+
+
+def test_unique_records_keeps_first_occurrence_in_order():
+    duplicate = dict(RECORDS[0], score='1')
+    records = [RECORDS[0], RECORDS[1], duplicate, RECORDS[2], dict(RECORDS[1])]
+    assert list(unique_records(records)) == RECORDS
+    # 同名同曲师但难度不同的是另一条记录
+    other_difficulty = dict(RECORDS[0], difficulty='Invaded')
+    assert list(unique_records([RECORDS[0], other_difficulty])) == [RECORDS[0], other_difficulty]
+
+
+def write_journal(path, lines):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(''.join(lines))
+
+
+def test_iter_journal_skips_partial_last_line(tmp_path, capsys):
+    path = tmp_path / 'results.jsonl'
+    write_journal(path, [json.dumps({'n': 1}) + '\n', json.dumps({'n': 2}) + '\n', '{"n": 3, "tit'])
+    assert list(iter_journal(str(path))) == [{'n': 1}, {'n': 2}]
+    assert capsys.readouterr().out == ''
+
+
+def test_iter_journal_reports_corrupt_lines(tmp_path, capsys):
+    path = tmp_path / 'results.jsonl'
+    write_journal(path, [json.dumps({'n': 1}) + '\n', 'not json\n', json.dumps({'n': 3}) + '\n'])
+    assert list(iter_journal(str(path))) == [{'n': 1}, {'n': 3}]
+    assert '第 2 行' in capsys.readouterr().out
+
+
+def test_iter_journal_skips_truncated_multibyte_last_line(tmp_path):
+    path = tmp_path / 'results.jsonl'
+    line = json.dumps({'title': '夜明け'}, ensure_ascii=False).encode('utf-8')
+    path.write_bytes(line + b'\n' + line[:-4])
+    assert list(iter_journal(str(path))) == [{'title': '夜明け'}]
+
+
+def test_compact_matches_save_format(tmp_path):
+    journal = tmp_path / 'results.jsonl'
+    results = [{'filename': f'{i}.jpg', 'matched_song': dict(record)} for i, record in enumerate(RECORDS)]
+    results.insert(1, {'filename': 'unknown.jpg', 'matched_song': None})
+    results.append({'filename': 'again.jpg', 'matched_song': dict(RECORDS[0])})
+    write_journal(journal, [json.dumps(result, ensure_ascii=False) + '\n' for result in results])
+
+    output_file = tmp_path / 'songs_results.json'
+    summary = compact(str(journal), str(output_file))
+    assert summary['records'] == 3
+    assert json.loads(output_file.read_text(encoding='utf-8')) == RECORDS
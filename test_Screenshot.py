@@ -0,0 +1,53 @@
+import cv2
+import numpy as np
+
+import Screenshot
+from Screenshot import ScreenshotContext
+from Synth import render_screenshot
+
+
+def write_jpeg(path, size=(1920, 1200)):
+    img = render_screenshot('type1', 'Massive', 'Aurora Drive', 'Kaede Lights', '1003456', size)
+    cv2.imwrite(str(path), img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return str(path)
+
+
+def region_shapes(rois):
+    return {field: roi.shape for field, roi in rois.items()}
+
+
+def expected_shapes(ctx):
+    return {field: (y2 - y1, x2 - x1, 3)
+            for field, (x1, y1, x2, y2) in zip(('song', 'artist', 'rating'), ctx.regions('type1'))}
+
+
+def test_fast_is_ignored_without_region_decode(tmp_path, monkeypatch):
+    monkeypatch.setattr(Screenshot, 'REGION_DECODE', False)
+    ctx = ScreenshotContext(write_jpeg(tmp_path / 'a.jpg'), fast=True)
+    assert not ctx.fast
+    assert ctx.img is not None and ctx.probe_img is None
+
+
+def test_set_regions_falls_back_to_full_decode(tmp_path, monkeypatch):
+    path = write_jpeg(tmp_path / 'a.jpg')
+    monkeypatch.setattr(Screenshot, 'REGION_DECODE', True)
+    monkeypatch.setattr(Screenshot, 'decode_regions', lambda data, regions, header=None: None)
+
+    ctx = ScreenshotContext(path, fast=True)
+    assert ctx.ok and ctx.img is None
+    rois = ctx.set_regions(*ctx.regions('type1'))
+    assert region_shapes(rois) == expected_shapes(ctx)
+    assert ctx.img is not None
+
+
+def test_set_regions_returns_blank_regions_when_nothing_decodes(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(Screenshot, 'REGION_DECODE', True)
+    monkeypatch.setattr(Screenshot, 'decode_regions', lambda data, regions, header=None: None)
+    monkeypatch.setattr(Screenshot, 'decode_full', lambda data: None)
+
+    ctx = ScreenshotContext(write_jpeg(tmp_path / 'a.jpg'), fast=True)
+    rois = ctx.set_regions(*ctx.regions('type1'))
+    assert region_shapes(rois) == expected_shapes(ctx)
+    assert not any(roi.any() for roi in rois.values())
+    assert '区域解码失败' in capsys.readouterr().out
+    assert all(isinstance(roi, np.ndarray) for roi in ctx.rois.values())
@@ -0,0 +1,40 @@
+import random
+
+import cv2
+import pytest
+
+from Classify import classify, level_for
+from Screenshot import load_screenshot
+from Synth import SIZES, accuracy, add_noise, check_accuracy, render_screenshot
+
+
+@pytest.mark.parametrize('size', SIZES)
+@pytest.mark.parametrize('result_type, level', [('type1', 'Massive'), ('type2', 'Invaded'), ('type2', 'Detected')])
+def test_rendered_probes_classify_at_every_size(tmp_path, size, result_type, level):
+    rng = random.Random(0)
+    img = add_noise(render_screenshot(result_type, level, 'Aurora Drive', 'Kaede Lights', '1003456', size, rng), rng)
+    path = str(tmp_path / 'synth.jpg')
+    cv2.imwrite(path, img, [cv2.IMWRITE_JPEG_QUALITY, 75,
+                            cv2.IMWRITE_JPEG_SAMPLING_FACTOR, cv2.IMWRITE_JPEG_SAMPLING_FACTOR_444])
+    ctx = load_screenshot(path)
+    assert ctx.size == size
+    found_type, _ = classify(ctx)
+    assert (found_type, level_for(ctx, found_type)) == (result_type, level)
+
+
+def test_accuracy_and_thresholds():
+    labels = {
+        'a.jpg': {'title': 'A', 'artist': 'X', 'difficulty': 'Massive', 'rating': '1000000', 'size': [3200, 2000]},
+        'b.jpg': {'title': 'B', 'artist': 'Y', 'difficulty': 'Invaded', 'rating': '990000', 'size': [1920, 1200]},
+    }
+    results = [
+        {'filename': 'a.jpg', 'ocr_results': {'level': 'Massive', 'rating': '1000000'},
+         'matched_song': {'title': 'A', 'artist': 'X', 'difficulty': 'Massive'}},
+        {'filename': 'b.jpg', 'ocr_results': {'level': 'Detected', 'rating': '990000'}, 'matched_song': None},
+    ]
+    report = accuracy(iter(results), labels)
+    assert report['level_accuracy'] == 0.5
+    assert report['match_accuracy'] == 0.5
+    assert report['rating_accuracy'] == 1.0
+    assert report['by_size'] == {'3200x2000': 1.0, '1920x1200': 0.0}
+    assert [name for name, _, _ in check_accuracy(report)] == ['level_accuracy', 'match_accuracy']
@@ -0,0 +1,68 @@
+import json
+
+import cv2
+import numpy as np
+
+from TitleHash import MAX_HASHES_PER_SONG, TitleHashIndex, dhash
+
+
+def title_roi(text, quality=None):
+    """歌名横幅，quality 不为None时经过一次JPEG压缩"""
+    roi = np.zeros((60, 480, 3), dtype=np.uint8)
+    roi[:] = np.linspace(40, 120, 480, dtype=np.uint8)[None, :, None]
+    cv2.putText(roi, text, (10, 42), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 2, cv2.LINE_AA)
+    if quality is not None:
+        _, data = cv2.imencode('.jpg', roi, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        roi = cv2.imdecode(data, cv2.IMREAD_COLOR)
+    return roi
+
+
+def test_lookup_tolerates_recompression_but_not_other_titles():
+    index = TitleHashIndex()
+    assert index.lookup(title_roi('Aurora Drive')) is None
+    assert index.add(title_roi('Aurora Drive'), 'Aurora Drive', 'Kaede Lights')
+    assert index.add(title_roi('Midnight Drive'), 'Midnight Drive', 'Lumen')
+
+    assert index.lookup(title_roi('Aurora Drive', quality=70)) == ('Aurora Drive', 'Kaede Lights')
+    assert index.lookup(title_roi('Midnight Drive', quality=70)) == ('Midnight Drive', 'Lumen')
+    assert index.lookup(title_roi('Neon Genesis')) is None
+    assert index.stats() == {'hits': 2, 'misses': 2, 'hit_rate': 0.5, 'entries': 2}
+
+
+def test_ambiguous_hash_is_not_trusted():
+    index = TitleHashIndex()
+    value = dhash(title_roi('Aurora Drive'))
+    index.add_hash(value, 'Aurora Drive', 'Kaede Lights')
+    index.add_hash(value, 'Aurora Drive', 'Another Artist')
+    assert index.lookup(title_roi('Aurora Drive')) is None
+
+
+def test_add_skips_near_duplicates_and_caps_hashes_per_song():
+    index = TitleHashIndex()
+    assert index.add(title_roi('Aurora Drive'), 'Aurora Drive', 'Kaede Lights')
+    assert not index.add(title_roi('Aurora Drive', quality=90), 'Aurora Drive', 'Kaede Lights')
+    assert len(index) == 1
+
+    rng = np.random.default_rng(0)
+    for _ in range(MAX_HASHES_PER_SONG * 2):
+        index.add_hash(np.packbits(rng.integers(0, 2, 256)), 'Aurora Drive', 'Kaede Lights')
+    assert len(index) == MAX_HASHES_PER_SONG
+
+
+def test_index_persists(tmp_path):
+    path = str(tmp_path / 'title_hashes.json')
+    index = TitleHashIndex(path)
+    index.add(title_roi('夜明けの歌'), '夜明けの歌', '月見')
+    index.save()
+
+    loaded = TitleHashIndex(path)
+    assert len(loaded) == 1
+    assert loaded.lookup(title_roi('夜明けの歌', quality=80)) == ('夜明けの歌', '月見')
+
+    # 哈希网格不同的旧索引被忽略
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    data['hash_size'] = [16, 8]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    assert len(TitleHashIndex(path)) == 0
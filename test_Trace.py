@@ -0,0 +1,73 @@
+import sys
+import json
+import threading
+
+import Trace
+
+
+def read_spans(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_concurrent_spans_are_written_exactly_once(tmp_path):
+    path = str(tmp_path / 'trace.jsonl')
+    tracer = Trace.Tracer(path, flush_every=7)
+    threads_count, spans_per_thread = 8, 500
+
+    def work(n):
+        for i in range(spans_per_thread):
+            tracer.record('step', 0, 1000, {'id': f'{n}-{i}'})
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(threads_count)]
+    # 频繁切换线程，让追加与写出交错
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    tracer.flush()
+
+    ids = [span['args']['id'] for span in read_spans(path)]
+    assert len(ids) == threads_count * spans_per_thread
+    assert len(set(ids)) == len(ids)
+
+
+def test_flushes_every_n_spans(tmp_path):
+    path = str(tmp_path / 'trace.jsonl')
+    tracer = Trace.Tracer(path, flush_every=4)
+    for _ in range(10):
+        tracer.record('step', 0, 1000, {})
+    assert len(read_spans(path)) == 8
+    assert len(tracer.spans) == 2
+
+
+def test_screenshot_scope_tags_spans_and_finish_merges_parts(tmp_path):
+    path = str(tmp_path / 'trace.jsonl')
+    Trace.enable(path)
+    try:
+        with Trace.screenshot('a.jpg'):
+            with Trace.span('ocr') as span:
+                span.set(hit=True)
+        with Trace.span('outside'):
+            pass
+        # 模拟子进程写下的临时文件
+        with open(Trace.part_path(path, 12345), 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'name': 'worker', 'file': 'b.jpg', 'worker': 'worker-12345', 'pid': 12345,
+                                'tid': 1, 'thread': 'MainThread', 'start_us': 0, 'dur_us': 1, 'args': {}}) + '\n')
+    finally:
+        Trace.finish()
+
+    spans = {span['name']: span for span in read_spans(path)}
+    assert spans['ocr']['file'] == 'a.jpg' and spans['ocr']['args'] == {'hit': True}
+    assert spans['screenshot']['file'] == 'a.jpg'
+    assert spans['outside']['file'] is None
+    assert spans['worker']['file'] == 'b.jpg'
+    assert not list(tmp_path.glob('*.part'))
+    with open(Trace.chrome_path(path), 'r', encoding='utf-8') as f:
+        assert len([event for event in json.load(f)['traceEvents'] if event['ph'] == 'X']) == 4
+    assert not Trace.enabled()